@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Micro-benchmark for building Elasticsearch crash documents.
+
+Compares the glom-based per-field implementation that deep-copies the processed
+crash with the compiled DocumentBuilder.
+
+Usage::
+
+    python bin/benchmark_build_document.py [--number N] [PROCESSED_CRASH.json]
+
+If no processed crash file is given, this generates one with a value for every
+indexable super search field.
+
+"""
+
+import copy
+import json
+import timeit
+
+import click
+import glom
+
+from socorro.external.es.crashstorage import (
+    DocumentBuilder,
+    fix_boolean,
+    fix_datetime,
+    fix_double,
+    fix_integer,
+    fix_keyword,
+    fix_long,
+    fix_string,
+    MAX_KEYWORD_FIELD_VALUE_SIZE,
+    MAX_STRING_FIELD_VALUE_SIZE,
+)
+from socorro.external.es.super_search_fields import (
+    FIELDS,
+    get_destination_keys,
+    get_source_key,
+    is_indexable,
+)
+from socorro.lib.libdatetime import date_to_string, utc_now
+from socorro.lib.libooid import create_new_ooid
+
+
+SAMPLE_VALUES = {
+    "keyword": "keyword value",
+    "text": "some text value " * 20,
+    "integer": 42,
+    "short": 7,
+    "long": 1_000_000_000_000,
+    "double": 3.5,
+    "date": date_to_string(utc_now()),
+    "boolean": "1",
+}
+
+
+def glom_build_document(src, crash_document, fields, all_keys):
+    """The per-field glom implementation of build_document"""
+    for field in fields.values():
+        if not is_indexable(field):
+            continue
+
+        src_key = get_source_key(field)
+        value = glom.glom(src, src_key, default=None)
+        if value is None:
+            continue
+
+        storage_type = field.get("type", field["storage_mapping"].get("type"))
+
+        if storage_type == "keyword":
+            value = fix_keyword(value, max_size=MAX_KEYWORD_FIELD_VALUE_SIZE)
+        elif storage_type == "text":
+            value = fix_string(value, max_size=MAX_STRING_FIELD_VALUE_SIZE)
+        elif storage_type == "integer":
+            value = fix_integer(value)
+            if value is None:
+                continue
+        elif storage_type == "long":
+            value = fix_long(value)
+            if value is None:
+                continue
+        elif storage_type == "double":
+            value = fix_double(value)
+            if value is None:
+                continue
+        elif storage_type == "date":
+            value = fix_datetime(value)
+            if value is None:
+                continue
+        elif storage_type == "boolean":
+            value = fix_boolean(value)
+
+        for dest_key in get_destination_keys(field):
+            if dest_key in all_keys:
+                glom.assign(crash_document, dest_key, value, missing=dict)
+
+
+def generate_processed_crash():
+    """Generate a processed crash with a value for every indexable field"""
+    src = {"processed_crash": {}}
+    for field in FIELDS.values():
+        if not is_indexable(field):
+            continue
+        storage_type = field.get("type", field["storage_mapping"].get("type"))
+        value = SAMPLE_VALUES.get(storage_type, "value")
+        glom.assign(src, get_source_key(field), value, missing=dict)
+
+    processed_crash = src["processed_crash"]
+    processed_crash["uuid"] = create_new_ooid()
+    return processed_crash
+
+
+def get_all_keys():
+    all_keys = set()
+    for field in FIELDS.values():
+        if is_indexable(field):
+            all_keys.update(get_destination_keys(field))
+    return all_keys
+
+
+@click.command()
+@click.option("--number", default=1000, type=int, help="Documents to build per run.")
+@click.option("--repeat", default=5, type=int, help="Number of runs.")
+@click.argument("crashfile", required=False, type=click.File("rb"))
+def cmd_benchmark(number, repeat, crashfile):
+    if crashfile:
+        processed_crash = json.loads(crashfile.read())
+    else:
+        processed_crash = generate_processed_crash()
+    all_keys = get_all_keys()
+
+    def run_glom():
+        crash_document = {"crash_id": processed_crash["uuid"], "processed_crash": {}}
+        src = {"processed_crash": copy.deepcopy(processed_crash)}
+        glom_build_document(src, crash_document, fields=FIELDS, all_keys=all_keys)
+        return crash_document
+
+    document_builder = DocumentBuilder(FIELDS, all_keys)
+
+    def run_compiled():
+        crash_document = {"crash_id": processed_crash["uuid"], "processed_crash": {}}
+        document_builder.build({"processed_crash": processed_crash}, crash_document)
+        return crash_document
+
+    if run_glom() != run_compiled():
+        raise click.ClickException("implementations build different documents")
+
+    click.echo(f"fields: {len(document_builder.plan)}, documents per run: {number}")
+    results = {}
+    for name, func in [("glom", run_glom), ("compiled", run_compiled)]:
+        best = min(timeit.repeat(func, number=number, repeat=repeat))
+        results[name] = best
+        click.echo(f"{name:>10}: {best / number * 1_000_000:8.1f} us per document")
+    click.echo(f"   speedup: {results['glom'] / results['compiled']:.1f}x")
+
+
+if __name__ == "__main__":
+    cmd_benchmark()
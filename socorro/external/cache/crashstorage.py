@@ -0,0 +1,527 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Read-through cache for crash storage.
+
+CachingCrashStorage wraps another crash storage and keeps the crash data it fetches
+in a size-bounded in-memory LRU in front of a size-bounded directory on local disk.
+
+Cached crash data includes protected data and stays on local disk until its TTL
+expires or it's pruned. Deleting a crash only invalidates the cache of the process
+that deleted it; other processes and nodes keep serving it until their cached copy
+expires.
+"""
+
+from collections import OrderedDict
+from contextlib import suppress
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+from socorro.external.crashstorage_base import (
+    CrashStorageBase,
+    FileDumpsMapping,
+    MemoryDumpsMapping,
+    dict_to_str,
+    list_to_str,
+    str_to_list,
+)
+from socorro.libclass import build_instance_from_settings
+from socorro.libmarkus import METRICS
+
+
+class BlobCache:
+    """In-memory LRU of blobs in front of a directory of blob files
+
+    Blobs are stored under ``path`` in one directory per datatype. Blobs up to
+    ``max_memory_item_size`` are also kept in memory. Blobs added from files are only
+    stored on disk.
+
+    The directory is shared by every process using the same ``path``. When a process
+    has written about a tenth of ``max_size`` since it last checked, it scans the
+    directory and deletes the oldest files until the directory is under 90% of
+    ``max_size``.
+
+    This is thread-safe.
+
+    """
+
+    def __init__(
+        self,
+        path,
+        max_size=1024 * 1024 * 1024,
+        max_memory_size=64 * 1024 * 1024,
+        max_memory_item_size=1024 * 1024,
+    ):
+        """
+        :arg path: the directory to store blobs in
+        :arg max_size: the maximum size of the directory in bytes
+        :arg max_memory_size: the maximum size of blobs kept in memory in bytes
+        :arg max_memory_item_size: blobs larger than this are only stored on disk
+        """
+        self.path = str(path)
+        # Cached crash data includes protected data, so only this user can read it
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self.max_size = max_size
+        self.max_memory_size = max_memory_size
+        self.max_memory_item_size = max_memory_item_size
+
+        self.lock = threading.Lock()
+        # (datatype, key) -> (stored time, data)
+        self.memory = OrderedDict()
+        self.memory_size = 0
+
+        # Start at the threshold so the first write prunes what other processes left
+        self.prune_threshold = max(max_size // 10, 1)
+        self.written = self.prune_threshold
+
+    def get_file_path(self, datatype, key):
+        # Keys can have / separated parts which become subdirectories
+        parts = [quote(part, safe="") for part in key.split("/")]
+        return os.path.join(self.path, datatype, *parts)
+
+    def get(self, datatype, key, ttl):
+        """Get a blob
+
+        :arg datatype: the kind of blob
+        :arg key: the key of the blob
+        :arg ttl: maximum age of the blob in seconds
+
+        :returns: tuple of (data or None, "memory", "disk", or "miss")
+
+        """
+        now = time.time()
+        with self.lock:
+            item = self.memory.get((datatype, key))
+            if item is not None:
+                stored, data = item
+                if now - stored <= ttl:
+                    self.memory.move_to_end((datatype, key))
+                    return data, "memory"
+                self._remove_from_memory(datatype, key)
+
+        file_path = self.get_file_path(datatype, key)
+        try:
+            with open(file_path, "rb") as fp:
+                stored = os.fstat(fp.fileno()).st_mtime
+                if now - stored > ttl:
+                    data = None
+                else:
+                    data = fp.read()
+        except FileNotFoundError:
+            return None, "miss"
+
+        if data is None:
+            with suppress(OSError):
+                os.remove(file_path)
+            return None, "miss"
+
+        self._add_to_memory(datatype, key, data, stored)
+        return data, "disk"
+
+    def get_path(self, datatype, key, ttl):
+        """Get the path of a blob's file without reading it
+
+        :arg datatype: the kind of blob
+        :arg key: the key of the blob
+        :arg ttl: maximum age of the blob in seconds
+
+        :returns: the file path or None if the blob isn't on disk or is too old
+
+        """
+        file_path = self.get_file_path(datatype, key)
+        try:
+            stored = os.stat(file_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+        if time.time() - stored > ttl:
+            with suppress(OSError):
+                os.remove(file_path)
+            return None
+        return file_path
+
+    def set(self, datatype, key, data):
+        """Store a blob
+
+        :arg datatype: the kind of blob
+        :arg key: the key of the blob
+        :arg data: the blob as bytes
+
+        """
+        self._add_to_memory(datatype, key, data, time.time())
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as fp:
+                fp.write(data)
+
+        self._write_file(datatype, key, write, len(data))
+
+    def set_from_file(self, datatype, key, src_path):
+        """Store a blob by copying a file
+
+        :arg datatype: the kind of blob
+        :arg key: the key of the blob
+        :arg src_path: path of the file with the blob
+
+        """
+        with self.lock:
+            self._remove_from_memory(datatype, key)
+
+        self._write_file(
+            datatype,
+            key,
+            lambda tmp_path: shutil.copyfile(src_path, tmp_path),
+            os.path.getsize(src_path),
+        )
+
+    def _write_file(self, datatype, key, write, size):
+        # Write to a temp file and move it into place so readers never see a partial
+        # file
+        file_path = self.get_file_path(datatype, key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            with suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+        with self.lock:
+            self.written += size
+            should_prune = self.written >= self.prune_threshold
+            if should_prune:
+                self.written = 0
+        if should_prune:
+            self.prune()
+
+    def delete(self, datatype, key):
+        """Delete a blob or, if key is a directory, all the blobs under it"""
+        prefix = key + "/"
+        with self.lock:
+            self._remove_from_memory(datatype, key)
+            for item in [
+                item
+                for item in self.memory
+                if item[0] == datatype and item[1].startswith(prefix)
+            ]:
+                self._remove_from_memory(*item)
+
+        file_path = self.get_file_path(datatype, key)
+        if os.path.isdir(file_path):
+            shutil.rmtree(file_path, ignore_errors=True)
+        else:
+            with suppress(FileNotFoundError):
+                os.remove(file_path)
+
+    def prune(self):
+        """Delete the oldest files until the directory is under 90% of max size"""
+        files = []
+        total_size = 0
+        for base, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                file_path = os.path.join(base, filename)
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file_path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return
+
+        target_size = self.max_size * 9 // 10
+        files.sort()
+        for _, size, file_path in files:
+            if total_size <= target_size:
+                break
+            with suppress(FileNotFoundError):
+                os.remove(file_path)
+            total_size -= size
+
+    def _add_to_memory(self, datatype, key, data, stored):
+        if len(data) > self.max_memory_item_size:
+            return
+
+        with self.lock:
+            self._remove_from_memory(datatype, key)
+            self.memory[(datatype, key)] = (stored, data)
+            self.memory_size += len(data)
+            while self.memory_size > self.max_memory_size:
+                _, (_, old_data) = self.memory.popitem(last=False)
+                self.memory_size -= len(old_data)
+
+    def _remove_from_memory(self, datatype, key):
+        item = self.memory.pop((datatype, key), None)
+        if item is not None:
+            self.memory_size -= len(item[1])
+
+
+# cache path -> BlobCache; the webapp builds a crash storage instance per request, so
+# instances using the same path share a BlobCache
+_BLOB_CACHES = {}
+_BLOB_CACHES_LOCK = threading.Lock()
+
+
+def get_blob_cache(path, **kwargs):
+    """Return the shared BlobCache for path, creating it if needed"""
+    path = os.path.abspath(str(path))
+    with _BLOB_CACHES_LOCK:
+        if path not in _BLOB_CACHES:
+            _BLOB_CACHES[path] = BlobCache(path, **kwargs)
+        return _BLOB_CACHES[path]
+
+
+class CachingCrashStorage(CrashStorageBase):
+    """Read-through cache in front of another crash storage
+
+    Raw crashes, dumps, and processed crashes fetched from the wrapped crash storage
+    are cached locally. Each datatype has its own TTL. Processed crashes are written
+    through to the cache when saved, and cached data for a crash is invalidated when
+    the crash is saved or deleted.
+
+    ``get_dumps_as_files`` has the wrapped crash storage write dumps to files and
+    copies the files into the cache and back out again, so dumps aren't read into
+    memory.
+
+    Invalidation only affects this cache path. Other nodes with their own cache keep
+    serving a deleted crash until their cached copy is older than the TTL, so keep
+    the raw crash and dump TTLs short where crashes get deleted.
+
+    Other attributes, such as ``list_objects_paginator``, are passed through to the
+    wrapped crash storage.
+
+    If several CachingCrashStorage instances wrap different crash storages, they need
+    different cache paths.
+
+    """
+
+    def __init__(
+        self,
+        crashstorage,
+        cache_path,
+        max_size=1024 * 1024 * 1024,
+        max_memory_size=64 * 1024 * 1024,
+        raw_crash_ttl=60 * 60,
+        dump_ttl=60 * 60,
+        processed_crash_ttl=60,
+    ):
+        """
+        :arg crashstorage: settings dict with "class" and "options" for the crash
+            storage to wrap
+        :arg cache_path: the directory to store cached data in
+        :arg max_size: the maximum size of cached data on disk in bytes
+        :arg max_memory_size: the maximum size of cached data in memory in bytes
+        :arg raw_crash_ttl: seconds to cache raw crashes for
+        :arg dump_ttl: seconds to cache dump names and dumps for
+        :arg processed_crash_ttl: seconds to cache processed crashes for
+        """
+        super().__init__()
+        self.crashstorage = build_instance_from_settings(crashstorage)
+        self.exceptions_eligible_for_retry = getattr(
+            self.crashstorage, "exceptions_eligible_for_retry", ()
+        )
+        self.cache = get_blob_cache(
+            cache_path, max_size=max_size, max_memory_size=max_memory_size
+        )
+        self.ttls = {
+            "raw_crash": raw_crash_ttl,
+            "dump_names": dump_ttl,
+            "dump_file_names": dump_ttl,
+            "dump": dump_ttl,
+            "processed_crash": processed_crash_ttl,
+        }
+
+    def __getattr__(self, name):
+        # Only called for attributes this class doesn't have
+        if name == "crashstorage":
+            raise AttributeError(name)
+        return getattr(self.crashstorage, name)
+
+    @property
+    def dump_file_suffix(self):
+        return getattr(self.crashstorage, "dump_file_suffix", ".dump")
+
+    def _fetch(self, datatype, key, fetch):
+        """Return cached data or fetch it and cache it
+
+        :arg datatype: the kind of data
+        :arg key: the key for the data
+        :arg fetch: function that fetches the data as bytes from the wrapped storage
+
+        :returns: data as bytes
+
+        :raises CrashIDNotFound: if the wrapped storage doesn't have the data
+
+        """
+        data, result = self.cache.get(datatype, key, ttl=self.ttls[datatype])
+        self._record_lookup(datatype, result)
+        if data is None:
+            data = fetch()
+            self.cache.set(datatype, key, data)
+        return data
+
+    def _record_lookup(self, datatype, result):
+        METRICS.incr(
+            "crashstorage_cache.lookup",
+            tags=[f"datatype:{datatype}", f"result:{result}"],
+        )
+
+    def _get_dump_key(self, crash_id, name):
+        # The main dump is called "dump" or "upload_file_minidump" depending on how
+        # it was fetched
+        if name in (None, "", "upload_file_minidump"):
+            name = "dump"
+        return f"{crash_id}/{name}"
+
+    def close(self):
+        self.crashstorage.close()
+
+    def save_raw_crash(self, raw_crash, dumps, crash_id):
+        self.crashstorage.save_raw_crash(raw_crash, dumps, crash_id)
+        self.invalidate(crash_id)
+
+    def save_processed_crash(self, raw_crash, processed_crash):
+        self.crashstorage.save_processed_crash(raw_crash, processed_crash)
+        data = dict_to_str(processed_crash).encode("utf-8")
+        self.cache.set("processed_crash", processed_crash["uuid"], data)
+
+    def get_raw_crash(self, crash_id):
+        data = self._fetch(
+            "raw_crash",
+            crash_id,
+            lambda: dict_to_str(self.crashstorage.get_raw_crash(crash_id)).encode(
+                "utf-8"
+            ),
+        )
+        return json.loads(data)
+
+    def get_raw_dump(self, crash_id, name=None):
+        return self._fetch(
+            "dump",
+            self._get_dump_key(crash_id, name),
+            lambda: self.crashstorage.get_raw_dump(crash_id, name=name),
+        )
+
+    def get_dumps(self, crash_id):
+        fetched = {}
+
+        def fetch_dump_names():
+            # Fetch everything at once from the wrapped storage so it can do it the
+            # efficient way
+            fetched.update(self.crashstorage.get_dumps(crash_id))
+            return list_to_str(fetched.keys()).encode("utf-8")
+
+        dump_names = str_to_list(self._fetch("dump_names", crash_id, fetch_dump_names))
+
+        dumps = MemoryDumpsMapping()
+        for dump_name in dump_names:
+            if dump_name in fetched:
+                dumps[dump_name] = fetched[dump_name]
+                self.cache.set(
+                    "dump", self._get_dump_key(crash_id, dump_name), fetched[dump_name]
+                )
+            else:
+                dumps[dump_name] = self.get_raw_dump(crash_id, name=dump_name)
+        return dumps
+
+    def get_dumps_as_files(self, crash_id, tmpdir):
+        dump_names = None
+        # The dump names are cached by this or by get_dumps which can name the main
+        # dump differently
+        for datatype in ("dump_file_names", "dump_names"):
+            data, _ = self.cache.get(datatype, crash_id, ttl=self.ttls[datatype])
+            if data is not None:
+                dump_names = [
+                    "upload_file_minidump" if name in (None, "", "dump") else name
+                    for name in str_to_list(data)
+                ]
+                break
+
+        if dump_names is not None:
+            dumps = self._copy_dumps_from_cache(crash_id, dump_names, tmpdir)
+            if dumps is not None:
+                self._record_lookup("dump", "disk")
+                return dumps
+        self._record_lookup("dump", "miss")
+
+        dumps = self.crashstorage.get_dumps_as_files(crash_id, tmpdir)
+        for dump_name, dump_path in dumps.items():
+            self.cache.set_from_file(
+                "dump", self._get_dump_key(crash_id, dump_name), dump_path
+            )
+        self.cache.set(
+            "dump_file_names", crash_id, list_to_str(dumps.keys()).encode("utf-8")
+        )
+        return dumps
+
+    def _copy_dumps_from_cache(self, crash_id, dump_names, tmpdir):
+        """Copy cached dump files for a crash to tmpdir
+
+        :returns: FileDumpsMapping or None if any of the dumps isn't cached
+
+        """
+        dumps = FileDumpsMapping()
+        for dump_name in dump_names:
+            cache_path = self.cache.get_path(
+                "dump", self._get_dump_key(crash_id, dump_name), ttl=self.ttls["dump"]
+            )
+            dump_path = os.path.join(
+                tmpdir, f"{crash_id}.{dump_name}.TEMPORARY{self.dump_file_suffix}"
+            )
+            if cache_path is not None:
+                with suppress(FileNotFoundError):
+                    shutil.copyfile(cache_path, dump_path)
+                    dumps[dump_name] = dump_path
+                    continue
+
+            # The dump expired or was pruned, so clean up and fetch them all again
+            for path in dumps.values():
+                with suppress(OSError):
+                    os.remove(path)
+            return None
+        return dumps
+
+    def get_processed_crash(self, crash_id):
+        data = self._fetch(
+            "processed_crash",
+            crash_id,
+            lambda: dict_to_str(self.crashstorage.get_processed_crash(crash_id)).encode(
+                "utf-8"
+            ),
+        )
+        return json.loads(data)
+
+    def get(self, **kwargs):
+        """Return JSON data of a crash report, given its uuid."""
+        # NOTE: The webapp API calls get() on crash storage. Run the wrapped crash
+        # storage's get() with this instance so the data comes through the cache.
+        return type(self.crashstorage).get(self, **kwargs)
+
+    def catalog_crash(self, crash_id):
+        return self.crashstorage.catalog_crash(crash_id)
+
+    def invalidate(self, crash_id):
+        """Remove cached data for a crash"""
+        for datatype in (
+            "raw_crash",
+            "dump_names",
+            "dump_file_names",
+            "dump",
+            "processed_crash",
+        ):
+            self.cache.delete(datatype, crash_id)
+
+    def delete_crash(self, crash_id):
+        self.invalidate(crash_id)
+        self.crashstorage.delete_crash(crash_id)
@@ -17,12 +17,25 @@ class CrashQueueBase:
         """Return iterator over crash ids for processing.
 
         Each returned crash is a ``(crash_id, {kwargs})`` tuple with
-        ``finished_func`` as the only key in ``kwargs``. The caller should call
-        ``finished_func`` when it's done processing the crash.
+        ``finished_func`` in ``kwargs``. The caller should call ``finished_func``
+        when it's done processing the crash. If the caller lost the crash and it
+        should be redelivered, it calls ``finished_func(acked=False)`` instead.
+        Queues can mark crashes that should be processed before others with
+        ``priority=True`` in ``kwargs``.
 
         """
         raise NotImplementedError("__iter__ not implemented")
 
+    def set_capacity(self, capacity):
+        """Tell the queue how many crash ids the consumer can hold at once.
+
+        Queues can use this to size pulls so they don't pull more crash ids than the
+        consumer can handle.
+
+        :arg capacity: the number of crash ids or None if there's no limit
+
+        """
+
     def new_crashes(self):
         return self.__iter__()
 
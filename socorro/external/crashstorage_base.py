@@ -4,6 +4,7 @@
 
 """Base classes for crashstorage system."""
 
+import asyncio
 from contextlib import suppress
 import datetime
 import json
@@ -291,6 +292,47 @@ class InMemoryCrashStorage(CrashStorageBase):
             del self._processed_crash_data[crash_id]
 
 
+class AsyncCrashStorage:
+    """Wraps a crash storage instance so its methods can be awaited.
+
+    Crash storage methods block on I/O, so each call runs in the event loop's default
+    executor.
+
+    """
+
+    def __init__(self, crashstorage):
+        """
+        :arg crashstorage: the CrashStorageBase instance to wrap
+        """
+        self.crashstorage = crashstorage
+
+    @property
+    def crash_destination_name(self):
+        return getattr(self.crashstorage, "crash_destination_name", None)
+
+    async def save_processed_crash(self, raw_crash, processed_crash):
+        return await asyncio.to_thread(
+            self.crashstorage.save_processed_crash, raw_crash, processed_crash
+        )
+
+    async def get_raw_crash(self, crash_id):
+        return await asyncio.to_thread(self.crashstorage.get_raw_crash, crash_id)
+
+    async def get_dumps(self, crash_id):
+        return await asyncio.to_thread(self.crashstorage.get_dumps, crash_id)
+
+    async def get_dumps_as_files(self, crash_id, tmpdir):
+        return await asyncio.to_thread(
+            self.crashstorage.get_dumps_as_files, crash_id, tmpdir
+        )
+
+    async def get_processed_crash(self, crash_id):
+        return await asyncio.to_thread(self.crashstorage.get_processed_crash, crash_id)
+
+    async def delete_crash(self, crash_id):
+        return await asyncio.to_thread(self.crashstorage.delete_crash, crash_id)
+
+
 class CrashIDMissingDatestamp(Exception):
     """Indicates the crash id is invalid and missing a datestamp."""
 
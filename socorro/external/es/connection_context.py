@@ -3,8 +3,91 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 from contextlib import contextmanager
+import functools
+import logging
+import os
+import socket
+import threading
+import time
 
+from elastic_transport import Urllib3HttpNode
 from elasticsearch import Elasticsearch, RequestError
+from urllib3.connection import HTTPConnection
+
+
+class KeepAliveUrllib3HttpNode(Urllib3HttpNode):
+    """Urllib3HttpNode that turns on TCP keepalive for its connections.
+
+    Idle connections in the pool are kept open by the operating system instead of
+    being dropped by load balancers and firewalls along the way.
+
+    """
+
+    #: seconds a connection is idle before keepalive probes are sent
+    keepalive_idle = 60
+
+    def __init__(self, config):
+        super().__init__(config)
+        socket_options = list(HTTPConnection.default_socket_options)
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            socket_options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle)
+            )
+        self.pool.conn_kw["socket_options"] = socket_options
+
+
+@functools.cache
+def get_keepalive_node_class(keepalive_idle):
+    """Returns a KeepAliveUrllib3HttpNode subclass with the given idle time.
+
+    The same class is returned for the same idle time, so clients built with it
+    can be shared.
+
+    """
+    return type(
+        "KeepAliveUrllib3HttpNode",
+        (KeepAliveUrllib3HttpNode,),
+        {"keepalive_idle": keepalive_idle},
+    )
+
+
+# Elasticsearch clients shared by all ConnectionContext instances in this process
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Minimum number of seconds between capturing connection pool metrics for a client
+POOL_METRICS_INTERVAL = 10
+
+# client key -> time.monotonic() when pool metrics were last captured for it
+_pool_metrics_captured = {}
+
+
+def get_client_key(**client_kwargs):
+    """Return the key for the shared client with these arguments in this process."""
+    return (os.getpid(), tuple(sorted(client_kwargs.items())))
+
+
+def get_shared_client(**client_kwargs):
+    """Return an Elasticsearch client shared by everything in this process.
+
+    Clients are thread-safe and have their own pool of connections, so sharing one
+    client reuses connections instead of setting up a new TCP and TLS connection
+    for each request. Clients are keyed by process id so a forked process doesn't
+    use its parent's connections.
+
+    :arg client_kwargs: arguments for building the Elasticsearch client
+
+    :returns: an Elasticsearch client
+
+    """
+    key = get_client_key(**client_kwargs)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = Elasticsearch(**client_kwargs)
+            _clients[key] = client
+        return client
 
 
 class ConnectionContext:
@@ -12,6 +95,9 @@ class ConnectionContext:
 
     Used for accessing Elasticsearch and managing indexes.
 
+    Connections come from an Elasticsearch client that's shared by all
+    ConnectionContext instances with the same settings in the process.
+
     """
 
     def __init__(
@@ -19,33 +105,115 @@ class ConnectionContext:
         url="http://localhost:9200",
         timeout=30,
         ca_certs=None,
+        connections_per_node=10,
+        keepalive_idle=None,
+        sniff=False,
+        metrics=None,
         **kwargs,
     ):
         """
         :arg url: the url to the elasticsearch instances
         :arg timeout: the time in seconds before a query to elasticsearch fails
         :arg ca_certs: path to a certs.pem file for verifying self-issued certs
+        :arg connections_per_node: maximum number of connections to keep open to each
+            Elasticsearch node
+        :arg keepalive_idle: if set, turn on TCP keepalive for connections and send
+            keepalive probes after this many idle seconds
+        :arg sniff: whether to discover the nodes in the cluster when the client is
+            created and when a node fails
+        :arg metrics: the markus MetricsInterface to emit connection pool metrics to
         """
         self.url = url
         self.timeout = timeout
         self.ca_certs = ca_certs
+        self.connections_per_node = connections_per_node or 10
+        self.keepalive_idle = keepalive_idle
+        self.sniff = sniff
+        self.metrics = metrics
+        self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+
+    def get_client_kwargs(self):
+        """Returns the arguments for building the Elasticsearch client."""
+        client_kwargs = {
+            "hosts": self.url,
+            "request_timeout": self.timeout,
+            "verify_certs": True,
+            "ca_certs": self.ca_certs,
+            "connections_per_node": self.connections_per_node,
+        }
+        if self.keepalive_idle:
+            client_kwargs["node_class"] = get_keepalive_node_class(self.keepalive_idle)
+        if self.sniff:
+            client_kwargs["sniff_on_start"] = True
+            client_kwargs["sniff_on_node_failure"] = True
+        return client_kwargs
 
     def connection(self, name=None, timeout=None):
         """Returns an instance of elasticsearch-py's Elasticsearch class as
         encapsulated by the Connection class above.
 
+        The client is shared; if ``timeout`` is different than the default timeout,
+        this returns a view of the shared client with that request timeout.
+
         Documentation: http://elasticsearch-py.readthedocs.org
 
         """
-        if timeout is None:
-            timeout = self.timeout
+        client = get_shared_client(**self.get_client_kwargs())
+        if timeout is not None and timeout != self.timeout:
+            client = client.options(request_timeout=timeout)
+        return client
+
+    def get_pool_stats(self):
+        """Returns connection pool usage for the shared client.
+
+        This looks at urllib3's connection pools. Nodes that don't use them, or
+        whose pools don't look like what's expected, are skipped.
 
-        return Elasticsearch(
-            hosts=self.url,
-            request_timeout=timeout,
-            verify_certs=True,
-            ca_certs=self.ca_certs,
-        )
+        :returns: list of ``(node, in_use, idle, maxsize)`` tuples
+
+        """
+        client = get_shared_client(**self.get_client_kwargs())
+        stats = []
+        for node in client.transport.node_pool.all():
+            try:
+                maxsize = node.config.connections_per_node
+                # The pool queue holds idle connections and placeholders for
+                # connections that haven't been created yet
+                available = list(node.pool.pool.queue)
+            except (AttributeError, TypeError):
+                continue
+            idle = sum(1 for conn in available if conn is not None)
+            stats.append((node.base_url, maxsize - len(available), idle, maxsize))
+        return stats
+
+    def capture_pool_metrics(self):
+        """Emits connection pool usage metrics.
+
+        This is called every time a connection is used, so it only captures
+        metrics for a client every ``POOL_METRICS_INTERVAL`` seconds.
+
+        """
+        if self.metrics is None:
+            return
+
+        key = get_client_key(**self.get_client_kwargs())
+        now = time.monotonic()
+        with _clients_lock:
+            last_captured = _pool_metrics_captured.get(key)
+            if (
+                last_captured is not None
+                and now - last_captured < POOL_METRICS_INTERVAL
+            ):
+                return
+            _pool_metrics_captured[key] = now
+
+        for node, in_use, idle, maxsize in self.get_pool_stats():
+            tags = [f"node:{node}"]
+            self.metrics.gauge("connection_pool.in_use", value=in_use, tags=tags)
+            self.metrics.gauge("connection_pool.idle", value=idle, tags=tags)
+            self.metrics.gauge(
+                "connection_pool.utilization", value=in_use / maxsize, tags=tags
+            )
 
     def indices_client(self, name=None):
         """Returns an instance of elasticsearch-py's Index client class as
@@ -59,7 +227,14 @@ class ConnectionContext:
     @contextmanager
     def __call__(self, name=None, timeout=None):
         conn = self.connection(name, timeout)
-        yield conn
+        try:
+            yield conn
+        finally:
+            try:
+                self.capture_pool_metrics()
+            except Exception:
+                # An error here shouldn't break using the connection
+                self.logger.exception("something went wrong capturing pool metrics")
 
     def create_index(self, index_name, index_settings):
         """Create an index that will receive crash reports.
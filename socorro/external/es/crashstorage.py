@@ -2,20 +2,23 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+from concurrent.futures import Future
 import copy
 import datetime
+import functools
 import json
 import re
+import threading
 import time
 from math import isnan, isinf
 
 import elasticsearch
 from elasticsearch.exceptions import NotFoundError
 from elasticsearch.dsl import Search
-import glom
 import markus
 
 from socorro.external.crashstorage_base import CrashStorageBase
+from socorro.external.es.base import generate_list_of_indexes
 from socorro.external.es.connection_context import ConnectionContext
 from socorro.external.es.query import Query
 from socorro.external.es.supersearch import SuperSearch
@@ -227,64 +230,152 @@ def fix_datetime(value):
     return value
 
 
+# Fixers for storage types; the bool is whether a None value after fixing means the
+# value should be skipped
+STORAGE_TYPE_FIXERS = {
+    "keyword": (
+        functools.partial(fix_keyword, max_size=MAX_KEYWORD_FIELD_VALUE_SIZE),
+        False,
+    ),
+    "text": (
+        functools.partial(fix_string, max_size=MAX_STRING_FIELD_VALUE_SIZE),
+        False,
+    ),
+    "integer": (fix_integer, True),
+    "long": (fix_long, True),
+    "double": (fix_double, True),
+    "date": (fix_datetime, True),
+    "boolean": (fix_boolean, False),
+}
+
+
+class DocumentBuilder:
+    """Builds documents to index from a precomputed plan.
+
+    The plan is computed once for a set of super search fields and valid keys. For
+    each indexable field with at least one valid destination key, it has the source
+    key path, the function to fix values, and the destination key paths.
+
+    Building a document only copies values that are dicts or lists, so the source
+    document doesn't need to be deep-copied first.
+
+    """
+
+    def __init__(self, fields, all_keys):
+        """
+        :param dict fields: super search fields
+        :param set all_keys: the set of valid keys
+
+        """
+        self.plan = []
+        for field in fields.values():
+            # There are some fields that aren't indexable--skip those
+            if not is_indexable(field):
+                continue
+
+            dest_paths = [
+                tuple(dest_key.split("."))
+                for dest_key in get_destination_keys(field)
+                if dest_key in all_keys
+            ]
+            if not dest_paths:
+                continue
+
+            storage_type = field.get("type", field["storage_mapping"].get("type"))
+            fixer, skip_none = STORAGE_TYPE_FIXERS.get(storage_type, (None, False))
+            src_path = tuple(get_source_key(field).split("."))
+            self.plan.append((src_path, fixer, skip_none, dest_paths))
+
+    def build(self, src, crash_document):
+        """Fills a document to index with values from the source document.
+
+        :param dict src: the source document with "processed_crash" key
+        :param dict crash_document: the document to fill
+
+        """
+        for src_path, fixer, skip_none, dest_paths in self.plan:
+            value = src
+            for part in src_path:
+                if not isinstance(value, dict):
+                    value = None
+                    break
+                value = value.get(part)
+            if value is None:
+                continue
+
+            # Fix values so they index correctly
+            if fixer is not None:
+                value = fixer(value)
+                if value is None and skip_none:
+                    continue
+
+            # Copy containers so changes to the crash document don't change the
+            # source document
+            if isinstance(value, (dict, list)):
+                value = copy.deepcopy(value)
+
+            for dest_path in dest_paths:
+                parent = crash_document
+                for part in dest_path[:-1]:
+                    parent = parent.setdefault(part, {})
+                parent[dest_path[-1]] = value
+
+
 def build_document(src, crash_document, fields, all_keys):
     """Given a source document and fields and valid keys, builds a document to index.
 
+    If you're building many documents with the same fields and valid keys, create
+    a :py:class:`DocumentBuilder` once and use that instead.
+
     :param dict src: the source document with "processed_crash" key
     :param dict crash_document: the document to fill
     :param list fields: the list of fields in super search fields
     :param set all_keys: the list of valid keys
 
     """
-    for field in fields.values():
-        # There are some fields that aren't indexable--skip those
-        if not is_indexable(field):
-            continue
+    DocumentBuilder(fields, all_keys).build(src, crash_document)
 
-        src_key = get_source_key(field)
-        value = glom.glom(src, src_key, default=None)
-        if value is None:
-            continue
 
-        # Fix values so they index correctly
-        storage_type = field.get("type", field["storage_mapping"].get("type"))
+def is_index_not_found(body):
+    """Return whether an Elasticsearch error response is for a missing index
 
-        if storage_type == "keyword":
-            value = fix_keyword(value, max_size=MAX_KEYWORD_FIELD_VALUE_SIZE)
+    :param body: the Elasticsearch error response
 
-        elif storage_type == "text":
-            value = fix_string(value, max_size=MAX_STRING_FIELD_VALUE_SIZE)
+    :returns: bool
 
-        elif storage_type == "integer":
-            value = fix_integer(value)
-            if value is None:
-                continue
+    """
+    error = body.get("error") if isinstance(body, dict) else None
+    return isinstance(error, dict) and error.get("type") == "index_not_found_exception"
 
-        elif storage_type == "long":
-            value = fix_long(value)
-            if value is None:
-                continue
 
-        elif storage_type == "double":
-            value = fix_double(value)
-            if value is None:
-                continue
+class BulkIndexError(Exception):
+    """Raised when a document in a bulk indexing request can't be indexed."""
 
-        elif storage_type == "date":
-            value = fix_datetime(value)
-            if value is None:
-                continue
 
-        elif storage_type == "boolean":
-            value = fix_boolean(value)
+class PendingDocument:
+    """A crash document waiting to be indexed in a bulk indexing request."""
 
-        for dest_key in get_destination_keys(field):
-            if dest_key in all_keys:
-                glom.assign(crash_document, dest_key, value, missing=dict)
+    def __init__(self, crash_id, index_name, crash_document):
+        self.crash_id = crash_id
+        self.index_name = index_name
+        self.crash_document = crash_document
+        # Resolved when the document is indexed or fails to index
+        self.future = Future()
 
 
 class ESCrashStorage(CrashStorageBase):
-    """Indexes documents based on the processed crash to Elasticsearch."""
+    """Indexes documents based on the processed crash to Elasticsearch.
+
+    By default, each crash document is indexed with its own index request. If
+    ``bulk_max_documents`` is greater than 1, crash documents saved by different
+    threads are buffered and indexed together with bulk requests. A request is sent
+    when ``bulk_max_documents`` documents are buffered, when every thread that saves
+    documents is waiting on a buffered document, or when the oldest buffered
+    document has waited ``bulk_flush_interval`` seconds. ``save_processed_crash``
+    doesn't return until the request with its document is done, so crash reports
+    are only acknowledged after they're indexed.
+
+    """
 
     SUPERSEARCH_FIELDS = FIELDS
 
@@ -304,11 +395,15 @@ class ESCrashStorage(CrashStorageBase):
         timeout=30,
         shards_per_index=10,
         ca_certs=None,
+        bulk_max_documents=0,
+        bulk_flush_interval=0.1,
+        connections_per_node=10,
+        keepalive_idle=None,
+        sniff=False,
+        index_weeks_future=2,
     ):
         super().__init__()
 
-        self.client = self.build_client(url=url, timeout=timeout, ca_certs=ca_certs)
-
         # Create a MetricsInterface that includes the base prefix plus the prefix passed
         # into __init__
         self.metrics = markus.get_metrics(
@@ -316,19 +411,45 @@ class ESCrashStorage(CrashStorageBase):
             filters=list(METRICS.filters),
         )
 
+        self.client = self.build_client(
+            url=url,
+            timeout=timeout,
+            ca_certs=ca_certs,
+            connections_per_node=connections_per_node,
+            keepalive_idle=keepalive_idle,
+            sniff=sniff,
+            metrics=self.metrics,
+        )
+
         self.index = index
         self.index_regex = index_regex
         self.retention_policy = retention_policy
         self.shards_per_index = shards_per_index
+        self.index_weeks_future = index_weeks_future
 
         # Cached answers for things that don't change
+        self._default_mappings_cache = None
+        self._known_indices = set()
         self._keys_for_indexable_fields_cache = None
         self._keys_for_mapping_cache = {}
         self._mapping_cache = {}
+        self._document_builder_cache = {}
+
+        self.bulk_max_documents = bulk_max_documents or 0
+        self.bulk_flush_interval = bulk_flush_interval or 0
+        self._bulk_condition = threading.Condition()
+        self._bulk_buffer = []
+        # thread ident -> thread for threads that have buffered documents; a thread
+        # can only wait on one document at a time, so once each of them is waiting,
+        # there's no point in waiting for more
+        self._bulk_savers = {}
+        # The flusher thread is started on first use, so processes forked after
+        # this is created get their own
+        self._bulk_flusher = None
 
     @classmethod
-    def build_client(cls, url, timeout, ca_certs=None):
-        return ConnectionContext(url=url, timeout=timeout, ca_certs=ca_certs)
+    def build_client(cls, url, timeout, ca_certs=None, **kwargs):
+        return ConnectionContext(url=url, timeout=timeout, ca_certs=ca_certs, **kwargs)
 
     def build_query(self):
         """Return new instance of Query."""
@@ -406,6 +527,19 @@ class ESCrashStorage(CrashStorageBase):
                     raise
         return mapping
 
+    def get_default_mappings(self):
+        """Return the mappings for new indices built from super search fields
+
+        NOTE(willkg): Results are cached on this ESCrashStorage instance. If you change
+        FIELDS (like in tests), create a new ESCrashStorage instance.
+
+        """
+        mappings = self._default_mappings_cache
+        if mappings is None:
+            mappings = build_mapping()
+            self._default_mappings_cache = mappings
+        return mappings
+
     def create_index(self, index_name, mappings=None):
         """Create an index that will receive crash reports.
 
@@ -416,16 +550,64 @@ class ESCrashStorage(CrashStorageBase):
 
         """
         if mappings is None:
-            mappings = build_mapping()
+            mappings = self.get_default_mappings()
 
         index_settings = self.get_socorro_index_settings(mappings)
 
-        return self.client.create_index(
+        was_created = self.client.create_index(
             index_name=index_name,
             index_settings=index_settings,
         )
+        self._known_indices.add(index_name)
+        return was_created
+
+    def create_upcoming_indices(self):
+        """Create indices for this week and the next ``index_weeks_future`` weeks.
+
+        This does the same thing as ``es_cli.py create --weeks-future``, so indices
+        exist before crash reports for them get processed.
+
+        """
+        today = utc_now().date()
+        index_names = generate_list_of_indexes(
+            today,
+            today + datetime.timedelta(weeks=self.index_weeks_future),
+            self.get_index_template(),
+        )
+        for index_name in index_names:
+            if index_name not in self._known_indices:
+                self.create_index(index_name)
+
+    def ensure_index(self, index_name):
+        """Make sure an index exists before indexing crash reports into it.
+
+        Indices this ESCrashStorage has created or found are remembered, so this
+        only talks to Elasticsearch the first time it sees an index.
+
+        :arg index_name: the name of the index
+
+        """
+        if index_name in self._known_indices:
+            return
+
+        self.create_index(index_name)
+        self.create_upcoming_indices()
+
+    def forget_index(self, index_name):
+        """Forget cached information about an index.
+
+        Call this when an index is deleted or Elasticsearch says an index that was
+        known doesn't exist.
+
+        :arg index_name: the name of the index
+
+        """
+        self._known_indices.discard(index_name)
+        self._mapping_cache.pop(index_name, None)
+        self._keys_for_mapping_cache.pop(index_name, None)
 
     def delete_index(self, index_name):
+        self.forget_index(index_name)
         return self.client.delete_index(index_name=index_name)
 
     def get_indices(self):
@@ -456,7 +638,7 @@ class ESCrashStorage(CrashStorageBase):
             if index_name > cutoff:
                 continue
 
-            self.client.delete_index(index_name)
+            self.delete_index(index_name)
             was_deleted.append(index_name)
 
         return was_deleted
@@ -516,6 +698,24 @@ class ESCrashStorage(CrashStorageBase):
 
         return all_valid_keys
 
+    def get_document_builder(self, all_keys):
+        """Return a DocumentBuilder for SUPERSEARCH_FIELDS and the valid keys
+
+        NOTE(willkg): Results are cached on this ESCrashStorage instance. If you change
+        FIELDS (like in tests), create a new ESCrashStorage instance.
+
+        :arg set all_keys: the set of valid keys
+
+        :returns: a :py:class:`DocumentBuilder`
+
+        """
+        all_keys = frozenset(all_keys)
+        document_builder = self._document_builder_cache.get(all_keys)
+        if document_builder is None:
+            document_builder = DocumentBuilder(self.SUPERSEARCH_FIELDS, all_keys)
+            self._document_builder_cache[all_keys] = document_builder
+        return document_builder
+
     def save_processed_crash(self, raw_crash, processed_crash):
         """Save processed crash report to Elasticsearch"""
         crash_id = processed_crash["uuid"]
@@ -523,21 +723,24 @@ class ESCrashStorage(CrashStorageBase):
         index_name = self.get_index_for_date(
             string_to_datetime(processed_crash["date_processed"])
         )
-        all_valid_keys = self.get_keys(index_name)
-
-        src = {"processed_crash": copy.deepcopy(processed_crash)}
+        document_builder = self.get_document_builder(self.get_keys(index_name))
 
         crash_document = {
             "crash_id": crash_id,
             "processed_crash": {},
         }
-        build_document(
-            src, crash_document, fields=self.SUPERSEARCH_FIELDS, all_keys=all_valid_keys
-        )
+        document_builder.build({"processed_crash": processed_crash}, crash_document)
 
         # Capture crash data size metrics
         self.capture_crash_metrics(crash_document)
 
+        if self.bulk_max_documents > 1:
+            pending = self._buffer_document(crash_id, index_name, crash_document)
+            # Block until the document is indexed; this raises an exception if the
+            # document failed to index
+            pending.future.result()
+            return
+
         self._submit_crash_to_elasticsearch(
             crash_id=crash_id,
             index_name=index_name,
@@ -573,13 +776,91 @@ class ESCrashStorage(CrashStorageBase):
                 "index", value=elapsed_time * 1000.0, tags=["outcome:" + index_outcome]
             )
 
+    def _remove_bad_field(self, crash_document, error):
+        """Remove the field that caused an indexing error from the crash document
+
+        :arg crash_document: the document that failed to index
+        :arg error: the ``error`` part of the Elasticsearch error response
+
+        :returns: True if a field was removed and the document should be indexed
+            again; False if the error can't be fixed
+
+        """
+        field_name = None
+
+        if (
+            error["type"] == "document_parsing_exception"
+            and error["caused_by"]["type"] == "illegal_argument_exception"
+            and error["reason"].startswith(
+                "Document contains at least one immense term"
+            )
+        ):
+            # This is caused by a string that is way too long for
+            # Elasticsearch, specifically 32_766 bytes when UTF8 encoded.
+            matches = self.field_name_string_error_re.findall(error["reason"])
+            if matches:
+                field_name = matches[0]
+                self.metrics.incr("indexerror", tags=["error:maxbyteslengthexceeded"])
+
+        elif (
+            error["type"] == "document_parsing_exception"
+            and error["caused_by"]["type"] == "number_format_exception"
+        ):
+            # This is caused by a number that is either too big for
+            # Elasticsearch or just not a number.
+            matches = self.field_name_number_error_re.findall(error["reason"])
+            if matches:
+                field_name = matches[0]
+                self.metrics.incr("indexerror", tags=["error:numberformatexception"])
+
+        elif (
+            error["type"] == "document_parsing_exception"
+            and error["caused_by"]["type"] == "illegal_argument_exception"
+        ):
+            # This is caused by field values that are nested for a field where a
+            # previously indexed value was a string. For example, the processor
+            # first indexes ModuleSignatureInfo value as a string, then tries to
+            # index ModuleSignatureInfo as a nested dict.
+            matches = self.field_name_unknown_property_error_re.findall(error["reason"])
+            if matches:
+                field_name = matches[0]
+                self.metrics.incr("indexerror", tags=["error:unknownproperty"])
+
+        if not field_name:
+            # We are unable to parse which field to remove, we cannot try to fix the
+            # document.
+            self.metrics.incr("indexerror", tags=["error:unhandled"])
+            return False
+
+        if field_name.endswith(".full"):
+            # Remove the `.full` at the end, that is a special mapping construct
+            # that is not part of the real field name.
+            field_name = field_name.removesuffix(".full")
+
+        # Now remove that field from the document before trying again.
+        field_path = field_name.split(".")
+        parent = crash_document
+        for i, field in enumerate(field_path):
+            if i == len(field_path) - 1:
+                # This is the last level, so `field` contains the name
+                # of the field that we want to remove from `parent`.
+                del parent[field]
+            else:
+                parent = parent[field]
+
+        # Add a note in the document that a field has been removed.
+        if crash_document.get("removed_fields"):
+            crash_document["removed_fields"] = "{} {}".format(
+                crash_document["removed_fields"], field_name
+            )
+        else:
+            crash_document["removed_fields"] = field_name
+
+        return True
+
     def _submit_crash_to_elasticsearch(self, crash_id, index_name, crash_document):
         """Submit a crash report to elasticsearch"""
-        # Attempt to create the index; it's OK if it already exists.
-
-        # FIXME(willkg): we shouldn't do this--instead we should try to index and create
-        # the index if the index doesn't exist
-        self.create_index(index_name)
+        self.ensure_index(index_name)
 
         # Submit the crash for indexing.
         # Don't retry more than 5 times. That is to avoid infinite loops in
@@ -593,93 +874,26 @@ class ESCrashStorage(CrashStorageBase):
                 # If this is a connection error, sleep a second and then try again
                 time.sleep(1.0)
 
+            except elasticsearch.NotFoundError as e:
+                if not is_index_not_found(e.body):
+                    raise
+
+                # The index was deleted since we saw it, so create it and try again
+                self.forget_index(index_name)
+                self.create_index(index_name)
+
             except elasticsearch.BadRequestError as e:
                 # If this is a BadRequestError, we try to figure out what the error
                 # is and fix the document and try again
-                field_name = None
-
-                error = e.body["error"]
-
-                if (
-                    error["type"] == "document_parsing_exception"
-                    and error["caused_by"]["type"] == "illegal_argument_exception"
-                    and error["reason"].startswith(
-                        "Document contains at least one immense term"
-                    )
-                ):
-                    # This is caused by a string that is way too long for
-                    # Elasticsearch, specifically 32_766 bytes when UTF8 encoded.
-                    matches = self.field_name_string_error_re.findall(error["reason"])
-                    if matches:
-                        field_name = matches[0]
-                        self.metrics.incr(
-                            "indexerror", tags=["error:maxbyteslengthexceeded"]
-                        )
-
-                elif (
-                    error["type"] == "document_parsing_exception"
-                    and error["caused_by"]["type"] == "number_format_exception"
-                ):
-                    # This is caused by a number that is either too big for
-                    # Elasticsearch or just not a number.
-                    matches = self.field_name_number_error_re.findall(error["reason"])
-                    if matches:
-                        field_name = matches[0]
-                        self.metrics.incr(
-                            "indexerror", tags=["error:numberformatexception"]
-                        )
-
-                elif (
-                    error["type"] == "document_parsing_exception"
-                    and error["caused_by"]["type"] == "illegal_argument_exception"
-                ):
-                    # This is caused by field values that are nested for a field where a
-                    # previously indexed value was a string. For example, the processor
-                    # first indexes ModuleSignatureInfo value as a string, then tries to
-                    # index ModuleSignatureInfo as a nested dict.
-                    matches = self.field_name_unknown_property_error_re.findall(
-                        error["reason"]
-                    )
-                    if matches:
-                        field_name = matches[0]
-                        self.metrics.incr("indexerror", tags=["error:unknownproperty"])
-
-                if not field_name:
-                    # We are unable to parse which field to remove, we cannot
-                    # try to fix the document. Let it raise.
+                if not self._remove_bad_field(crash_document, e.body["error"]):
                     self.logger.critical(
                         "Submission to Elasticsearch failed for %s (%s)",
                         crash_id,
                         e,
                         exc_info=True,
                     )
-                    self.metrics.incr("indexerror", tags=["error:unhandled"])
                     raise
 
-                if field_name.endswith(".full"):
-                    # Remove the `.full` at the end, that is a special mapping construct
-                    # that is not part of the real field name.
-                    field_name = field_name.removesuffix(".full")
-
-                # Now remove that field from the document before trying again.
-                field_path = field_name.split(".")
-                parent = crash_document
-                for i, field in enumerate(field_path):
-                    if i == len(field_path) - 1:
-                        # This is the last level, so `field` contains the name
-                        # of the field that we want to remove from `parent`.
-                        del parent[field]
-                    else:
-                        parent = parent[field]
-
-                # Add a note in the document that a field has been removed.
-                if crash_document.get("removed_fields"):
-                    crash_document["removed_fields"] = "{} {}".format(
-                        crash_document["removed_fields"], field_name
-                    )
-                else:
-                    crash_document["removed_fields"] = field_name
-
             except elasticsearch.ApiError as exc:
                 self.logger.critical(
                     "Submission to Elasticsearch failed for %s (%s)",
@@ -689,6 +903,201 @@ class ESCrashStorage(CrashStorageBase):
                 )
                 raise
 
+    def _buffer_document(self, crash_id, index_name, crash_document):
+        """Add a crash document to the bulk indexing buffer
+
+        :returns: the :py:class:`PendingDocument`
+
+        """
+        pending = PendingDocument(crash_id, index_name, crash_document)
+        with self._bulk_condition:
+            if self._bulk_flusher is None or not self._bulk_flusher.is_alive():
+                self._bulk_flusher = threading.Thread(
+                    name="esBulkFlusher", target=self._bulk_flusher_main, daemon=True
+                )
+                self._bulk_flusher.start()
+            thread = threading.current_thread()
+            self._bulk_savers[thread.ident] = thread
+            self._bulk_buffer.append(pending)
+            self._bulk_condition.notify_all()
+        return pending
+
+    def _count_bulk_savers(self):
+        """Return the number of live threads that buffer documents
+
+        This must be called with ``_bulk_condition`` held.
+
+        """
+        for ident, thread in list(self._bulk_savers.items()):
+            if not thread.is_alive():
+                del self._bulk_savers[ident]
+        return len(self._bulk_savers)
+
+    def _next_bulk_batch(self):
+        """Wait for buffered documents and return the next batch to index
+
+        Once there's a document in the buffer, this waits up to
+        ``bulk_flush_interval`` seconds for the buffer to fill up or for every
+        thread that buffers documents to be waiting on one.
+
+        """
+        with self._bulk_condition:
+            while not self._bulk_buffer:
+                self._bulk_condition.wait()
+
+            deadline = time.monotonic() + self.bulk_flush_interval
+            while len(self._bulk_buffer) < min(
+                self.bulk_max_documents, self._count_bulk_savers()
+            ):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._bulk_condition.wait(remaining)
+
+            batch = self._bulk_buffer[: self.bulk_max_documents]
+            del self._bulk_buffer[: self.bulk_max_documents]
+        return batch
+
+    def _bulk_flusher_main(self):
+        """Main function for the bulk flusher thread"""
+        while True:
+            batch = self._next_bulk_batch()
+            try:
+                self._submit_bulk_to_elasticsearch(batch)
+            except Exception as exc:
+                self.logger.exception("Bulk submission to Elasticsearch failed")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+
+    def _bulk_index(self, connection, batch):
+        """Index a batch of documents with a single bulk request
+
+        :returns: the list of per-document results in the same order as the batch
+
+        """
+        operations = []
+        for pending in batch:
+            operations.append(
+                {"index": {"_index": pending.index_name, "_id": pending.crash_id}}
+            )
+            operations.append(pending.crash_document)
+
+        try:
+            start_time = time.time()
+            resp = connection.bulk(operations=operations)
+            index_outcome = "successful"
+        except Exception:
+            index_outcome = "failed"
+            raise
+        finally:
+            elapsed_time = time.time() - start_time
+            self.metrics.histogram(
+                "bulk_index",
+                value=elapsed_time * 1000.0,
+                tags=["outcome:" + index_outcome],
+            )
+            self.metrics.histogram("bulk_documents", value=len(batch))
+
+        return [item["index"] for item in resp["items"]]
+
+    def _submit_bulk_to_elasticsearch(self, batch):
+        """Submit a batch of crash reports to Elasticsearch with bulk requests
+
+        Documents that fail to index because of a bad field have that field removed
+        like in :py:meth:`_submit_crash_to_elasticsearch`. Only documents that failed
+        are sent again.
+
+        Problems handling one document, like failing to create its index, only fail
+        that document.
+
+        """
+        for index_name in sorted({pending.index_name for pending in batch}):
+            try:
+                self.ensure_index(index_name)
+            except Exception as exc:
+                self.logger.exception("Unable to create index %s", index_name)
+                for pending in batch:
+                    if pending.index_name == index_name:
+                        pending.future.set_exception(exc)
+                batch = [
+                    pending for pending in batch if pending.index_name != index_name
+                ]
+
+        # Don't retry more than 5 times. That is to avoid infinite loops in
+        # case of an unhandled exception.
+        for _ in range(5):
+            if not batch:
+                return
+
+            try:
+                with self.client() as conn:
+                    results = self._bulk_index(conn, batch)
+
+            except elasticsearch.ConnectionError:
+                # If this is a connection error, sleep a second and then try again
+                time.sleep(1.0)
+                continue
+
+            retry = []
+            # index name -> exception from recreating it or None
+            recreated = {}
+            overloaded = False
+            for pending, result in zip(batch, results, strict=True):
+                try:
+                    error = result.get("error")
+                    if not error:
+                        pending.future.set_result(None)
+
+                    elif result["status"] == 429 or result["status"] >= 500:
+                        # Elasticsearch is overloaded or had a problem, so try again
+                        retry.append(pending)
+                        overloaded = True
+
+                    elif is_index_not_found({"error": error}):
+                        # The index was deleted since we saw it, so create it and try
+                        # again
+                        if pending.index_name not in recreated:
+                            recreated[pending.index_name] = None
+                            try:
+                                self.forget_index(pending.index_name)
+                                self.create_index(pending.index_name)
+                            except Exception as exc:
+                                recreated[pending.index_name] = exc
+                                raise
+                        elif recreated[pending.index_name] is not None:
+                            raise recreated[pending.index_name]
+                        retry.append(pending)
+
+                    elif self._remove_bad_field(pending.crash_document, error):
+                        retry.append(pending)
+
+                    else:
+                        self.logger.critical(
+                            "Submission to Elasticsearch failed for %s (%s)",
+                            pending.crash_id,
+                            error,
+                        )
+                        pending.future.set_exception(
+                            BulkIndexError(f"{pending.crash_id}: {error}")
+                        )
+
+                except Exception as exc:
+                    self.logger.exception(
+                        "Submission to Elasticsearch failed for %s", pending.crash_id
+                    )
+                    pending.future.set_exception(exc)
+
+            if overloaded:
+                # Give Elasticsearch a moment before trying again
+                time.sleep(1.0)
+            batch = retry
+
+        for pending in batch:
+            pending.future.set_exception(
+                BulkIndexError(f"{pending.crash_id}: gave up after 5 attempts")
+            )
+
     def catalog_crash(self, crash_id):
         """Return a list of data items for this crash id"""
         contents = []
@@ -85,6 +85,7 @@ class SearchBase:
         SearchFilter("_aggs.product.version"),
         SearchFilter("_aggs.product.version.platform"),  # convenient for tests
         SearchFilter("_aggs.android_cpu_abi.android_manufacturer.android_model"),
+        SearchFilter("_approximate_total", data_type="bool", default=False),
         SearchFilter(
             "_columns", default=["uuid", "date", "signature", "product", "version"]
         ),
@@ -93,6 +94,7 @@ class SearchBase:
         SearchFilter("_results_number", data_type="int", default=100),
         SearchFilter("_results_offset", data_type="int", default=0),
         SearchFilter("_return_query", data_type="bool", default=False),
+        SearchFilter("_search_after", default=""),
         SearchFilter("_sort", default=""),
     )
 
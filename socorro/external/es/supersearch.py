@@ -2,7 +2,10 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import base64
+import binascii
 import datetime
+import json
 import re
 from collections import defaultdict
 from contextlib import suppress
@@ -18,6 +21,55 @@ from socorro.lib import BadArgumentError, MissingArgumentError, libdatetime
 BAD_INDEX_REGEX = re.compile(r"\[\[(.*)\] missing\]")
 ELASTICSEARCH_PARSE_EXCEPTION_REGEX = re.compile(r"\[([^\]]+)\] could not be parsed")
 
+# Maximum number of hits Elasticsearch counts for the total of searches that
+# return no hits and set _approximate_total
+APPROXIMATE_TOTAL_HITS = 10_000
+
+# Field used to break ties when sorting so search_after pagination doesn't skip or
+# repeat hits
+TIEBREAKER_SORT_FIELD = "processed_crash.uuid"
+
+
+def encode_search_after(sort_fields, values):
+    """Encode the sort values of the last hit of a page into an opaque cursor
+
+    :arg list sort_fields: the Elasticsearch sort fields of the search
+    :arg list values: the sort values of the last hit
+
+    :returns: cursor as a url-safe str
+
+    """
+    data = json.dumps({"sort": sort_fields, "after": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def decode_search_after(cursor, sort_fields):
+    """Decode a cursor from encode_search_after
+
+    :arg str cursor: the cursor
+    :arg list sort_fields: the Elasticsearch sort fields of the search; these must be
+        the same as the ones the cursor was created with
+
+    :returns: list of sort values to search after
+
+    :raises BadArgumentError: if the cursor isn't valid for this search
+
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        after = data["after"]
+        cursor_sort_fields = data["sort"]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as exc:
+        raise BadArgumentError(
+            "_search_after", msg="_search_after is not a valid cursor"
+        ) from exc
+
+    if cursor_sort_fields != sort_fields or len(after) != len(sort_fields):
+        raise BadArgumentError(
+            "_search_after", msg="_search_after cursor is for a different _sort"
+        )
+    return after
+
 
 def prune_invalid_indices(indices, policy, template):
     """Prunes given indices by ones that were prior to the cutoff
@@ -387,9 +439,27 @@ class SuperSearch(SearchBase):
 
                 sort_fields.append(field_name)
 
+        # Pagination with a cursor requires a sort with a unique tiebreaker
+        search_after = params["_search_after"][0].value[0]
+        if sort_fields or search_after:
+            if not any(
+                field.lstrip("-") == TIEBREAKER_SORT_FIELD for field in sort_fields
+            ):
+                sort_fields.append(TIEBREAKER_SORT_FIELD)
+
         search = search.sort(*sort_fields)
 
         # Pagination.
+        if search_after:
+            if results_from:
+                raise BadArgumentError(
+                    "_results_offset",
+                    msg="_results_offset cannot be used with _search_after",
+                )
+            search = search.extra(
+                search_after=decode_search_after(search_after, sort_fields)
+            )
+
         results_to = results_from + results_number
         if results_to > 10_000:
             # In ES 8+ index.max_result_window defaults to 10,000
@@ -400,6 +470,14 @@ class SuperSearch(SearchBase):
             )
         search = search[results_from:results_to]
 
+        # Get the total from the search response instead of running a separate count
+        # query. Searches that only want facets can ask for an approximate total,
+        # which stops counting at APPROXIMATE_TOTAL_HITS.
+        if params["_approximate_total"][0].value[0] and results_number == 0:
+            search = search.extra(track_total_hits=APPROXIMATE_TOTAL_HITS)
+        else:
+            search = search.extra(track_total_hits=True)
+
         # Create facets.
         if facets_size:
             self._create_aggregations(params, search, facets_size, histogram_intervals)
@@ -412,6 +490,7 @@ class SuperSearch(SearchBase):
             return {"query": search.to_dict(), "indices": indices}
 
         errors = []
+        last_sort = None
 
         # We call elasticsearch with a computed list of indices, based on
         # the date range. However, if that list contains indices that do not
@@ -423,8 +502,9 @@ class SuperSearch(SearchBase):
                 results = search.execute()
                 for hit in results:
                     hits.append(self.format_fields(hit.to_dict()))
+                    last_sort = getattr(hit.meta, "sort", None)
 
-                total = search.count()
+                total = results.hits.total.value
 
                 aggregations = getattr(results, "aggregations", {})
                 if isinstance(aggregations, AggResponse):
@@ -528,7 +608,14 @@ class SuperSearch(SearchBase):
                     {"type": "shards", "index": index, "shards_count": shards_count}
                 )
 
-        return {"hits": hits, "total": total, "facets": aggregations, "errors": errors}
+        ret = {"hits": hits, "total": total, "facets": aggregations, "errors": errors}
+
+        # If the page is full, there may be more hits, so return a cursor for the
+        # next page
+        if sort_fields and results_number and len(hits) == results_number and last_sort:
+            ret["search_after"] = encode_search_after(sort_fields, list(last_sort))
+
+        return ret
 
     def _create_aggregations(self, params, search, facets_size, histogram_intervals):
         # Create facets.
@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
 
@@ -13,6 +14,7 @@ from more_itertools import chunked
 from socorro.external.crashstorage_base import (
     CrashStorageBase,
     CrashIDNotFound,
+    FileDumpsMapping,
     MemoryDumpsMapping,
     get_datestamp,
     dict_to_str,
@@ -68,12 +70,15 @@ class GcsCrashStorage(CrashStorageBase):
         bucket="crashstats",
         dump_file_suffix=".dump",
         metrics_prefix="processor.gcs",
+        dump_download_workers=4,
     ):
         """
         :arg bucket: the GCS bucket to save to
         :arg dump_file_suffix: the suffix used to identify a dump file (for use in temp
             files)
         :arg metrics_prefix: the metrics prefix for markus
+        :arg dump_download_workers: the maximum number of dumps to download
+            concurrently for a single crash report
 
         """
         super().__init__()
@@ -92,6 +97,7 @@ class GcsCrashStorage(CrashStorageBase):
 
         self.bucket = bucket
         self.dump_file_suffix = dump_file_suffix
+        self.dump_download_workers = dump_download_workers
 
     def delete_file(self, path):
         bucket = self.client.bucket(self.bucket)
@@ -103,6 +109,17 @@ class GcsCrashStorage(CrashStorageBase):
         blob = bucket.blob(path)
         return blob.download_as_bytes()
 
+    def load_file_to_filename(self, path, filename):
+        """Stream an object to a file without holding it in memory.
+
+        :arg path: the key of the object to download
+        :arg filename: the path of the file to write to
+
+        """
+        bucket = self.client.bucket(self.bucket)
+        blob = bucket.blob(path)
+        blob.download_to_filename(filename)
+
     def save_file(self, path, data):
         bucket = self.client.bucket(self.bucket)
         blob = bucket.blob(path)
@@ -207,44 +224,90 @@ class GcsCrashStorage(CrashStorageBase):
         except NotFound as exc:
             raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
 
+    def get_dump_names(self, crash_id):
+        """Get the names of the dumps for a given crash id.
+
+        :returns: list of dump names
+
+        :raises NotFound: if the dump names file does not exist
+
+        """
+        path = build_keys("dump_names", crash_id)[0]
+        dump_names_as_string = self.load_file(path)
+        return str_to_list(dump_names_as_string)
+
+    def _map_dumps(self, func, *iterables):
+        """Like map(), but runs calls concurrently in a pool of threads.
+
+        Most crash reports have a single dump, so this skips the pool when there's
+        nothing to run concurrently.
+
+        :returns: list of results in order
+
+        """
+        workers = min(self.dump_download_workers, len(iterables[0]))
+        if workers <= 1:
+            return list(map(func, *iterables))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, *iterables))
+
     def get_dumps(self, crash_id):
         """Get all the dump files for a given crash id.
 
+        Dumps are downloaded concurrently.
+
         :returns MemoryDumpsMapping:
 
         :raises CrashIDNotFound: if file does not exist
 
         """
         try:
-            path = build_keys("dump_names", crash_id)[0]
-            dump_names_as_string = self.load_file(path)
-            dump_names = str_to_list(dump_names_as_string)
-
-            dumps = MemoryDumpsMapping()
-            for dump_name in dump_names:
+            dump_names = []
+            for dump_name in self.get_dump_names(crash_id):
                 if dump_name in (None, "", "upload_file_minidump"):
                     dump_name = "dump"
-                path = build_keys(dump_name, crash_id)[0]
-                dumps[dump_name] = self.load_file(path)
-            return dumps
+                dump_names.append(dump_name)
+
+            paths = [build_keys(dump_name, crash_id)[0] for dump_name in dump_names]
+            data = self._map_dumps(self.load_file, paths)
+            return MemoryDumpsMapping(zip(dump_names, data))
         except NotFound as exc:
             raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
 
     def get_dumps_as_files(self, crash_id, tmpdir):
         """Get the dump files for given crash id and save them to tmp.
 
+        Dumps are downloaded concurrently and streamed straight to files in tmpdir
+        so they're never held in memory.
+
         :returns: dict of dumpname -> file path
 
         :raises CrashIDNotFound: if file does not exist
 
         """
-        in_memory_dumps = self.get_dumps(crash_id)
-        # convert our native memory dump mapping into a file dump mapping.
-        return in_memory_dumps.as_file_dumps_mapping(
-            crash_id,
-            tmpdir,
-            self.dump_file_suffix,
-        )
+        try:
+            dumps = FileDumpsMapping()
+            paths = []
+            for dump_name in self.get_dump_names(crash_id):
+                if dump_name in (None, "", "upload_file_minidump", "dump"):
+                    dump_name = "upload_file_minidump"
+                    key_name = "dump"
+                else:
+                    key_name = dump_name
+                if dump_name in dumps:
+                    continue
+                dump_pathname = os.path.join(
+                    tmpdir,
+                    f"{crash_id}.{dump_name}.TEMPORARY{self.dump_file_suffix}",
+                )
+                dumps[dump_name] = dump_pathname
+                paths.append(build_keys(key_name, crash_id)[0])
+
+            self._map_dumps(self.load_file_to_filename, paths, list(dumps.values()))
+            return dumps
+        except NotFound as exc:
+            raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
 
     def get_processed_crash(self, crash_id):
         """Get the processed crash.
@@ -5,6 +5,8 @@
 from functools import partial
 import logging
 import os
+import threading
+import time
 
 from google.cloud.pubsub_v1 import PublisherClient, SubscriberClient
 from google.cloud.pubsub_v1.types import BatchSettings, PublisherOptions
@@ -12,6 +14,7 @@ from more_itertools import chunked
 import sentry_sdk
 
 from socorro.external.crashqueue_base import CrashQueueBase
+from socorro.libmarkus import METRICS
 
 
 logger = logging.getLogger(__name__)
@@ -81,6 +84,42 @@ class PubSubCrashQueue(CrashQueueBase):
         $ export GOOGLE_APPLICATION_CREDENTIALS="/path/to/keyfile.json"
 
 
+    **Scheduling**
+
+    The priority subscription is a strict-priority lane. It's pulled first in
+    every round and, while crash ids from the other subscriptions are being
+    yielded, at least every ``priority_poll_interval`` seconds. Crash ids from the
+    priority subscription have ``priority=True`` in their kwargs so task managers
+    can put them ahead of crash ids waiting in their internal queues.
+
+    The standard and reprocessing subscriptions share each round by weight. Their
+    ``*_pull_max_messages`` values are the weights. When a round has a backlog
+    (a pull came back full), the next round pulls twice as many messages from
+    each subscription, keeping the ratio between subscriptions, up to
+    ``pull_max_messages_limit`` for a single pull. When no pull comes back full,
+    pulls go back to ``*_pull_max_messages``. A large reprocessing run can't starve
+    standard processing this way.
+
+    Crash ids that have been pulled, but not acknowledged yet are outstanding. If
+    ``max_outstanding_messages`` is set, pulls are sized so there are never more
+    than that many outstanding crash ids. When the limit is reached, the iterator
+    waits for crash ids to be acknowledged and then pulls more rather than
+    stopping. The processor sets the limit to what its task manager can hold
+    unless it's configured.
+
+    The wait is bounded by ``capacity_wait_timeout`` seconds. If there's still no
+    room after that, the stall is logged and the iterator ends so the task manager
+    gets a chance to check whether it's shutting down before iterating again.
+    Crash ids that are outstanding for longer than ``ack_deadline`` seconds stop
+    counting against the limit; Pub/Sub has redelivered them by then, so a crash id
+    that's never finished can't hold on to a slot forever.
+
+    Acknowledgements are buffered and sent in batches of up to ``ack_batch_size``
+    ack ids. Buffered acknowledgements are sent at least every
+    ``ack_flush_interval`` seconds and when the crash queue is closed. Ack ids
+    that don't get sent are redelivered after the acknowledgement deadline.
+
+
     **Local emulator**
 
     If you set the environment variable ``PUBSUB_EMULATOR_HOST=host:port``,
@@ -102,6 +141,13 @@ class PubSubCrashQueue(CrashQueueBase):
         reprocessing_pull_max_messages=1,
         publish_max_messages=10,
         publish_timeout=5,
+        pull_max_messages_limit=50,
+        max_outstanding_messages=None,
+        ack_batch_size=50,
+        ack_flush_interval=1.0,
+        priority_poll_interval=1.0,
+        ack_deadline=300,
+        capacity_wait_timeout=10.0,
     ):
         """
         :arg project_id: Google Compute Platform project_id
@@ -112,15 +158,30 @@ class PubSubCrashQueue(CrashQueueBase):
         :arg reprocessing_topic_name: topic name for the reprocessing queue
         :arg reprocessing_subscription_name: subscription name for the reprocessing
             queue
-        :arg standard_pull_max_messages: maximum number of messages to pull
-            from Google Pub/Sub in a single request
+        :arg standard_pull_max_messages: number of messages to pull from the
+            standard queue in a round; this is the standard queue's weight
         :arg priority_pull_max_messages: maximum number of messages to pull
             from Google Pub/Sub in a single request
-        :arg reprocessing_pull_max_messages: maximum number of messages to pull
-            from Google Pub/Sub in a single request
+        :arg reprocessing_pull_max_messages: number of messages to pull from the
+            reprocessing queue in a round; this is the reprocessing queue's weight
         :arg publish_max_messages: maximum number of messages to publish to Google
             Pub/Sub in a single request
         :arg publish_timeout: rpc timeout for publish requests
+        :arg pull_max_messages_limit: maximum number of messages to pull from a
+            subscription with a backlog in a single request
+        :arg max_outstanding_messages: maximum number of messages pulled, but not
+            acknowledged yet; None for no limit
+        :arg ack_batch_size: maximum number of messages to acknowledge in a single
+            request; 1 acknowledges every message as soon as it's done
+        :arg ack_flush_interval: maximum number of seconds to buffer
+            acknowledgements for
+        :arg priority_poll_interval: maximum number of seconds between pulls from
+            the priority queue while yielding crash ids from other queues
+        :arg ack_deadline: the acknowledgement deadline of the subscriptions in
+            seconds; outstanding crash ids older than this stop counting against
+            ``max_outstanding_messages``
+        :arg capacity_wait_timeout: maximum number of seconds to wait for room
+            for more outstanding messages before returning from the iterator
 
         """
 
@@ -171,74 +232,342 @@ class PubSubCrashQueue(CrashQueueBase):
             self.subscriber, project_id, reprocessing_subscription_name
         )
 
-        # Order matters here, and is checked in tests
-        self.subscription_paths = [
-            (self.standard_subscription_path, standard_pull_max_messages),
-            (self.priority_subscription_path, priority_pull_max_messages),
-            (self.reprocessing_subscription_path, reprocessing_pull_max_messages),
+        self.priority_pull_max_messages = priority_pull_max_messages
+
+        # (queue name, subscription path, weight) for subscriptions that share
+        # rounds by weight; order matters here, and is checked in tests
+        self.weighted_subscriptions = [
+            ("standard", self.standard_subscription_path, standard_pull_max_messages),
+            (
+                "reprocessing",
+                self.reprocessing_subscription_path,
+                reprocessing_pull_max_messages,
+            ),
         ]
+        self.priority_poll_interval = priority_poll_interval
 
         self.publish_max_messages = publish_max_messages
+        self.pull_max_messages_limit = pull_max_messages_limit
+        self.max_outstanding_messages = max_outstanding_messages
+        self.ack_batch_size = max(ack_batch_size or 1, 1)
+        self.ack_flush_interval = ack_flush_interval
+        self.ack_deadline = ack_deadline
+        self.capacity_wait_timeout = capacity_wait_timeout
+
+        # Guards pending_acks and outstanding_deadlines; notified when messages are
+        # finished
+        self.ack_condition = threading.Condition()
+        # subscription path -> list of ack ids to acknowledge
+        self.pending_acks = {}
+        # ack id -> time.monotonic() value after which Pub/Sub will have redelivered
+        # the message, for messages yielded, but not finished yet
+        self.outstanding_deadlines = {}
+
+        self.ack_flusher = None
+        self.ack_flusher_quit = threading.Event()
+
+    @property
+    def outstanding(self):
+        """Number of messages yielded, but not finished yet"""
+        return len(self.outstanding_deadlines)
+
+    def set_capacity(self, capacity):
+        # An explicitly configured limit wins
+        if self.max_outstanding_messages is None:
+            self.max_outstanding_messages = capacity
+
+    def close(self):
+        if self.ack_flusher is not None:
+            self.ack_flusher_quit.set()
+            self.ack_flusher.join()
+            self.ack_flusher = None
+        self.flush_acks()
 
     def ack_crash(self, subscription_path, ack_id):
         """Acknowledges a crash
 
+        If acknowledgements are batched, this adds the ack_id to the buffer. The
+        buffer is flushed when it's full or by the flusher thread.
+
+        :arg subscription_path: the subscription path for the queue
+        :arg ack_id: the ack_id for the message to acknowledge
+
+        """
+        if self.ack_batch_size <= 1:
+            self.subscriber.acknowledge(
+                subscription=subscription_path, ack_ids=[ack_id]
+            )
+            logger.debug("ack %s from %s", ack_id, subscription_path)
+            return
+
+        with self.ack_condition:
+            pending = self.pending_acks.setdefault(subscription_path, [])
+            pending.append(ack_id)
+            is_full = len(pending) >= self.ack_batch_size
+
+        if is_full:
+            self.flush_acks()
+        else:
+            self._start_ack_flusher()
+
+    def finish_crash(self, queue, subscription_path, ack_id, publish_time, acked=True):
+        """Marks a yielded crash as finished and acknowledges it
+
+        This is the ``finished_func`` for crashes yielded by the iterator.
+
+        :arg queue: the name of the queue
         :arg subscription_path: the subscription path for the queue
         :arg ack_id: the ack_id for the message to acknowledge
+        :arg publish_time: the time the message was published in seconds since epoch
+        :arg acked: False if the crash was lost; it stops counting as outstanding,
+            but isn't acknowledged, so it gets redelivered after the
+            acknowledgement deadline
+
+        """
+        with self.ack_condition:
+            self.outstanding_deadlines.pop(ack_id, None)
+            self.ack_condition.notify_all()
+
+        if not acked:
+            logger.warning("released %s from %s without ack", ack_id, subscription_path)
+            return
+
+        METRICS.timing(
+            "processor.pubsub.time_to_finish",
+            value=(time.time() - publish_time) * 1000,
+            tags=[f"queue:{queue}"],
+        )
+        self.ack_crash(subscription_path, ack_id)
+
+    def flush_acks(self):
+        """Sends buffered acknowledgements
+
+        Failures are logged and sent to Sentry. Those messages are redelivered after
+        the acknowledgement deadline.
+
+        """
+        with self.ack_condition:
+            pending_acks = self.pending_acks
+            self.pending_acks = {}
+
+        for subscription_path, ack_ids in pending_acks.items():
+            for batch in chunked(ack_ids, self.ack_batch_size):
+                try:
+                    self.subscriber.acknowledge(
+                        subscription=subscription_path, ack_ids=batch
+                    )
+                except Exception as exc:
+                    sentry_sdk.capture_exception(exc)
+                    logger.exception(
+                        "failed to ack %s messages from %s",
+                        len(batch),
+                        subscription_path,
+                    )
+                    continue
+                logger.debug("ack %s from %s", batch, subscription_path)
+
+    def _start_ack_flusher(self):
+        """Starts the ack flusher thread if it's not running"""
+        with self.ack_condition:
+            if self.ack_flusher is not None:
+                return
+            self.ack_flusher_quit.clear()
+            self.ack_flusher = threading.Thread(
+                name="ackFlusherThread", target=self._ack_flusher_main, daemon=True
+            )
+            self.ack_flusher.start()
+
+    def _ack_flusher_main(self):
+        """Main function for the ack flusher thread"""
+        while not self.ack_flusher_quit.wait(self.ack_flush_interval):
+            self.flush_acks()
+
+    def _expire_outstanding(self):
+        """Stops counting messages past their acknowledgement deadline as outstanding
+
+        The caller must hold ``ack_condition``.
 
         """
-        self.subscriber.acknowledge(subscription=subscription_path, ack_ids=[ack_id])
-        logger.debug("ack %s from %s", ack_id, subscription_path)
+        now = time.monotonic()
+        expired = [
+            ack_id
+            for ack_id, deadline in self.outstanding_deadlines.items()
+            if deadline <= now
+        ]
+        if not expired:
+            return
+
+        for ack_id in expired:
+            del self.outstanding_deadlines[ack_id]
+        logger.warning(
+            "%s outstanding messages passed the ack deadline without finishing",
+            len(expired),
+        )
+        METRICS.incr("processor.pubsub.outstanding_expired", value=len(expired))
+
+    def _wait_for_capacity(self):
+        """Waits until there's room for more outstanding messages
+
+        This waits at most ``capacity_wait_timeout`` seconds.
+
+        :returns: number of messages there's room for, 0 if there's still no room
+            after waiting, or None if there's no limit
+
+        """
+        if not self.max_outstanding_messages:
+            return None
+
+        end_time = time.monotonic() + self.capacity_wait_timeout
+        with self.ack_condition:
+            while True:
+                self._expire_outstanding()
+                if self.outstanding < self.max_outstanding_messages:
+                    return self.max_outstanding_messages - self.outstanding
+
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(
+                        "no room for more messages after %ss: %s outstanding",
+                        self.capacity_wait_timeout,
+                        self.outstanding,
+                    )
+                    return 0
+                self.ack_condition.wait(timeout=min(remaining, 1.0))
+
+    def _pull(self, subscription_path, max_messages):
+        """Pulls messages from a subscription without waiting for messages
+
+        :returns: list of received messages
+
+        """
+        resp = self.subscriber.pull(
+            subscription=subscription_path,
+            max_messages=max_messages,
+            return_immediately=True,
+        )
+        return resp.received_messages
+
+    def _make_jobs(self, queue, subscription_path, msgs):
+        """Yields jobs for received messages
+
+        Test crash ids are acked and dropped.
+
+        """
+        now = time.time()
+        deadline = time.monotonic() + self.ack_deadline
+        for msg in msgs:
+            crash_id = msg.message.data.decode("utf-8")
+            ack_id = msg.ack_id
+            logger.debug("got %s from %s", crash_id, subscription_path)
+            if crash_id == "test":
+                # Ack and drop any test crash ids
+                self.ack_crash(subscription_path, ack_id)
+                continue
+
+            publish_time = msg.message.publish_time.timestamp()
+            METRICS.timing(
+                "processor.pubsub.message_age",
+                value=(now - publish_time) * 1000,
+                tags=[f"queue:{queue}"],
+            )
+
+            with self.ack_condition:
+                self.outstanding_deadlines[ack_id] = deadline
+            kwargs = {
+                "finished_func": partial(
+                    self.finish_crash, queue, subscription_path, ack_id, publish_time
+                )
+            }
+            if queue == "priority":
+                kwargs["priority"] = True
+            yield ((crash_id,), kwargs)
 
     def __iter__(self):
         """Return iterator over crash ids from Pub/Sub.
 
         Each returned crash is a ``(crash_id, {kwargs})`` tuple with
-        ``finished_func`` as the only key in ``kwargs``. The caller should call
-        ``finished_func`` when it's done processing the crash.
+        ``finished_func`` in ``kwargs``. The caller should call ``finished_func``
+        when it's done processing the crash. Crash ids from the priority queue also
+        have ``priority=True`` in ``kwargs``.
 
         """
-        while True:
-            has_msgs = {}
-            for subscription_path, pull_max_messages in self.subscription_paths:
-                if subscription_path is None:
-                    continue
+        weighted_subscriptions = [
+            (queue, subscription_path, weight)
+            for queue, subscription_path, weight in self.weighted_subscriptions
+            if subscription_path is not None
+        ]
+        total_weight = sum(weight for _, _, weight in weighted_subscriptions)
+        max_weight = max((weight for _, _, weight in weighted_subscriptions), default=1)
+        max_scale = max(self.pull_max_messages_limit // max_weight, 1)
+
+        # Round pull sizes are weight * scale
+        scale = 1
+
+        # Whether any pull in this round came back full; if so, there may be more
+        # messages
+        has_msgs = False
+
+        def pull_priority():
+            nonlocal has_msgs
+            if self.priority_subscription_path is None:
+                return []
+            msgs = self._pull(
+                self.priority_subscription_path, self.priority_pull_max_messages
+            )
+            if len(msgs) == self.priority_pull_max_messages:
+                has_msgs = True
+            return list(
+                self._make_jobs("priority", self.priority_subscription_path, msgs)
+            )
 
-                resp = self.subscriber.pull(
-                    subscription=subscription_path,
-                    max_messages=pull_max_messages,
-                    return_immediately=True,
-                )
-                msgs = resp.received_messages
+        while True:
+            has_msgs = False
 
-                # if pull returned the max number of messages, this subscription
-                # may have more messages.
-                has_msgs[subscription_path] = len(msgs) == pull_max_messages
+            # Strict priority lane goes first
+            yield from pull_priority()
+            last_priority_pull = time.monotonic()
 
-                if not msgs:
-                    continue
+            capacity = self._wait_for_capacity()
+            if capacity == 0:
+                # Return so the caller can check whether it's shutting down
+                return
 
-                for msg in msgs:
-                    crash_id = msg.message.data.decode("utf-8")
-                    ack_id = msg.ack_id
-                    logger.debug("got %s from %s", crash_id, subscription_path)
-                    if crash_id == "test":
-                        # Ack and drop any test crash ids
-                        self.ack_crash(subscription_path, ack_id)
-                        continue
-                    yield (
-                        (crash_id,),
-                        {
-                            "finished_func": partial(
-                                self.ack_crash, subscription_path, ack_id
-                            )
-                        },
+            batches = []
+            for queue, subscription_path, weight in weighted_subscriptions:
+                pull_size = weight * scale
+                if capacity is not None:
+                    # Split the room there is by weight
+                    pull_size = min(
+                        pull_size, max(capacity * weight // total_weight, 1)
                     )
 
-            if not any(has_msgs.values()):
+                msgs = self._pull(subscription_path, pull_size)
+
+                # if pull returned the max number of messages, this subscription
+                # may have more messages.
+                if len(msgs) == pull_size:
+                    has_msgs = True
+                batches.append((queue, subscription_path, msgs))
+
+            for queue, subscription_path, msgs in batches:
+                for job in self._make_jobs(queue, subscription_path, msgs):
+                    yield job
+
+                    # Yielding can block for a while when the consumer is busy, so
+                    # check the priority lane between crash ids
+                    if time.monotonic() - last_priority_pull >= (
+                        self.priority_poll_interval
+                    ):
+                        yield from pull_priority()
+                        last_priority_pull = time.monotonic()
+
+            if not has_msgs:
                 # There's nothing to process, so return
                 return
 
+            # Pull more next round if there's a backlog
+            scale = min(scale * 2, max_scale)
+
     def publish(self, queue, crash_ids):
         """Publish crash ids to specified queue.
 
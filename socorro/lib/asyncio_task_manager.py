@@ -0,0 +1,290 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Defines the AsyncioPipelineTaskManager.
+
+This module defines a task manager that splits each job into a series of stages. Each
+stage has its own bounded queue and its own set of asyncio workers, so different jobs
+can be in different stages at the same time. For example, while one job is in a
+CPU-bound stage, the next job can be in a stage that's waiting on the network.
+
+Jobs yielded by the job source iterator have the same shape as jobs for the
+ThreadedTaskManager. Instead of a single task function, the task manager takes a list
+of stages. Each stage function is a coroutine function that takes a
+:py:class:`PipelineJob`, does its work, stores results in ``job.data``, and returns
+True if the job should move on to the next stage or False if the job is done. After
+the last stage, or when a stage returns False or raises an exception, the job's
+cleanup functions and ``finished_func`` are called.
+
+Each stage has its own pool of threads with ``threads_per_worker`` threads per
+worker. Blocking work a stage runs with :py:func:`asyncio.to_thread` runs in that
+stage's threads, so one stage can't starve the others of threads.
+
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from attrs import define, field
+
+from socorro.libmarkus import METRICS
+from socorro.lib.task_manager import default_iterator, TaskManager
+
+
+@define
+class Stage:
+    #: name of the stage; used for configuration, logging, and metrics
+    name: str
+    #: coroutine function that takes a PipelineJob and returns True to continue
+    func: Callable
+    #: number of threads each worker can use at the same time for blocking work
+    threads_per_worker: int = 1
+
+
+@define
+class PipelineJob:
+    args: Tuple
+    kwargs: Dict[str, Any]
+    finished_func: Optional[Callable] = None
+    #: data passed between stages
+    data: Dict[str, Any] = field(factory=dict)
+    #: functions to call when the job is done, in reverse order
+    cleanup_funcs: List[Callable] = field(factory=list)
+    #: time the job was put in the current stage's queue
+    enqueued: float = 0.0
+
+
+NO_MORE_JOBS = object()
+
+# Name of the stage the current asyncio task is a worker for
+_current_stage = contextvars.ContextVar("current_stage", default=None)
+
+
+class StageThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool that runs each stage's work in that stage's own threads
+
+    This is the event loop's default executor. Work submitted from a stage worker
+    goes to the stage's pool; other work, like reading the job source, goes to this
+    pool.
+
+    """
+
+    def __init__(self, stage_workers, max_workers=1):
+        """
+        :arg stage_workers: dict of stage name -> number of threads for that stage
+        :arg max_workers: number of threads for work outside of stages
+        """
+        super().__init__(max_workers=max_workers, thread_name_prefix="pipeline")
+        self.stage_executors = {
+            name: ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=f"pipeline-{name}"
+            )
+            for name, workers in stage_workers.items()
+        }
+
+    def submit(self, fn, /, *args, **kwargs):
+        executor = self.stage_executors.get(_current_stage.get())
+        if executor is not None:
+            return executor.submit(fn, *args, **kwargs)
+        return super().submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        for executor in self.stage_executors.values():
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+class AsyncioPipelineTaskManager(TaskManager):
+    """Task manager that runs jobs through a pipeline of asyncio stages."""
+
+    #: this task manager takes stages rather than a task_func
+    uses_stages = True
+
+    def __init__(
+        self,
+        idle_delay=7,
+        quit_on_empty_queue=False,
+        stage_queue_size=4,
+        stage_concurrency=None,
+        job_source_iterator=default_iterator,
+        stages=None,
+    ):
+        """
+        :arg idle_delay: the delay in seconds if no job is found
+        :arg quit_on_empty_queue: stop if the queue is empty
+        :arg stage_queue_size: maximum size of each stage's queue
+        :arg stage_concurrency: dict of stage name -> number of workers for that
+            stage; stages not listed get one worker
+        :arg job_source_iterator: an iterator to serve as the source of data. it can
+            be of the form of a generator or iterator; a function that returns an
+            iterator; a instance of an iterable object; or a class that when
+            instantiated with a config object can be iterated. The iterator must
+            yield a tuple consisting of a function's tuple of args and, optionally,
+            a mapping of kwargs. Ex:  (('a', 17), {'x': 23})
+        :arg stages: list of :py:class:`Stage` instances
+        """
+        super().__init__(
+            idle_delay=idle_delay,
+            quit_on_empty_queue=quit_on_empty_queue,
+            job_source_iterator=job_source_iterator,
+        )
+        self.stage_queue_size = stage_queue_size or 4
+        self.stage_concurrency = stage_concurrency or {}
+        self.stages = stages or []
+        if not self.stages:
+            raise ValueError("AsyncioPipelineTaskManager requires at least one stage")
+
+    def get_concurrency(self, stage):
+        return self.stage_concurrency.get(stage.name) or 1
+
+    @property
+    def capacity(self):
+        return sum(self.get_concurrency(stage) for stage in self.stages) + (
+            self.stage_queue_size * len(self.stages)
+        )
+
+    def blocking_start(self):
+        """Runs the pipeline until the job source is exhausted or quit is requested.
+
+        On KeyboardInterrupt, this stops pulling new jobs and finishes jobs that are
+        already in the pipeline before returning.
+
+        """
+        try:
+            asyncio.run(self._run())
+        except KeyboardInterrupt:
+            self.logger.debug("pipeline gets quit request")
+        finally:
+            self.quit = True
+            self.logger.debug("AsyncioPipelineTaskManager dies quietly")
+
+    async def _run(self):
+        # Stage functions use threads for blocking work, so give each stage threads
+        # for its workers
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(
+            StageThreadPoolExecutor(
+                {
+                    stage.name: self.get_concurrency(stage) * stage.threads_per_worker
+                    for stage in self.stages
+                }
+            )
+        )
+
+        queues = [asyncio.Queue(self.stage_queue_size) for _ in self.stages]
+        workers = []
+        for i, stage in enumerate(self.stages):
+            next_queue = queues[i + 1] if i + 1 < len(queues) else None
+            for _ in range(self.get_concurrency(stage)):
+                workers.append(
+                    asyncio.create_task(
+                        self._stage_worker(stage, queues[i], next_queue)
+                    )
+                )
+
+        try:
+            await self._queue_jobs(queues[0])
+        except asyncio.CancelledError:
+            # asyncio.run cancels the main task on KeyboardInterrupt; stop
+            # queueing and drain the pipeline
+            self.logger.debug("queueing cancelled")
+            self.quit = True
+        finally:
+            self.logger.debug("draining pipeline")
+            # Each stage passes jobs to the next stage before marking them done, so
+            # joining the queues in order drains the pipeline
+            for stage_queue in queues:
+                await stage_queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _queue_jobs(self, first_queue):
+        """Reads jobs from the job source iterator and queues them."""
+        iterator = self._get_iterator()
+        while not self.quit:
+            # The job source iterator may block, so run it in a thread
+            job_params = await asyncio.to_thread(next, iterator, NO_MORE_JOBS)
+            if job_params is NO_MORE_JOBS:
+                return
+
+            if job_params is None:
+                if self.quit_on_empty_queue:
+                    return
+                await asyncio.sleep(self.idle_delay)
+                continue
+
+            self.logger.debug("received %r", job_params)
+            try:
+                args, kwargs = job_params
+            except ValueError:
+                args = job_params
+                kwargs = {}
+            kwargs = dict(kwargs)
+            finished_func = kwargs.pop("finished_func", None)
+            # Stage queues are FIFO, so priority jobs are run in order
+            kwargs.pop("priority", None)
+
+            job = PipelineJob(args=args, kwargs=kwargs, finished_func=finished_func)
+            job.enqueued = time.perf_counter()
+            await first_queue.put(job)
+
+    async def _stage_worker(self, stage, stage_queue, next_queue):
+        """Runs jobs from stage_queue through the stage."""
+        # This task's blocking work runs in the stage's threads
+        _current_stage.set(stage.name)
+        tags = [f"stage:{stage.name}"]
+        while True:
+            job = await stage_queue.get()
+            try:
+                start = time.perf_counter()
+                METRICS.gauge(
+                    "processor.pipeline.queue_size",
+                    value=stage_queue.qsize(),
+                    tags=tags,
+                )
+                METRICS.timing(
+                    "processor.pipeline.queue_wait",
+                    value=(start - job.enqueued) * 1000,
+                    tags=tags,
+                )
+
+                try:
+                    keep_going = await stage.func(job)
+                except Exception:
+                    self.logger.error(
+                        "Error in pipeline stage %s", stage.name, exc_info=True
+                    )
+                    keep_going = False
+
+                METRICS.timing(
+                    "processor.pipeline.stage_timing",
+                    value=(time.perf_counter() - start) * 1000,
+                    tags=tags,
+                )
+
+                if keep_going and next_queue is not None:
+                    job.enqueued = time.perf_counter()
+                    await next_queue.put(job)
+                else:
+                    await asyncio.to_thread(self._finish_job, job)
+            finally:
+                stage_queue.task_done()
+
+    def _finish_job(self, job):
+        """Calls the job's cleanup functions and finished_func."""
+        for cleanup_func in reversed(job.cleanup_funcs):
+            try:
+                cleanup_func()
+            except Exception:
+                self.logger.exception("Error calling cleanup function on %r", job.args)
+
+        if job.finished_func is not None:
+            try:
+                job.finished_func()
+            except Exception:
+                self.logger.exception("Error calling finished_func() on %r", job.args)
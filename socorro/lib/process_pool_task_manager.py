@@ -0,0 +1,491 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Defines the ProcessPoolTaskManager.
+
+This module defines a producer/consumer system where the consumers are worker
+processes rather than worker threads. A single queueing thread in the parent process
+reads the job source iterator and adds jobs to a queue of pending jobs. The parent
+process hands each pending job to an idle worker process over that worker process'
+own task queue, so it always knows which job each worker process has. Since each
+worker process has its own interpreter, CPU-bound task functions aren't contending
+for a single GIL.
+
+Jobs yielded by the job source iterator have the same shape as jobs for the
+ThreadedTaskManager. If a job has a ``finished_func`` kwarg, it's removed before the
+job is sent to a worker process and called in the parent process after the worker
+process reports the job is done. This lets crash queues keep their acknowledgement
+state and clients in the parent process. If a worker process dies while working on a
+job or before it started the job it was handed, the job's ``finished_func`` is called
+with ``acked=False`` so the crash queue can release the job without acknowledging it.
+
+Worker processes are created with the ``fork`` start method, so the task function and
+any state it closes over don't have to be picklable. Job arguments do have to be
+picklable.
+
+"""
+
+from collections import deque
+import itertools
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+from socorro.lib.task_manager import (
+    default_iterator,
+    default_task_func,
+    TaskManager,
+)
+
+
+STOP_TOKEN = (None, None)
+
+# Value in a worker process' current job slot when it doesn't have a job
+NO_JOB = -1
+
+
+def split_job_params(job_params):
+    """Split job params into args and kwargs.
+
+    :arg job_params: either ``(args, kwargs)`` or ``args``
+
+    :returns: ``(args, kwargs)`` tuple
+
+    """
+    try:
+        args, kwargs = job_params
+    except ValueError:
+        args = job_params
+        kwargs = {}
+    return args, kwargs
+
+
+def worker_process_main(task_func, task_queue, result_queue, slot):
+    """Main function for worker processes.
+
+    The worker pulls jobs from its task queue and executes them until it encounters a
+    STOP_TOKEN. When a job is done, ``(slot, job_id)`` is put on the result queue.
+
+    :arg task_func: the function to call with each job's args and kwargs
+    :arg task_queue: the queue to pull ``(job_id, args, kwargs)`` jobs from
+    :arg result_queue: the queue to put ``(slot, job_id)`` for finished jobs on
+    :arg slot: the index of this worker process
+
+    """
+    logger = logging.getLogger(__name__ + ".worker_process_main")
+
+    # The parent process handles KeyboardInterrupt and shuts down workers by sending
+    # them a STOP_TOKEN, so workers ignore SIGINT from the terminal's process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        task = task_queue.get()
+        if task == STOP_TOKEN:
+            logger.info("quits")
+            break
+
+        job_id, args, kwargs = task
+        try:
+            task_func(*args, **kwargs)
+        except Exception:
+            logger.error("Error in processing a job", exc_info=True)
+        finally:
+            result_queue.put((slot, job_id))
+
+
+class ProcessPoolTaskManager(TaskManager):
+    """Task manager that runs tasks in a pool of worker processes."""
+
+    def __init__(
+        self,
+        idle_delay=7,
+        quit_on_empty_queue=False,
+        number_of_processes=4,
+        maximum_queue_size=8,
+        job_source_iterator=default_iterator,
+        task_func=default_task_func,
+    ):
+        """
+        :arg idle_delay: the delay in seconds if no job is found
+        :arg quit_on_empty_queue: stop if the queue is empty
+        :arg number_of_processes: number of worker processes to run
+        :arg maximum_queue_size: maximum number of jobs waiting for a worker process;
+            jobs handed to worker processes don't count
+        :arg job_source_iterator: an iterator to serve as the source of data. it can
+            be of the form of a generator or iterator; a function that returns an
+            iterator; a instance of an iterable object; or a class that when
+            instantiated with a config object can be iterated. The iterator must
+            yield a tuple consisting of a function's tuple of args and, optionally,
+            a mapping of kwargs. Ex:  (('a', 17), {'x': 23})
+        :arg task_func: a function that will accept the args and kwargs yielded
+            by the job_source_iterator; this is run in the worker processes
+        """
+
+        # If number of processes is None, set it to default
+        if number_of_processes is None:
+            number_of_processes = 4
+
+        # If maximum queue size is None, set it to default
+        if maximum_queue_size is None:
+            maximum_queue_size = 8
+
+        super().__init__(
+            idle_delay=idle_delay,
+            quit_on_empty_queue=quit_on_empty_queue,
+            job_source_iterator=job_source_iterator,
+            task_func=task_func,
+        )
+        self.number_of_processes = number_of_processes
+        self.maximum_queue_size = maximum_queue_size
+
+        self.mp_context = multiprocessing.get_context("fork")
+        self.result_queue = None
+        self.process_list = []
+        # Each worker process' task queue and the id of the job it was handed
+        self.task_queues = []
+        self.current_jobs = []
+        # (job_id, args, kwargs) for jobs waiting for an idle worker process
+        self.pending_jobs = deque()
+
+        # Jobs that have been queued, but not finished yet; the semaphore bounds how
+        # many of those there are so the queueing thread doesn't get ahead of the
+        # worker processes
+        self.job_counter = itertools.count()
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
+        self.in_flight_semaphore = threading.BoundedSemaphore(
+            number_of_processes + maximum_queue_size
+        )
+
+        # Guards worker processes, their task queues and current jobs, and pending
+        # jobs
+        self.process_lock = threading.Lock()
+
+        self.queueing_thread = None
+        self.results_thread = None
+        self._stopping = False
+        self._stop_tokens_sent = False
+        self._results_thread_quit = False
+
+    @property
+    def capacity(self):
+        return self.number_of_processes + self.maximum_queue_size
+
+    def _start_worker_process(self, slot):
+        task_queue = self.mp_context.Queue()
+        process = self.mp_context.Process(
+            target=worker_process_main,
+            args=(self.task_func, task_queue, self.result_queue, slot),
+            daemon=True,
+        )
+        process.start()
+        self.task_queues[slot] = task_queue
+        self.current_jobs[slot] = NO_JOB
+        return process
+
+    def _dispatch_jobs(self):
+        """Hand pending jobs to idle worker processes.
+
+        This must be called with ``process_lock`` held.
+
+        """
+        for slot, process in enumerate(self.process_list):
+            if not self.pending_jobs:
+                break
+            if self.current_jobs[slot] != NO_JOB or not process.is_alive():
+                continue
+            job_id, args, kwargs = self.pending_jobs.popleft()
+            # Record the job before handing it over so there's no point where the
+            # worker process could have it without the parent knowing
+            self.current_jobs[slot] = job_id
+            self.task_queues[slot].put((job_id, args, kwargs))
+
+    def start(self):
+        """Starts worker processes, the results thread, and the queueing thread.
+
+        Worker processes are forked before any threads are started.
+
+        """
+        self.logger.debug("start")
+        self.result_queue = self.mp_context.Queue()
+        self.task_queues = [None] * self.number_of_processes
+        self.current_jobs = [NO_JOB] * self.number_of_processes
+
+        for slot in range(self.number_of_processes):
+            self.process_list.append(self._start_worker_process(slot))
+
+        self.results_thread = threading.Thread(
+            name="resultsThread", target=self._results_thread_func
+        )
+        self.results_thread.start()
+
+        self.queueing_thread = threading.Thread(
+            name="queueingThread", target=self._queueing_thread_func
+        )
+        self.queueing_thread.start()
+
+    def wait_for_completion(self):
+        """Blocks on queueing thread completion."""
+        if self.queueing_thread is None:
+            return
+
+        self.logger.debug("waiting to join queueing_thread")
+        while True:
+            try:
+                self.queueing_thread.join(1.0)
+                if not self.queueing_thread.is_alive():
+                    break
+            except KeyboardInterrupt:
+                self.logger.debug("quit detected by wait_for_completion")
+
+    def stop(self):
+        """Stop all worker processes."""
+        self.quit = True
+        self.wait_for_completion()
+
+    def blocking_start(self):
+        """Starts queueing thread and waits for it to complete.
+
+        If run by the main thread, it will detect the KeyboardInterrupt exception and
+        will stop worker processes after they finish the jobs they're working on.
+
+        """
+        try:
+            self.start()
+            self.wait_for_completion()
+        except KeyboardInterrupt:
+            while True:
+                try:
+                    self.stop()
+                    break
+                except KeyboardInterrupt:
+                    pass
+
+    def wait_for_empty_queue(self, wait_log_interval=0, wait_reason=""):
+        """Wait for all queued jobs to finish.
+
+        :arg wait_log_interval: While sleeping, it is helpful if the thread periodically
+            announces itself so that we know that it is still alive. This number is the
+            time in seconds between log entries.
+        :arg wait_reason: The is for the explanation of why the thread is sleeping.
+            This is likely to be a message like: 'there is no work to do'.
+
+        """
+        seconds = 0
+        while True:
+            with self.in_flight_lock:
+                if not self.in_flight:
+                    break
+            if wait_log_interval and not seconds % wait_log_interval:
+                self.logger.info("%s: %dsec so far", wait_reason, seconds)
+            seconds += 1
+            time.sleep(1.0)
+
+    def _remove_in_flight(self, job_id):
+        """Remove a job from in-flight bookkeeping.
+
+        :arg job_id: the id of the job
+
+        :returns: the job's finished_func or None
+
+        """
+        with self.in_flight_lock:
+            if job_id not in self.in_flight:
+                return None
+            finished_func = self.in_flight.pop(job_id)
+        self.in_flight_semaphore.release()
+        return finished_func
+
+    def _finish_job(self, job_id, acked=True):
+        """Remove a job from in-flight bookkeeping and call its finished_func.
+
+        :arg job_id: the id of the job
+        :arg acked: False if the job was lost and shouldn't be acknowledged
+
+        """
+        finished_func = self._remove_in_flight(job_id)
+        if finished_func is None:
+            return
+        try:
+            if acked:
+                finished_func()
+            else:
+                finished_func(acked=False)
+        except Exception:
+            self.logger.exception("Error calling finished_func() on job %s", job_id)
+
+    def _check_worker_processes(self):
+        """Replace worker processes that died unexpectedly.
+
+        If a worker process dies with a job, the job's finished_func is called with
+        ``acked=False``. For crash queues, this means the crash is not
+        acknowledged and will get redelivered, but it no longer counts as
+        outstanding.
+
+        While stopping, worker processes that exited cleanly aren't replaced, but
+        worker processes that died are so the pending jobs and STOP_TOKENs still get
+        handled.
+
+        """
+        with self.process_lock:
+            for i, process in enumerate(self.process_list):
+                if process.is_alive():
+                    continue
+                if self._stopping and process.exitcode == 0:
+                    continue
+                self._replace_worker_process(i, process)
+
+    def _replace_worker_process(self, i, process):
+        """Release the job a dead worker process had and replace it.
+
+        This must be called with ``process_lock`` held.
+
+        :arg i: the worker process' slot
+        :arg process: the dead worker process
+
+        """
+        job_id = self.current_jobs[i]
+        self.logger.error(
+            "worker process %s died with exitcode %s (job %s); restarting",
+            process.pid,
+            process.exitcode,
+            job_id,
+        )
+        if job_id != NO_JOB:
+            self._finish_job(job_id, acked=False)
+
+        # Nothing reads the dead worker process' task queue anymore, so don't wait
+        # for anything left in it to be flushed
+        self.task_queues[i].cancel_join_thread()
+        self.task_queues[i].close()
+
+        self.process_list[i] = self._start_worker_process(i)
+        if self._stop_tokens_sent:
+            self.task_queues[i].put(STOP_TOKEN)
+        else:
+            self._dispatch_jobs()
+
+    def _results_thread_func(self):
+        """Main function for the results thread.
+
+        This reads finished job ids from worker processes, hands the idle worker
+        processes their next jobs, and calls finished_func for the finished jobs. It
+        runs until the queueing thread has stopped all the worker processes and there
+        are no results left.
+
+        """
+        self.logger.debug("_results_thread_func start")
+        last_check = time.monotonic()
+        while True:
+            try:
+                slot, job_id = self.result_queue.get(timeout=1.0)
+                with self.process_lock:
+                    # If the worker process died after finishing the job, it's been
+                    # replaced and the job was already released
+                    if self.current_jobs[slot] == job_id:
+                        self.current_jobs[slot] = NO_JOB
+                        self._dispatch_jobs()
+                self._finish_job(job_id)
+            except queue.Empty:
+                if self._results_thread_quit:
+                    break
+
+            if time.monotonic() - last_check >= 1.0:
+                self._check_worker_processes()
+                last_check = time.monotonic()
+
+        self.logger.debug("results thread done")
+
+    def _stop_worker_processes(self):
+        """Stop worker processes.
+
+        Once the pending jobs have been handed out, a STOP_TOKEN is placed on each
+        worker process' task queue. Each worker process finishes the job it has and
+        then ends. After the worker processes have ended, the results thread handles
+        the remaining results and ends.
+
+        This is a blocking call.
+
+        """
+        self._stopping = True
+        while True:
+            with self.process_lock:
+                if not self.pending_jobs:
+                    for task_queue in self.task_queues:
+                        task_queue.put(STOP_TOKEN)
+                    self._stop_tokens_sent = True
+                    break
+            time.sleep(0.1)
+        self.logger.debug("waiting for worker processes to stop")
+        for i in range(self.number_of_processes):
+            while True:
+                process = self.process_list[i]
+                process.join()
+                # If the worker process died, it gets replaced and the replacement
+                # handles the STOP_TOKEN
+                self._check_worker_processes()
+                if self.process_list[i] is process:
+                    break
+
+        self._results_thread_quit = True
+        self.results_thread.join()
+
+    def _queueing_thread_func(self):
+        """Main function for queueing thread
+
+        This is the function responsible for reading the iterator and putting contents
+        into the queue. It loops as long as there are items in the iterator. Should
+        something go wrong with this thread, or it detects the quit flag, it will stop
+        workers and then quit.
+
+        """
+        self.logger.debug("_queueing_thread_func start")
+        try:
+            # May never exhaust
+            for job_params in self._get_iterator():
+                if self.quit:
+                    raise KeyboardInterrupt
+
+                if job_params is None:
+                    if self.quit_on_empty_queue:
+                        self.wait_for_empty_queue(
+                            wait_log_interval=10,
+                            wait_reason="waiting for queue to drain",
+                        )
+                        raise KeyboardInterrupt
+
+                    self._responsive_sleep(self.idle_delay)
+                    continue
+
+                self.logger.debug("received %r", job_params)
+                args, kwargs = split_job_params(job_params)
+                kwargs = dict(kwargs)
+                finished_func = kwargs.pop("finished_func", None)
+                # Worker processes pull from a single queue, so there's no priority
+                # lane; priority jobs are handed out in order
+                kwargs.pop("priority", None)
+
+                # Wait until there's room before adding the job to the in-flight
+                # jobs; check the quit flag periodically while waiting
+                while not self.in_flight_semaphore.acquire(timeout=1.0):
+                    if self.quit:
+                        raise KeyboardInterrupt
+
+                job_id = next(self.job_counter)
+                with self.in_flight_lock:
+                    self.in_flight[job_id] = finished_func
+                with self.process_lock:
+                    self.pending_jobs.append((job_id, tuple(args), kwargs))
+                    self._dispatch_jobs()
+        except Exception:
+            self.logger.error("queueing jobs has failed", exc_info=True)
+        except KeyboardInterrupt:
+            self.logger.debug("queueing_thread gets quit request")
+        finally:
+            self.logger.debug("we're quitting queueing_thread")
+            self._stop_worker_processes()
+            self.logger.debug("all worker processes stopped")
@@ -33,6 +33,31 @@ def default_iterator():
         yield None
 
 
+def split_priority(job_params):
+    """Remove the priority flag from job params.
+
+    Job sources can mark a job as high priority by including ``priority=True`` in
+    its kwargs. Task managers that support it run those jobs before jobs that are
+    waiting. Either way, the flag is not passed to the task function.
+
+    :arg job_params: either ``(args, kwargs)`` or ``args``
+
+    :returns: ``(job_params, priority)`` tuple
+
+    """
+    try:
+        args, kwargs = job_params
+    except ValueError:
+        return job_params, False
+
+    if "priority" not in kwargs:
+        return job_params, False
+
+    kwargs = dict(kwargs)
+    priority = bool(kwargs.pop("priority"))
+    return (args, kwargs), priority
+
+
 def respond_to_SIGTERM(signal_number, frame, target=None):
     """Handles SIGTERM event
 
@@ -88,6 +113,16 @@ class TaskManager:
         self.quit = False
         self.logger.debug("TaskManager finished init")
 
+    @property
+    def capacity(self):
+        """Number of jobs the task manager can hold at once
+
+        This counts jobs being worked on and jobs waiting to be worked on. None means
+        there's no limit.
+
+        """
+        return None
+
     def _get_iterator(self):
         """Return an iterator from the job_source_iterator
 
@@ -9,8 +9,12 @@ single iterator thread pushes jobs into an internal queue while a flock of
 consumer/worker threads do the jobs. A job consists of a function and the data applied
 to the function.
 
+Jobs marked with ``priority=True`` go in a priority lane in the internal queue and
+are done before jobs that are waiting in the standard lane.
+
 """
 
+import collections
 import logging
 import queue
 import threading
@@ -19,6 +23,7 @@ import time
 from socorro.lib.task_manager import (
     default_iterator,
     default_task_func,
+    split_priority,
     TaskManager,
 )
 
@@ -26,6 +31,34 @@ from socorro.lib.task_manager import (
 STOP_TOKEN = (None, None)
 
 
+class LaneQueue(queue.Queue):
+    """Queue with a priority lane.
+
+    Items put with ``put_priority`` come out before items put with ``put``. Putting
+    a priority item never blocks, even if the queue is full.
+
+    """
+
+    def _init(self, maxsize):
+        self.queue = collections.deque()
+        self.priority_queue = collections.deque()
+
+    def _qsize(self):
+        return len(self.queue) + len(self.priority_queue)
+
+    def _get(self):
+        if self.priority_queue:
+            return self.priority_queue.popleft()
+        return self.queue.popleft()
+
+    def put_priority(self, item):
+        """Put an item in the priority lane"""
+        with self.mutex:
+            self.priority_queue.append(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
 class ThreadedTaskManager(TaskManager):
     """Threaded task manager."""
 
@@ -70,10 +103,14 @@ class ThreadedTaskManager(TaskManager):
         )
         self.thread_list = []  # the thread object storage
         self.number_of_threads = number_of_threads
-        self.task_queue = queue.Queue(maximum_queue_size)
+        self.task_queue = LaneQueue(maximum_queue_size)
 
         self.queueing_thread = None
 
+    @property
+    def capacity(self):
+        return self.number_of_threads + self.task_queue.maxsize
+
     def start(self):
         """Starts the queueing thread and creates workers.
 
@@ -197,7 +234,11 @@ class ThreadedTaskManager(TaskManager):
                     continue
 
                 self.logger.debug("received %r", job_params)
-                self.task_queue.put((self.task_func, job_params))
+                job_params, priority = split_priority(job_params)
+                if priority:
+                    self.task_queue.put_priority((self.task_func, job_params))
+                else:
+                    self.task_queue.put((self.task_func, job_params))
         except Exception:
             self.logger.error("queueing jobs has failed", exc_info=True)
         except KeyboardInterrupt:
@@ -87,6 +87,7 @@ DEFAULT_RULESET = [
         kill_timeout=settings.STACKWALKER["kill_timeout"],
         symbol_cache_path=settings.STACKWALKER["symbol_cache_path"],
         symbol_tmp_path=settings.STACKWALKER["symbol_tmp_path"],
+        max_parallel_dumps=settings.STACKWALKER["max_parallel_dumps"],
     ),
     ModuleURLRewriteRule(),
     CrashingThreadInfoRule(),
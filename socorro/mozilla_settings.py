@@ -79,31 +79,133 @@ STATSD_HOST = _config("STATSD_HOST", default="localhost", doc="statsd host.")
 STATSD_PORT = _config("STATSD_PORT", default="8125", parser=int, doc="statsd port.")
 
 
-# Processor configuration
-PROCESSOR = {
-    "task_manager": {
-        "class": "socorro.lib.threaded_task_manager.ThreadedTaskManager",
-        "options": {
-            "idle_delay": 7,
-            "number_of_threads": _config(
-                "PROCESSOR_NUMBER_OF_THREADS",
+PROCESSOR_MAXIMUM_QUEUE_SIZE = _config(
+    "PROCESSOR_MAXIMUM_QUEUE_SIZE",
+    default="8",
+    parser=or_none(int),
+    doc="Number of items to queue up from the processing queues.",
+)
+
+# Processor task manager configuration
+THREADED_TASK_MANAGER = {
+    "class": "socorro.lib.threaded_task_manager.ThreadedTaskManager",
+    "options": {
+        "idle_delay": 7,
+        "number_of_threads": _config(
+            "PROCESSOR_NUMBER_OF_THREADS",
+            default="4",
+            parser=or_none(int),
+            doc="Number of worker threads for the processor.",
+        ),
+        "maximum_queue_size": PROCESSOR_MAXIMUM_QUEUE_SIZE,
+    },
+}
+
+PROCESS_POOL_TASK_MANAGER = {
+    "class": "socorro.lib.process_pool_task_manager.ProcessPoolTaskManager",
+    "options": {
+        "idle_delay": 7,
+        "number_of_processes": _config(
+            "PROCESSOR_NUMBER_OF_PROCESSES",
+            default="4",
+            parser=or_none(int),
+            doc=(
+                "Number of worker processes for the processor when using the "
+                "``process_pool`` task manager."
+            ),
+        ),
+        "maximum_queue_size": PROCESSOR_MAXIMUM_QUEUE_SIZE,
+    },
+}
+
+ASYNCIO_PIPELINE_TASK_MANAGER = {
+    "class": "socorro.lib.asyncio_task_manager.AsyncioPipelineTaskManager",
+    "options": {
+        "idle_delay": 7,
+        "stage_queue_size": _config(
+            "PROCESSOR_PIPELINE_STAGE_QUEUE_SIZE",
+            default="4",
+            parser=or_none(int),
+            doc=(
+                "Number of crash reports that can wait in each stage's queue when "
+                "using the ``asyncio_pipeline`` task manager."
+            ),
+        ),
+        "stage_concurrency": {
+            "fetch": _config(
+                "PROCESSOR_PIPELINE_FETCH_CONCURRENCY",
                 default="4",
                 parser=or_none(int),
-                doc="Number of worker threads for the processor.",
+                doc=(
+                    "Number of crash reports to fetch concurrently when using the "
+                    "``asyncio_pipeline`` task manager."
+                ),
             ),
-            "maximum_queue_size": _config(
-                "PROCESSOR_MAXIMUM_QUEUE_SIZE",
-                default="8",
+            "transform": _config(
+                "PROCESSOR_PIPELINE_TRANSFORM_CONCURRENCY",
+                default="4",
+                parser=or_none(int),
+                doc=(
+                    "Number of crash reports to transform concurrently when using "
+                    "the ``asyncio_pipeline`` task manager."
+                ),
+            ),
+            "save": _config(
+                "PROCESSOR_PIPELINE_SAVE_CONCURRENCY",
+                default="4",
                 parser=or_none(int),
-                doc="Number of items to queue up from the processing queues.",
+                doc=(
+                    "Number of crash reports to save concurrently when using the "
+                    "``asyncio_pipeline`` task manager."
+                ),
             ),
         },
     },
+}
+
+TASK_MANAGERS = {
+    "threaded": THREADED_TASK_MANAGER,
+    "process_pool": PROCESS_POOL_TASK_MANAGER,
+    "asyncio_pipeline": ASYNCIO_PIPELINE_TASK_MANAGER,
+}
+
+PROCESSOR_TASK_MANAGER = _config(
+    "PROCESSOR_TASK_MANAGER",
+    default="threaded",
+    doc=(
+        "Task manager for running crash report processing tasks. One of "
+        "``threaded`` (worker threads), ``process_pool`` (worker processes), "
+        "or ``asyncio_pipeline`` (separate fetch, transform, and save stages)."
+    ),
+)
+if PROCESSOR_TASK_MANAGER not in TASK_MANAGERS:
+    raise ValueError(
+        "PROCESSOR_TASK_MANAGER must be one of " + ", ".join(sorted(TASK_MANAGERS))
+    )
+
+# Processor configuration
+PROCESSOR = {
+    "task_manager": TASK_MANAGERS[PROCESSOR_TASK_MANAGER],
     "pipeline": {
         "class": "socorro.processor.pipeline.Pipeline",
         "options": {
             "rulesets": "socorro.mozilla_rulesets.RULESETS",
             "hostname": HOSTNAME,
+            "profile_sample_rate": _config(
+                "PROCESSOR_PROFILE_SAMPLE_RATE",
+                default="0",
+                parser=int,
+                doc=(
+                    "Profile 1 in every N crash reports with cProfile and write the "
+                    "stats to ``PROCESSOR_PROFILE_PATH``. 0 disables profiling."
+                ),
+            ),
+            "profile_path": _config(
+                "PROCESSOR_PROFILE_PATH",
+                default="",
+                parser=or_none(str),
+                doc="Directory to write processor profile stats files to.",
+            ),
         },
     },
     "temporary_path": _config(
@@ -152,6 +254,92 @@ QUEUE_PUBSUB = {
             default="reprocessing-queue",
             doc="Subscription name for the reprocessing queue.",
         ),
+        "standard_pull_max_messages": _config(
+            "PUBSUB_STANDARD_PULL_MAX_MESSAGES",
+            default="5",
+            parser=int,
+            doc=(
+                "Weight of the standard queue. This is the number of messages to "
+                "pull from the standard queue in a round."
+            ),
+        ),
+        "priority_pull_max_messages": _config(
+            "PUBSUB_PRIORITY_PULL_MAX_MESSAGES",
+            default="5",
+            parser=int,
+            doc="Maximum number of messages to pull from the priority queue at once.",
+        ),
+        "reprocessing_pull_max_messages": _config(
+            "PUBSUB_REPROCESSING_PULL_MAX_MESSAGES",
+            default="1",
+            parser=int,
+            doc=(
+                "Weight of the reprocessing queue. This is the number of messages to "
+                "pull from the reprocessing queue in a round."
+            ),
+        ),
+        "priority_poll_interval": _config(
+            "PUBSUB_PRIORITY_POLL_INTERVAL",
+            default="1.0",
+            parser=float,
+            doc=(
+                "Maximum number of seconds between pulls from the priority queue "
+                "while crash ids from other queues are being processed."
+            ),
+        ),
+        "pull_max_messages_limit": _config(
+            "PUBSUB_PULL_MAX_MESSAGES_LIMIT",
+            default="50",
+            parser=int,
+            doc=(
+                "Maximum number of messages to pull from a subscription with a "
+                "backlog in a single request."
+            ),
+        ),
+        "max_outstanding_messages": _config(
+            "PUBSUB_MAX_OUTSTANDING_MESSAGES",
+            default="",
+            parser=or_none(int),
+            doc=(
+                "Maximum number of messages pulled, but not acknowledged yet. If "
+                "empty, the processor uses the number of crash reports its task "
+                "manager can hold."
+            ),
+        ),
+        "ack_batch_size": _config(
+            "PUBSUB_ACK_BATCH_SIZE",
+            default="50",
+            parser=int,
+            doc=(
+                "Maximum number of messages to acknowledge in a single request. 1 "
+                "acknowledges every message as soon as it's processed."
+            ),
+        ),
+        "ack_flush_interval": _config(
+            "PUBSUB_ACK_FLUSH_INTERVAL",
+            default="1.0",
+            parser=float,
+            doc="Maximum number of seconds to buffer acknowledgements for.",
+        ),
+        "ack_deadline": _config(
+            "PUBSUB_ACK_DEADLINE",
+            default="300",
+            parser=int,
+            doc=(
+                "Acknowledgement deadline of the subscriptions in seconds. Crash ids "
+                "that are outstanding for longer than this stop counting against "
+                "the maximum number of outstanding messages."
+            ),
+        ),
+        "capacity_wait_timeout": _config(
+            "PUBSUB_CAPACITY_WAIT_TIMEOUT",
+            default="10.0",
+            parser=float,
+            doc=(
+                "Maximum number of seconds to wait for outstanding messages to "
+                "finish before the processor checks whether it's shutting down."
+            ),
+        ),
     },
 }
 
@@ -196,6 +384,63 @@ ES_STORAGE = {
                 "clusters that use self-issued certificates."
             ),
         ),
+        "index_weeks_future": _config(
+            "ELASTICSEARCH_INDEX_WEEKS_FUTURE",
+            default="2",
+            parser=int,
+            doc=(
+                "Number of weeks of future indices to create when the processor "
+                "starts indexing into an index it hasn't seen before."
+            ),
+        ),
+        "connections_per_node": _config(
+            "ELASTICSEARCH_CONNECTIONS_PER_NODE",
+            default="10",
+            parser=int,
+            doc=(
+                "Maximum number of connections to keep open to each Elasticsearch "
+                "node. Connections are shared by all threads in a process."
+            ),
+        ),
+        "keepalive_idle": _config(
+            "ELASTICSEARCH_KEEPALIVE_IDLE",
+            default="",
+            parser=or_none(int),
+            doc=(
+                "If set, turn on TCP keepalive for Elasticsearch connections and "
+                "send keepalive probes after this many idle seconds."
+            ),
+        ),
+        "sniff": _config(
+            "ELASTICSEARCH_SNIFF",
+            default="false",
+            parser=bool,
+            doc=(
+                "Whether to discover Elasticsearch cluster nodes when the client "
+                "is created and when a node fails."
+            ),
+        ),
+        "bulk_max_documents": _config(
+            "ELASTICSEARCH_BULK_MAX_DOCUMENTS",
+            default="0",
+            parser=int,
+            doc=(
+                "Maximum number of crash documents to index in a single bulk "
+                "request. Set to 0 or 1 to index each crash document with its own "
+                "request."
+            ),
+        ),
+        "bulk_flush_interval": _config(
+            "ELASTICSEARCH_BULK_FLUSH_INTERVAL",
+            default="0.1",
+            parser=float,
+            doc=(
+                "Maximum number of seconds a crash document waits for other "
+                "documents to fill a bulk request before the request is sent. The "
+                "request is sent sooner if every thread saving crash documents is "
+                "waiting on one."
+            ),
+        ),
     },
 }
 
@@ -213,7 +458,65 @@ TELEMETRY_GCS_STORAGE = {
 }
 
 QUEUE = QUEUE_PUBSUB
+# Optional local read-through cache in front of crash report storage
+CACHING_STORAGE = {
+    "class": "socorro.external.cache.crashstorage.CachingCrashStorage",
+    "options": {
+        "crashstorage": GCS_STORAGE,
+        "cache_path": _config(
+            "CRASHSTORAGE_CACHE_PATH",
+            default="",
+            doc=(
+                "Directory for the local crash storage cache. Set this to cache crash "
+                "data fetched from crash storage; leave it empty to disable the cache. "
+                "Cached data includes protected data and stays on local disk until it "
+                "expires, so this should be on a local volume only Socorro can read."
+            ),
+        ),
+        "max_size": _config(
+            "CRASHSTORAGE_CACHE_MAX_SIZE",
+            default="1gb",
+            parser=parse_data_size,
+            doc="Max size (bytes) of the crash storage cache on disk.",
+        ),
+        "max_memory_size": _config(
+            "CRASHSTORAGE_CACHE_MAX_MEMORY_SIZE",
+            default="64mb",
+            parser=parse_data_size,
+            doc="Max size (bytes) of the crash storage cache in memory per process.",
+        ),
+        "raw_crash_ttl": _config(
+            "CRASHSTORAGE_CACHE_RAW_CRASH_TTL",
+            default="1h",
+            parser=parse_time_period,
+            doc=(
+                "How long to cache raw crashes. Deleting a crash only invalidates the "
+                "cache on the node that deleted it, so other nodes can serve a deleted "
+                "crash for this long."
+            ),
+        ),
+        "dump_ttl": _config(
+            "CRASHSTORAGE_CACHE_DUMP_TTL",
+            default="1h",
+            parser=parse_time_period,
+            doc=(
+                "How long to cache dumps. Deleting a crash only invalidates the cache "
+                "on the node that deleted it, so other nodes can serve a deleted "
+                "crash's dumps for this long."
+            ),
+        ),
+        "processed_crash_ttl": _config(
+            "CRASHSTORAGE_CACHE_PROCESSED_CRASH_TTL",
+            default="1m",
+            parser=parse_time_period,
+            doc="How long to cache processed crashes.",
+        ),
+    },
+}
+
 STORAGE = GCS_STORAGE
+if CACHING_STORAGE["options"]["cache_path"]:
+    STORAGE = CACHING_STORAGE
 TELEMETRY_STORAGE = TELEMETRY_GCS_STORAGE
 
 # Crash report storage source pulls from GCS
@@ -253,6 +556,42 @@ SYMBOLS_CACHE_MAX_SIZE = _config(
         "legibility. You can use units like kb, mb, gb, tb, etc."
     ),
 )
+SYMBOLS_CACHE_LOW_WATERMARK = _config(
+    "SYMBOLS_CACHE_LOW_WATERMARK",
+    default="90",
+    parser=int,
+    doc=(
+        "When the symbols cache goes over SYMBOLS_CACHE_MAX_SIZE, files are evicted "
+        "until it's at this percent of SYMBOLS_CACHE_MAX_SIZE."
+    ),
+)
+SYMBOLS_CACHE_EVICTION_POLICY = _config(
+    "SYMBOLS_CACHE_EVICTION_POLICY",
+    default="lru",
+    doc=(
+        "Eviction policy for the symbols cache. Should be one of lru (evict least "
+        "recently used files) or tinylfu (evict least recently used files, but keep "
+        "frequently used ones)."
+    ),
+)
+SYMBOLS_CACHE_INVENTORY_PATH = _config(
+    "SYMBOLS_CACHE_INVENTORY_PATH",
+    # Next to the cache so it's on the same volume
+    default=os.path.normpath(SYMBOLS_CACHE_PATH) + "_inventory",
+    parser=or_none(str),
+    doc=(
+        "File the cache manager periodically writes a snapshot of the symbols cache "
+        "LRU to and resumes from when it starts. This must be outside of "
+        "SYMBOLS_CACHE_PATH. Defaults to SYMBOLS_CACHE_PATH with _inventory "
+        "appended. Set to an empty string to disable."
+    ),
+)
+SYMBOLS_CACHE_INVENTORY_INTERVAL = _config(
+    "SYMBOLS_CACHE_INVENTORY_INTERVAL",
+    default="5m",
+    parser=parse_time_period,
+    doc="Interval between snapshots of the symbols cache LRU.",
+)
 
 
 # MinidumpStackwalkerRule configuration
@@ -262,13 +601,14 @@ STACKWALKER = {
         default="/stackwalk-rust/minidump-stackwalk",
         doc="Aboslute path to the stackwalker binary.",
     ),
+    # There's no --output-file, so minidump-stackwalk writes its output to stdout
+    # and MinidumpStackwalkRule reads it from the pipe
     "command_line": (
         "{command_path} "
         + "--evil-json={raw_crash_path} "
         + "--symbols-cache={symbol_cache_path} "
         + "--symbols-tmp={symbol_tmp_path} "
         + "--no-color "
-        + "--output-file={output_path} "
         + "--log-file={log_path} "
         + "{symbols_urls} "
         + "--json "
@@ -282,6 +622,16 @@ STACKWALKER = {
         parser=or_none(parse_time_period),
         doc="Timeout in seconds before the stackwalker is killed.",
     ),
+    "max_parallel_dumps": _config(
+        "STACKWALKER_MAX_PARALLEL_DUMPS",
+        default="4",
+        parser=or_none(int),
+        doc=(
+            "Maximum number of minidumps in a single crash report to run the "
+            "stackwalker on at the same time. All stackwalker runs for a crash report "
+            "share the kill timeout."
+        ),
+    ),
     "symbols_urls": _config(
         "STACKWALKER_SYMBOLS_URLS",
         default="",
@@ -11,7 +11,24 @@ application separate from the rest of the processor.
 It keeps track of files in a directory and evicts files least recently used in order to
 keep the total size under a max number.
 
-It uses inotify to cheaply watch the files.
+It uses inotify to cheaply watch the files. When the cache goes over the max size,
+files are evicted until it's at the low watermark. Evicted files are deleted in a
+background thread so the event loop can keep up with events.
+
+Which files get evicted is up to the eviction policy. The lru policy evicts the least
+recently used file. The tinylfu policy keeps an estimate of how often files are opened
+and passes over frequently used files when evicting.
+
+It periodically writes a snapshot of the LRU to an inventory file and resumes from it
+when it starts, so it doesn't have to stat every file in the cache.
+
+When inotify's event queue overflows, events are dropped. The cache manager reconciles
+the directories that had events in the read that overflowed right away and then walks
+the rest of the cache a few directories at a time between reads. Files that were
+deleted without the cache manager seeing it stay in the LRU until they're evicted.
+Overflows are less likely with a larger ``fs.inotify.max_queued_events`` sysctl on the
+host; the cache manager logs a warning at startup if it's lower than
+``RECOMMENDED_MAX_QUEUED_EVENTS``.
 
 It pulls all its configuration from socorro.settings.
 
@@ -21,11 +38,17 @@ To run::
 
 """
 
+import array
 from collections import OrderedDict
+from contextlib import suppress
+import json
 import logging
 import os
 import pathlib
+import queue
 import sys
+import tempfile
+import threading
 import time
 import traceback
 
@@ -46,6 +69,21 @@ MAX_ERRORS = 10
 # How many seconds between heartbeats
 HEARTBEAT_INTERVAL = 60
 
+# First line of inventory files; bump the version when the format changes
+INVENTORY_MAGIC = b"socorro-cache-inventory-1\n"
+
+# Number of directories to reconcile between reads after an inotify queue overflow
+RECONCILE_DIRS_PER_ITERATION = 100
+
+# Minimum number of seconds between starting walks of the whole cache after inotify
+# queue overflows
+RECONCILE_INTERVAL = 600
+
+# The kernel default for fs.inotify.max_queued_events is 16384, which symbol-heavy
+# spikes can go over
+MAX_QUEUED_EVENTS_PATH = "/proc/sys/fs/inotify/max_queued_events"
+RECOMMENDED_MAX_QUEUED_EVENTS = 262144
+
 
 def count_sentry_scrub_error(msg):
     METRICS.incr("sentry_scrub_error", value=1, tags=["service:cachemanager"])
@@ -68,6 +106,203 @@ class LastUpdatedOrderedDict(OrderedDict):
         return self.popitem(last=False)
 
 
+class FrequencySketch:
+    """Count-min sketch estimating how often keys were seen recently
+
+    Counters are 4-bit (they saturate at 15) and stored in a bytearray. After
+    ``10 * width`` increments, all counters are halved so that old accesses count for
+    less than recent ones.
+
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+    SEEDS = (
+        0x9E3779B97F4A7C15,
+        0xC2B2AE3D27D4EB4F,
+        0x165667B19E3779F9,
+        0xD6E8FEB86659FD93,
+    )
+
+    # Translation table for halving all counters at once
+    HALVE = bytes(i >> 1 for i in range(256))
+
+    def __init__(self, width=2**20):
+        if width & (width - 1):
+            raise ValueError("width must be a power of 2")
+        self.width = width
+        self.shift = 64 - (width.bit_length() - 1)
+        self.table = bytearray(self.DEPTH * width)
+        self.sample_size = 10 * width
+        self.additions = 0
+
+    def _indexes(self, key):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        for row, seed in enumerate(self.SEEDS):
+            yield row * self.width + (((h * seed) & 0xFFFFFFFFFFFFFFFF) >> self.shift)
+
+    def increment(self, key):
+        indexes = list(self._indexes(key))
+        count = min(self.table[i] for i in indexes)
+        if count >= self.MAX_COUNT:
+            return
+        # Conservative update: only increment the counters at the minimum
+        for i in indexes:
+            if self.table[i] == count:
+                self.table[i] = count + 1
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table = bytearray(self.table.translate(self.HALVE))
+            self.additions //= 2
+
+    def estimate(self, key):
+        return min(self.table[i] for i in self._indexes(key))
+
+
+class LRUPolicy:
+    """Evicts the least recently used file"""
+
+    name = "lru"
+
+    def record_access(self, path):
+        pass
+
+    def pop_victim(self, lru, candidate=None):
+        """Pop the next file to evict from the LRU
+
+        :arg lru: the LastUpdatedOrderedDict of path -> size
+        :arg candidate: the path of the file that room is being made for, if any
+
+        :returns: (path, size) tuple
+
+        """
+        return lru.pop_oldest()
+
+
+class TinyLFUPolicy:
+    """Evicts the least recently used file unless it's used more often than the new one
+
+    Opens feed a FrequencySketch. When making room for a file, the oldest files in the
+    LRU that have been opened more often than the new file get touched instead of
+    evicted. This keeps a burst of rarely used files from flushing the files nearly
+    every crash needs.
+
+    Re-downloading a file costs time in proportion to its size and evicting it frees
+    space in proportion to its size, so files are compared by frequency alone.
+
+    """
+
+    name = "tinylfu"
+
+    # Maximum number of frequently used files to pass over when picking a victim;
+    # after that, the oldest file is evicted regardless so the cache stays under the
+    # max size
+    SCAN_LIMIT = 64
+
+    def __init__(self, sketch=None):
+        self.sketch = sketch or FrequencySketch()
+
+    def record_access(self, path):
+        self.sketch.increment(path)
+
+    def pop_victim(self, lru, candidate=None):
+        threshold = self.sketch.estimate(candidate) if candidate else 0
+        for _ in range(min(self.SCAN_LIMIT, len(lru))):
+            path = next(iter(lru))
+            if path == candidate or self.sketch.estimate(path) <= threshold:
+                break
+            # This file is used more often than the new one, so give it another pass
+            # through the LRU
+            lru.touch(path)
+        return lru.pop_oldest()
+
+
+EVICTION_POLICIES = {
+    LRUPolicy.name: LRUPolicy,
+    TinyLFUPolicy.name: TinyLFUPolicy,
+}
+
+
+class FileDeleter:
+    """Deletes evicted files in a background thread
+
+    Deleting files and pruning empty directories happens outside of the event loop.
+    Paths that get added back to the cache before they're deleted can be cancelled.
+
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self._run, name="cache-manager-deleter", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def delete(self, paths):
+        """Queue a batch of paths for deletion"""
+        with self.lock:
+            self.pending.update(paths)
+        self.queue.put(paths)
+
+    def cancel(self, path):
+        """Cancel deleting a path if it hasn't been deleted, yet"""
+        with self.lock:
+            self.pending.discard(path)
+
+    def is_pending(self, path):
+        with self.lock:
+            return path in self.pending
+
+    def join(self):
+        """Wait for all queued paths to be deleted"""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            paths = self.queue.get()
+            try:
+                if paths is None:
+                    return
+                for path in paths:
+                    with self.lock:
+                        if path not in self.pending:
+                            continue
+                        self.pending.discard(path)
+                    self.delete_file(path)
+            except Exception:
+                self.logger.exception("Exception thrown while deleting files")
+            finally:
+                self.queue.task_done()
+
+    def delete_file(self, path):
+        try:
+            # Delete the evicted file
+            os.remove(path)
+        except FileNotFoundError:
+            # The file is gone already
+            pass
+        try:
+            # Attempt to prune empty directories. This will trigger DELETE | ISDIR
+            # events and get cleaned up by the event loop.
+            os.removedirs(os.path.dirname(path))
+        except OSError:
+            pass
+
+
 def handle_exception(exctype, value, tb):
     logger = logging.getLogger(__name__)
     logger.error(
@@ -79,6 +314,15 @@ def handle_exception(exctype, value, tb):
 sys.excepthook = handle_exception
 
 
+def get_max_queued_events():
+    """Returns the fs.inotify.max_queued_events sysctl value or None if unknown"""
+    try:
+        with open(MAX_QUEUED_EVENTS_PATH) as fp:
+            return int(fp.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
 def get_index(sorted_list, percent):
     """Given a sorted list, return the percentth item.
 
@@ -119,11 +363,48 @@ class DiskCacheManager:
         if self.max_size is None:
             raise ValueError("SYMBOLS_CACHE_MAX_SIZE must have non-None value")
 
+        low_watermark = settings.SYMBOLS_CACHE_LOW_WATERMARK
+        if not 0 < low_watermark <= 100:
+            raise ValueError("SYMBOLS_CACHE_LOW_WATERMARK must be between 1 and 100")
+        self.low_watermark_size = self.max_size * low_watermark // 100
+        self.deleter = FileDeleter()
+
+        policy = settings.SYMBOLS_CACHE_EVICTION_POLICY
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(
+                "SYMBOLS_CACHE_EVICTION_POLICY must be one of "
+                + ", ".join(sorted(EVICTION_POLICIES))
+            )
+        self.eviction_policy = EVICTION_POLICIES[policy]()
+
+        # Files added to the cache that haven't been opened yet; the first open is part
+        # of the miss and not a hit
+        self.unopened = set()
+        self.hits = 0
+        self.misses = 0
+
+        self.inventory_path = None
+        if settings.SYMBOLS_CACHE_INVENTORY_PATH:
+            self.inventory_path = pathlib.Path(
+                settings.SYMBOLS_CACHE_INVENTORY_PATH
+            ).resolve()
+            if self.inventory_path.is_relative_to(self.cachepath):
+                raise ValueError(
+                    "SYMBOLS_CACHE_INVENTORY_PATH must be outside of SYMBOLS_CACHE_PATH"
+                )
+        self.inventory_interval = settings.SYMBOLS_CACHE_INVENTORY_INTERVAL
+        self.inventory_thread = None
+
         # Set up attributes for cache monitoring; these get created in the generator
         self.lru = LastUpdatedOrderedDict()
         self.total_size = 0
         self.watches = OneToOne()
         self._generator = None
+
+        # Walk of the whole cache after an inotify queue overflow that's advanced a
+        # few directories at a time between reads
+        self.reconciler = None
+        self.next_reconcile = 0
         self.inotify = None
         self.watch_flags = (
             flags.CREATE
@@ -165,6 +446,17 @@ class DiskCacheManager:
 
         self.log_config()
 
+        max_queued_events = get_max_queued_events()
+        if max_queued_events is not None and (
+            max_queued_events < RECOMMENDED_MAX_QUEUED_EVENTS
+        ):
+            self.logger.warning(
+                "fs.inotify.max_queued_events is %s; inotify events are more likely "
+                "to be dropped during spikes with less than %s",
+                max_queued_events,
+                RECOMMENDED_MAX_QUEUED_EVENTS,
+            )
+
         # Create the cachepath if we need to
         self.cachepath.mkdir(parents=True, exist_ok=True)
 
@@ -212,69 +504,354 @@ class DiskCacheManager:
             wd = self.watches.pop(path)
             self.inotify.rm_watch(wd)
 
-    def inventory_existing(self, path):
+    def write_inventory(self, background=False):
+        """Write a snapshot of the LRU to the inventory file
+
+        The snapshot is a copy of the LRU's items, so the LRU can keep changing while
+        the inventory file is written.
+
+        :arg background: if True, write the inventory file in a thread so the event
+            loop isn't held up; if a background write is still going, this one is
+            skipped
+
+        """
+        if self.inventory_path is None:
+            return
+
+        if self.inventory_thread is not None:
+            if background and self.inventory_thread.is_alive():
+                self.logger.info("previous inventory write isn't done; skipping")
+                return
+            self.inventory_thread.join()
+            self.inventory_thread = None
+
+        items = list(self.lru.items())
+        if not background:
+            self._write_inventory_file(items)
+            return
+
+        self.inventory_thread = threading.Thread(
+            target=self._write_inventory_thread,
+            args=(items,),
+            name="cache-manager-inventory",
+            daemon=True,
+        )
+        self.inventory_thread.start()
+
+    def _write_inventory_thread(self, items):
+        try:
+            self._write_inventory_file(items)
+        except Exception:
+            self.logger.exception("Exception thrown while writing inventory")
+
+    def _write_inventory_file(self, items):
+        """Write the inventory file
+
+        The inventory has the files in LRU order. Directories are stored once and
+        referred to by index. Directory indexes and sizes are stored as arrays.
+
+        :arg items: list of (file path, size) tuples in LRU order
+
+        """
+        start_time = time.perf_counter()
+        prefix_len = len(str(self.cachepath)) + 1
+        dirs = {}
+        names = []
+        dir_ids = array.array("I")
+        sizes = array.array("Q")
+        for path, size in items:
+            dir_, name = os.path.split(path[prefix_len:])
+            dir_ids.append(dirs.setdefault(dir_, len(dirs)))
+            names.append(name)
+            sizes.append(size)
+
+        names_data = "\0".join(names).encode("utf-8", "surrogateescape")
+        header = {
+            "cachepath": str(self.cachepath),
+            "byteorder": sys.byteorder,
+            "count": len(names),
+            "names_size": len(names_data),
+            "dirs": list(dirs),
+        }
+
+        # Write to a temp file and move it into place so the inventory is never
+        # partially written
+        self.inventory_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.inventory_path.parent)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(INVENTORY_MAGIC)
+                fp.write(json.dumps(header).encode("utf-8") + b"\n")
+                fp.write(names_data)
+                dir_ids.tofile(fp)
+                sizes.tofile(fp)
+            os.replace(tmp_path, self.inventory_path)
+        except BaseException:
+            with suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+        self.logger.info(
+            "wrote inventory: %s files, %s dirs in %.2fs",
+            f"{len(names):,d}",
+            f"{len(dirs):,d}",
+            time.perf_counter() - start_time,
+        )
+
+    def read_inventory(self):
+        """Read the snapshot of the LRU from the inventory file
+
+        :returns: dict of file path -> size in LRU order; empty if there's no usable
+            inventory
+
+        """
+        if self.inventory_path is None:
+            return {}
+
+        cachepath = str(self.cachepath)
+        try:
+            with open(self.inventory_path, "rb") as fp:
+                if fp.readline() != INVENTORY_MAGIC:
+                    raise ValueError("unknown inventory format")
+                header = json.loads(fp.readline())
+                if (
+                    header["cachepath"] != cachepath
+                    or header["byteorder"] != sys.byteorder
+                ):
+                    self.logger.info("inventory is for a different cache; ignoring")
+                    return {}
+
+                count = header["count"]
+                names = []
+                if count:
+                    names_data = fp.read(header["names_size"])
+                    names = names_data.decode("utf-8", "surrogateescape").split("\0")
+                dir_ids = array.array("I")
+                dir_ids.fromfile(fp, count)
+                sizes = array.array("Q")
+                sizes.fromfile(fp, count)
+                dirs = [
+                    os.path.join(cachepath, dir_) if dir_ else cachepath
+                    for dir_ in header["dirs"]
+                ]
+                if len(names) != count:
+                    raise ValueError("inventory names don't match count")
+
+                return {
+                    os.path.join(dirs[dir_id], name): size
+                    for dir_id, name, size in zip(dir_ids, names, sizes)
+                }
+
+        except FileNotFoundError:
+            return {}
+        except (OSError, EOFError, IndexError, KeyError, ValueError) as exc:
+            self.logger.warning(
+                "unable to read inventory %s: %s", self.inventory_path, exc
+            )
+            return {}
+
+    def inventory_existing(self, path, known=None):
         """Add contents of path to LRU
 
         This goes through the contents of the path, adds watches for directories, and
         adds files to the LRU.
 
+        Files in ``known`` that still exist are added with the size from ``known`` and
+        without being stat'ed. Symbol files are named by debug id and don't change
+        once written, so the size doesn't need to be checked again. They're added
+        first in the order they were in ``known``. Other files get added after them.
+
         NOTE(willkg): This does not deal with the max size of the LRU--that'll get
         handled when we start going through events.
 
         :arg path: a str or Path of the path to inventory
+        :arg known: dict of file path -> size in LRU order from read_inventory
 
         """
-        cachepath = str(path)
+        known = known or {}
+        found = set()
+        new_files = []
 
-        for base, dirs, files in os.walk(cachepath):
-            for dir_ in dirs:
-                path = os.path.join(base, dir_)
-                if path not in self.watches:
-                    try:
-                        self.add_watch(path)
-                        self.logger.debug("adding watch: %s", path)
-                    except OSError:
-                        self.logger.exception("unable to add watch %s", path)
+        for file_path in self.walk(path):
+            if file_path in self.lru:
+                continue
+            if file_path in known:
+                found.add(file_path)
+                continue
+
+            # Add the file if it's there. If not, ignore the error and move on.
+            try:
+                size = os.stat(file_path).st_size
+            except OSError:
+                continue
+            new_files.append((file_path, size))
+
+        for path, size in known.items():
+            if path in found:
+                self.lru[path] = size
+                self.total_size += size
+
+        for path, size in new_files:
+            self.lru[path] = size
+            self.total_size += size
+            self.logger.debug("adding file: %s (%s)", path, f"{size:,d}")
+
+    def _add_watches(self, base, dirs):
+        """Add watches for subdirectories of base that aren't watched"""
+        for dir_ in dirs:
+            dir_path = os.path.join(base, dir_)
+            if dir_path not in self.watches:
+                try:
+                    self.add_watch(dir_path)
+                    self.logger.debug("adding watch: %s", dir_path)
+                except OSError:
+                    self.logger.exception("unable to add watch %s", dir_path)
 
+    def walk(self, path):
+        """Walk path adding watches for directories that aren't watched
+
+        :arg path: a str or Path of the path to walk
+
+        :returns: generator of file paths
+
+        """
+        for base, dirs, files in os.walk(str(path)):
+            self._add_watches(base, dirs)
             for fn in files:
-                path = os.path.join(base, fn)
-                if path not in self.lru:
-                    # Add the file if it's there. If not, ignore the error and move
-                    # on.
-                    try:
-                        size = os.stat(path).st_size
-                    except OSError:
-                        continue
-                    self.lru[path] = size
-                    self.total_size += size
-                    self.logger.debug("adding file: %s (%s)", path, f"{size:,d}")
-
-    def make_room(self, size):
-        total_size = self.total_size + size
-        removed = 0
+                yield os.path.join(base, fn)
 
-        while self.lru and total_size > self.max_size:
-            rm_path, rm_size = self.lru.pop_oldest()
-            total_size -= rm_size
-            removed += rm_size
-            try:
-                # Delete the evicted file
-                os.remove(rm_path)
-            except FileNotFoundError:
-                # If there was an OSError, then this file is gone already. We need to
-                # update our bookkeping, so continue.
-                pass
+    def _add_missing_file(self, file_path):
+        """Add a file that's on disk, but not in the LRU
+
+        :returns: True if the file was added
+
+        """
+        if file_path in self.lru or self.deleter.is_pending(file_path):
+            return False
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            return False
+        self.lru[file_path] = size
+        self.total_size += size
+        return True
+
+    def reconcile_dirs(self, dir_paths):
+        """Add files and watches missing from the given directories
+
+        inotify drops events when its queue overflows. Dropped events are most
+        likely in directories that were busy when it overflowed, so this lists
+        those directories and adds files and watches that are missing. New
+        subdirectories are walked. Files already in the LRU keep their size and
+        position without being stat'ed.
+
+        :arg dir_paths: iterable of directory paths
+
+        """
+        added = 0
+        for dir_path in dir_paths:
             try:
-                # Attempt to prune empty directories. This will trigger DELETE | ISDIR
-                # events and get cleaned up by the event loop.
-                os.removedirs(os.path.dirname(rm_path))
+                entries = list(os.scandir(dir_path))
             except OSError:
                 continue
 
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self.watches:
+                        # Walk new subdirectories the cache manager missed
+                        self._add_watches(dir_path, [entry.name])
+                        for file_path in self.walk(entry.path):
+                            added += self._add_missing_file(file_path)
+                elif entry.is_file(follow_symlinks=False):
+                    added += self._add_missing_file(entry.path)
+
+        if added:
+            self.make_room(0)
+        self.logger.info("reconciled %s dirs: %s files added", len(dir_paths), added)
+
+    def _reconcile_steps(self, path):
+        """Reconcile the whole cache one directory per step
+
+        This adds files and watches that are missing, but doesn't look for files
+        in the LRU that are gone; those stay until they're evicted.
+
+        :arg path: a str or Path of the path to reconcile
+
+        :returns: generator that does one directory per step
+
+        """
+        added = 0
+        for base, dirs, files in os.walk(str(path)):
+            self._add_watches(base, dirs)
+            dir_added = 0
+            for fn in files:
+                dir_added += self._add_missing_file(os.path.join(base, fn))
+            if dir_added:
+                self.make_room(0)
+                added += dir_added
+            yield
+
+        self.logger.info("reconciled %s: %s files added", path, added)
+
+    def start_reconcile(self):
+        """Start reconciling the whole cache unless it's been done recently"""
+        now = time.monotonic()
+        if self.reconciler is not None or now < self.next_reconcile:
+            return
+        self.reconciler = self._reconcile_steps(self.cachepath)
+        self.next_reconcile = now + RECONCILE_INTERVAL
+
+    def advance_reconcile(self):
+        """Reconcile the next RECONCILE_DIRS_PER_ITERATION directories"""
+        if self.reconciler is None:
+            return
+        for _ in range(RECONCILE_DIRS_PER_ITERATION):
+            try:
+                next(self.reconciler)
+            except StopIteration:
+                self.reconciler = None
+                return
+
+    def add_file(self, path, size):
+        """Make room for and add a file that was added to the cache"""
+        self.deleter.cancel(path)
+        self.eviction_policy.record_access(path)
+        self.make_room(size, path=path)
+        self.lru[path] = size
+        self.total_size += size
+        self.unopened.add(path)
+        self.misses += 1
+
+    def make_room(self, size, path=None):
+        """Evict files so there's room for size bytes
+
+        If adding size bytes would put the cache over the max size, this evicts files
+        until the cache with size bytes added is at the low watermark. Evicted files
+        are removed from the LRU and queued for deletion in one batch.
+
+        :arg size: the number of bytes to make room for
+        :arg path: the path of the file that room is being made for, if any
+
+        """
+        total_size = self.total_size + size
+        if total_size <= self.max_size:
+            return
+
+        removed = 0
+        evicted = []
+        while self.lru and total_size > self.low_watermark_size:
+            rm_path, rm_size = self.eviction_policy.pop_victim(self.lru, candidate=path)
+            self.unopened.discard(rm_path)
+            total_size -= rm_size
+            removed += rm_size
+            evicted.append(rm_path)
+
             self.logger.debug("evicted %s %s", rm_path, f"{rm_size:,d}")
             METRICS.incr("processor.cache_manager.evict")
 
         self.total_size -= removed
+        if evicted:
+            self.deleter.delete(evicted)
 
     def _event_generator(self, nonblocking=False):
         """Returns a generator of inotify events."""
@@ -295,20 +872,31 @@ class DiskCacheManager:
         self.lru = LastUpdatedOrderedDict()
         self.total_size = 0
 
+        self.deleter.start()
         self.add_watch(self.cachepath)
-        self.inventory_existing(self.cachepath)
-
-        logger.info("found %s files (%s bytes)", len(self.lru), f"{self.total_size:,d}")
+        known = self.read_inventory()
+        self.inventory_existing(self.cachepath, known=known)
+
+        logger.info(
+            "found %s files (%s bytes); %s in inventory",
+            len(self.lru),
+            f"{self.total_size:,d}",
+            len(known),
+        )
+        del known
         logger.info("entering loop")
 
         self.running = True
         processed_events = False
         num_unhandled_errors = 0
         next_heartbeat = time.time() + HEARTBEAT_INTERVAL
+        next_inventory = time.time() + self.inventory_interval
         try:
             while self.running:
                 try:
                     events = self.inotify.read(timeout=timeout)
+                    overflowed = False
+                    touched_dirs = set()
                     while events:
                         event = events.pop(0)
 
@@ -338,7 +926,10 @@ class DiskCacheManager:
                             continue
 
                         if flags.Q_OVERFLOW & event_mask:
+                            # Events were dropped; reconcile after handling the rest
+                            # of the events
                             METRICS.incr("processor.cache_manager.q_overflow")
+                            overflowed = True
                             continue
 
                         try:
@@ -348,6 +939,7 @@ class DiskCacheManager:
                             # being tracked, so we can ignore this event
                             continue
 
+                        touched_dirs.add(dir_path)
                         path = os.path.join(dir_path, event.name)
 
                         if flags.ISDIR & event_mask:
@@ -410,13 +1002,16 @@ class DiskCacheManager:
                                         # succession, so we can ignore it
                                         continue
 
-                                    self.make_room(size)
-                                    self.lru[path] = size
-                                    self.total_size += size
+                                    self.add_file(path, size)
 
                             elif flags.OPEN & event_mask:
                                 if path in self.lru:
                                     self.lru.touch(path)
+                                    if path in self.unopened:
+                                        self.unopened.discard(path)
+                                    else:
+                                        self.eviction_policy.record_access(path)
+                                        self.hits += 1
 
                             elif flags.MODIFY & event_mask:
                                 size = self.lru[path]
@@ -426,12 +1021,13 @@ class DiskCacheManager:
                                     # The file was modified and deleted in rapid
                                     # succession, so we treat it as a delete
                                     size = self.lru.pop(path)
+                                    self.unopened.discard(path)
                                     self.total_size -= size
                                     continue
 
                                 if size != new_size:
                                     self.total_size -= size
-                                    self.make_room(new_size)
+                                    self.make_room(new_size, path=path)
                                     self.total_size += new_size
 
                                 self.lru[path] = new_size
@@ -442,6 +1038,7 @@ class DiskCacheManager:
                                     # external thing or by the disk cache manager, so it
                                     # may or may not be in the lru
                                     size = self.lru.pop(path)
+                                    self.unopened.discard(path)
                                     self.total_size -= size
 
                             elif flags.MOVED_TO & event_mask:
@@ -454,21 +1051,29 @@ class DiskCacheManager:
                                         # The file was created and deleted in rapid
                                         # succession, so we can ignore it
                                         continue
-                                    self.make_room(size)
-                                    self.lru[path] = size
-                                    self.total_size += size
+                                    self.add_file(path, size)
 
                             elif flags.MOVED_FROM & event_mask:
                                 if path in self.lru:
                                     # If it was moved out of this directory, then treat
                                     # it like a DELETE
                                     size = self.lru.pop(path)
+                                    self.unopened.discard(path)
                                     self.total_size -= size
 
                             else:
                                 if is_verbose:
                                     logger.debug("unhandled event: %s %s", path, event)
 
+                    if overflowed:
+                        # Q_OVERFLOW doesn't say which watch dropped events; start
+                        # with the directories that were busy and then go through
+                        # the rest of the cache between reads
+                        self.reconcile_dirs(touched_dirs)
+                        self.start_reconcile()
+
+                    self.advance_reconcile()
+
                 except Exception as exc:
                     logger.exception("Exception thrown while handling events: %s", exc)
 
@@ -493,6 +1098,20 @@ class DiskCacheManager:
                 # once per HEARTBEAT_INTERVAL
                 now = time.time()
                 if now > next_heartbeat:
+                    policy_tag = f"policy:{self.eviction_policy.name}"
+                    METRICS.incr(
+                        "processor.cache_manager.hit",
+                        value=self.hits,
+                        tags=[policy_tag],
+                    )
+                    METRICS.incr(
+                        "processor.cache_manager.miss",
+                        value=self.misses,
+                        tags=[policy_tag],
+                    )
+                    self.hits = 0
+                    self.misses = 0
+
                     if is_verbose:
                         METRICS.gauge(
                             "processor.cache_manager.usage", value=self.total_size
@@ -524,9 +1143,22 @@ class DiskCacheManager:
 
                     next_heartbeat = now + HEARTBEAT_INTERVAL
 
+                if now > next_inventory:
+                    try:
+                        self.write_inventory(background=True)
+                    except Exception:
+                        logger.exception("Exception thrown while writing inventory")
+                    next_inventory = now + self.inventory_interval
+
                 yield
 
         finally:
+            self.deleter.stop()
+            try:
+                self.write_inventory()
+            except Exception:
+                self.logger.exception("Exception thrown while writing inventory")
+
             all_watches = list(self.watches.inv.keys())
             for wd in all_watches:
                 try:
@@ -553,7 +1185,10 @@ class DiskCacheManager:
         if self._generator is None:
             self._generator = self._event_generator(nonblocking=True)
 
-        return next(self._generator)
+        ret = next(self._generator)
+        # Wait for evicted files to be deleted so the results are predictable
+        self.deleter.join()
+        return ret
 
     def shutdown(self):
         """Shut down an event generator."""
@@ -9,16 +9,129 @@ The rules are applied one at a time, each doing some small part of the transform
 process.
 """
 
+import cProfile
+import itertools
 import logging
-from typing import List
+import os
+import threading
+import time
+from typing import List, Tuple
 
 from attrs import define, field
 import sentry_sdk
 
 from socorro.libclass import import_class
+from socorro.libmarkus import METRICS
 from socorro.lib.libdatetime import date_to_string, utc_now
 
 
+# Number of slowest rules to include in the debug log summary
+SLOWEST_RULES_COUNT = 5
+
+
+# Sources for keys in Rule.requires
+REQUIRES_SOURCES = ("raw_crash", "dumps", "processed_crash")
+
+
+@define
+class RuleGroup:
+    #: (source, key) tuples that must all be present for the rules to apply
+    requires: Tuple[Tuple[str, str], ...]
+    rules: List = field(factory=list)
+
+
+def parse_requires(rule):
+    """Parse a rule's requires into (source, key) tuples
+
+    :raises ValueError: if a key has an unknown source
+
+    """
+    requires = []
+    for item in rule.requires:
+        source, _, key = item.partition(".")
+        if source not in REQUIRES_SOURCES or not key:
+            raise ValueError(
+                f"{rule.name} requires {item!r}: must be one of "
+                + ", ".join(f"{source}.KEY" for source in REQUIRES_SOURCES)
+            )
+        requires.append((source, key))
+    return tuple(requires)
+
+
+def get_rule_reads(rule):
+    """Returns set of processed crash keys the rule reads"""
+    reads = set(rule.reads)
+    for source, key in parse_requires(rule):
+        if source == "processed_crash":
+            reads.add(key)
+    return reads
+
+
+# Order of the ways a rule can use a processed crash key; for every key, rules in a
+# ruleset have to use the key in this order
+WRITE, REWRITE, READ = range(3)
+USE_NAMES = {WRITE: "writes", REWRITE: "reads and writes", READ: "reads"}
+
+
+def validate_rule_order(ruleset_name, ruleset):
+    """Check that rules use processed crash keys in a sensible order
+
+    For every processed crash key, rules that only write the key have to come before
+    rules that read and write it, which have to come before rules that only read
+    it. Rules that don't declare ``reads`` or ``writes`` aren't checked.
+
+    :raises ValueError: if the rules are out of order
+
+    """
+    # key -> (use, rule) of the last rule that used the key
+    last_use = {}
+    errors = []
+    for rule in ruleset:
+        reads = get_rule_reads(rule)
+        writes = set(rule.writes)
+        for key in sorted(reads | writes):
+            if key in reads and key in writes:
+                use = REWRITE
+            elif key in writes:
+                use = WRITE
+            else:
+                use = READ
+
+            if key in last_use:
+                prev_use, prev_rule = last_use[key]
+                if use < prev_use:
+                    errors.append(
+                        f"{rule.name} {USE_NAMES[use]} {key!r}, but runs after "
+                        + f"{prev_rule.name} which {USE_NAMES[prev_use]} it"
+                    )
+                    continue
+            last_use[key] = (use, rule)
+
+    if errors:
+        raise ValueError(
+            f"ruleset {ruleset_name!r} has rules out of order: " + "; ".join(errors)
+        )
+
+
+def build_plan(ruleset):
+    """Build an execution plan for a ruleset
+
+    Consecutive rules with the same requirements are grouped so the pipeline can
+    skip the whole group with one set of key checks.
+
+    :returns: list of RuleGroup
+
+    """
+    plan = []
+    for rule in ruleset:
+        requires = parse_requires(rule)
+        if plan and plan[-1].requires == requires:
+            plan[-1].rules.append(rule)
+        else:
+            plan.append(RuleGroup(requires=requires, rules=[rule]))
+    return plan
+
+
 @define
 class Status:
     notes: List[str] = field(factory=list)
@@ -33,15 +146,27 @@ class Status:
 class Pipeline:
     """Processor pipeline for Mozilla crash ingestion."""
 
-    def __init__(self, rulesets, hostname):
+    def __init__(self, rulesets, hostname, profile_sample_rate=0, profile_path=None):
         """
         :arg rulesets: either a dict of name -> list of rules or a Python dotted
             string path to a dict of name -> list of rules
         :arg hostname: the id of the host this is running on; used for logging
+        :arg profile_sample_rate: profile 1 in every N crash reports; 0 disables
+            profiling
+        :arg profile_path: directory to write cProfile stats files to
         """
         self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
         self.hostname = hostname
 
+        self.profile_sample_rate = profile_sample_rate or 0
+        self.profile_path = profile_path
+        if self.profile_sample_rate and not self.profile_path:
+            raise ValueError("profile_sample_rate requires profile_path")
+        self._profile_counter = itertools.count(1)
+        # Only one profiler can be active at a time, so crash reports processed in
+        # other threads while one is being profiled aren't profiled
+        self._profile_lock = threading.Lock()
+
         if isinstance(rulesets, str):
             rulesets = import_class(rulesets)
 
@@ -49,6 +174,21 @@ class Pipeline:
 
         self.log_rulesets()
 
+    @property
+    def rulesets(self):
+        return self._rulesets
+
+    @rulesets.setter
+    def rulesets(self, rulesets):
+        # Validate rule order and build the execution plans up front so problems
+        # with rulesets surface when the processor starts
+        plans = {}
+        for ruleset_name, ruleset in rulesets.items():
+            validate_rule_order(ruleset_name, ruleset)
+            plans[ruleset_name] = build_plan(ruleset)
+        self._rulesets = rulesets
+        self.plans = plans
+
     def log_rulesets(self):
         for ruleset_name, ruleset in self.rulesets.items():
             self.logger.info("Loading ruleset: %s", ruleset_name)
@@ -78,18 +218,99 @@ class Pipeline:
 
         crash_id = raw_crash["uuid"]
 
-        ruleset = self.rulesets.get(ruleset_name)
-        if ruleset is None:
+        plan = self.plans.get(ruleset_name)
+        if plan is None:
             status.add_note(f"error: no ruleset: {ruleset_name}")
             return processed_crash
 
         self.logger.info("processing with %s for crash %s", ruleset_name, crash_id)
 
-        # Apply rules; if a rule fails, capture the error and continue onward
-        for rule in ruleset:
+        profiler = self.start_profiler()
+        try:
+            rule_timings = self.apply_rules(
+                ruleset_name=ruleset_name,
+                plan=plan,
+                raw_crash=raw_crash,
+                dumps=dumps,
+                processed_crash=processed_crash,
+                tmpdir=tmpdir,
+                status=status,
+            )
+        finally:
+            if profiler is not None:
+                self.stop_profiler(profiler, crash_id, ruleset_name)
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            slowest = sorted(rule_timings, key=lambda item: item[1], reverse=True)
+            self.logger.debug(
+                "slowest rules for crash %s: %s",
+                crash_id,
+                ", ".join(
+                    f"{name} {wall:.1f}ms (cpu {cpu:.1f}ms)"
+                    for name, wall, cpu in slowest[:SLOWEST_RULES_COUNT]
+                ),
+            )
+
+        # The crash made it through the processor rules with no exceptions raised, call
+        # it a success
+        processed_crash["success"] = True
+
+        # Add previous notes to processor history
+        processor_history = processed_crash.get("processor_history", [])
+        if processed_crash.get("processor_notes"):
+            previous_notes = processed_crash["processor_notes"]
+            processor_history.insert(0, previous_notes)
+        processed_crash["processor_history"] = processor_history
+
+        # Set notes to this processing pass' notes
+        processed_crash["processor_notes"] = "\n".join(status.notes)
+
+        # Set completed_datetime
+        completed_datetime = utc_now()
+        processed_crash["completed_datetime"] = date_to_string(completed_datetime)
+
+        self.logger.info(
+            "finishing %s transform for crash: %s",
+            "successful" if processed_crash["success"] else "failed",
+            crash_id,
+        )
+        return processed_crash
+
+    def iter_rules(self, plan, raw_crash, dumps, processed_crash):
+        """Yields rules in the plan that apply to the crash report
+
+        Rule groups are checked when they're reached, so keys added by earlier rules
+        count.
+
+        """
+        sources = {
+            "raw_crash": raw_crash,
+            "dumps": dumps,
+            "processed_crash": processed_crash,
+        }
+        for group in plan:
+            if all(key in sources[source] for source, key in group.requires):
+                yield from group.rules
+
+    def apply_rules(
+        self, ruleset_name, plan, raw_crash, dumps, processed_crash, tmpdir, status
+    ):
+        """Apply rules in a ruleset's plan to a crash report
+
+        If a rule fails, this captures the error and continues onward.
+
+        :returns: list of ``(rule class name, wall time ms, cpu time ms)`` tuples
+
+        """
+        crash_id = raw_crash["uuid"]
+        rule_timings = []
+
+        for rule in self.iter_rules(plan, raw_crash, dumps, processed_crash):
             with sentry_sdk.new_scope() as scope:
                 scope.set_context("processor_pipeline", {"rule": rule.name})
 
+                wall_start = time.perf_counter()
+                cpu_start = time.thread_time()
                 try:
                     rule.act(
                         raw_crash=raw_crash,
@@ -116,30 +337,62 @@ class Pipeline:
                         f"{exc.__class__.__name__}"
                     )
 
-        # The crash made it through the processor rules with no exceptions raised, call
-        # it a success
-        processed_crash["success"] = True
+                # Wall time is also emitted by Rule.act as processor.rule.act.timing;
+                # cpu time shows how much of that is spent in this thread rather than
+                # waiting on I/O or subprocesses
+                wall_ms = (time.perf_counter() - wall_start) * 1000
+                cpu_ms = (time.thread_time() - cpu_start) * 1000
+                class_name = rule.__class__.__name__
+                METRICS.histogram(
+                    "processor.rule.cpu_time",
+                    value=cpu_ms,
+                    tags=[f"rule:{class_name}"],
+                )
+                rule_timings.append((class_name, wall_ms, cpu_ms))
 
-        # Add previous notes to processor history
-        processor_history = processed_crash.get("processor_history", [])
-        if processed_crash.get("processor_notes"):
-            previous_notes = processed_crash["processor_notes"]
-            processor_history.insert(0, previous_notes)
-        processed_crash["processor_history"] = processor_history
+        return rule_timings
 
-        # Set notes to this processing pass' notes
-        processed_crash["processor_notes"] = "\n".join(status.notes)
+    def start_profiler(self):
+        """Starts a profiler if this crash report is sampled for profiling
 
-        # Set completed_datetime
-        completed_datetime = utc_now()
-        processed_crash["completed_datetime"] = date_to_string(completed_datetime)
+        :returns: a running ``cProfile.Profile`` or None
 
-        self.logger.info(
-            "finishing %s transform for crash: %s",
-            "successful" if processed_crash["success"] else "failed",
-            crash_id,
-        )
-        return processed_crash
+        """
+        if not self.profile_sample_rate:
+            return None
+
+        if next(self._profile_counter) % self.profile_sample_rate != 0:
+            return None
+
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool is active
+            self._profile_lock.release()
+            return None
+        return profiler
+
+    def stop_profiler(self, profiler, crash_id, ruleset_name):
+        """Stops the profiler and writes stats to the profile path
+
+        Stats files are named ``<crash_id>.<ruleset_name>.prof`` and can be loaded
+        with ``pstats`` or tools like snakeviz.
+
+        """
+        try:
+            profiler.disable()
+            os.makedirs(self.profile_path, exist_ok=True)
+            path = os.path.join(self.profile_path, f"{crash_id}.{ruleset_name}.prof")
+            profiler.dump_stats(path)
+            self.logger.debug("wrote profile for crash %s to %s", crash_id, path)
+        except OSError:
+            self.logger.exception("error: crash id %s: writing profile", crash_id)
+        finally:
+            self._profile_lock.release()
 
     def reject_raw_crash(self, crash_id, reason):
         self.logger.warning("%s rejected: %s", crash_id, reason)
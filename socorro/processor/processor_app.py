@@ -16,11 +16,14 @@ It uses a fetch/transform/save model.
 
 """
 
-from contextlib import suppress
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from functools import partial
 import logging
 import os
 from pathlib import Path
+import shutil
 import signal
 import tempfile
 import time
@@ -36,9 +39,10 @@ from sentry_sdk.integrations.stdlib import StdlibIntegration
 from sentry_sdk.integrations.threading import ThreadingIntegration
 
 from socorro import settings
-from socorro.external.crashstorage_base import CrashIDNotFound
-from socorro.libclass import build_instance, build_instance_from_settings
+from socorro.external.crashstorage_base import AsyncCrashStorage, CrashIDNotFound
+from socorro.libclass import build_instance, build_instance_from_settings, import_class
 from socorro.libmarkus import set_up_metrics, METRICS
+from socorro.lib.asyncio_task_manager import Stage
 from socorro.lib.libdatetime import isoformat_to_time
 from socorro.lib.libdockerflow import get_release_name, get_version_info
 from socorro.lib.liblogging import set_up_logging
@@ -49,6 +53,21 @@ def count_sentry_scrub_error(msg):
     METRICS.incr("sentry_scrub_error", value=1, tags=["service:processor"])
 
 
+def parse_task(task):
+    """Parse a processing task into crash id and ruleset name.
+
+    :arg task: either ``CRASHID`` or ``CRASHID:RULESET``
+
+    :returns: ``(crash_id, ruleset_name)`` tuple
+
+    """
+    if ":" in task:
+        crash_id, ruleset_name = task.split(":", 1)
+    else:
+        crash_id, ruleset_name = task, "default"
+    return crash_id, ruleset_name
+
+
 class ProcessorApp:
     """App that transforms raw crashes into processed crashes."""
 
@@ -120,10 +139,7 @@ class ProcessorApp:
 
     def transform(self, task, finished_func=(lambda: None)):
         try:
-            if ":" in task:
-                crash_id, ruleset_name = task.split(":", 1)
-            else:
-                crash_id, ruleset_name = task, "default"
+            crash_id, ruleset_name = parse_task(task)
 
             # Set up metrics and sentry scopes
             with METRICS.timer(
@@ -172,31 +188,38 @@ class ProcessorApp:
         self.logger.info("starting %s with %s", crash_id, ruleset_name)
 
         self.logger.debug("fetching data %s", crash_id)
-        # Fetch crash annotations and dumps
-        try:
-            raw_crash = self.source.get_raw_crash(crash_id)
-            dumps = self.source.get_dumps_as_files(crash_id, tmpdir)
-        except CrashIDNotFound:
-            # If the crash isn't found, we just reject it--no need to capture
-            # errors here
-            self.pipeline.reject_raw_crash(
-                crash_id, "crash cannot be found in raw crash storage"
+        # Fetch crash annotations, dumps, and processed crash concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            dumps_future = executor.submit(
+                self.source.get_dumps_as_files, crash_id, tmpdir
             )
-            return
-        except Exception as exc:
-            sentry_sdk.capture_exception(exc)
-            self.logger.exception("error: crash id %s: %r", crash_id, exc)
-            self.pipeline.reject_raw_crash(crash_id, f"error in loading: {exc}")
-            return
-
-        # Fetch processed crash data--there won't be any if this crash hasn't
-        # been processed, yet
-        try:
-            processed_crash = self.source.get_processed_crash(crash_id)
-            new_crash = False
-        except CrashIDNotFound:
-            new_crash = True
-            processed_crash = {}
+            processed_crash_future = executor.submit(
+                self.source.get_processed_crash, crash_id
+            )
+            try:
+                raw_crash = self.source.get_raw_crash(crash_id)
+                dumps = dumps_future.result()
+            except CrashIDNotFound:
+                # If the crash isn't found, we just reject it--no need to capture
+                # errors here
+                self.pipeline.reject_raw_crash(
+                    crash_id, "crash cannot be found in raw crash storage"
+                )
+                return
+            except Exception as exc:
+                sentry_sdk.capture_exception(exc)
+                self.logger.exception("error: crash id %s: %r", crash_id, exc)
+                self.pipeline.reject_raw_crash(crash_id, f"error in loading: {exc}")
+                return
+
+            # Fetch processed crash data--there won't be any if this crash hasn't
+            # been processed, yet
+            try:
+                processed_crash = processed_crash_future.result()
+                new_crash = False
+            except CrashIDNotFound:
+                new_crash = True
+                processed_crash = {}
 
         # Process the crash to generate a processed crash
         self.logger.debug("processing %s", crash_id)
@@ -243,6 +266,167 @@ class ProcessorApp:
 
         self.logger.info("completed %s", crash_id)
 
+    def build_stages(self):
+        """Build fetch/transform/save stages for a pipelined task manager."""
+        return [
+            # The fetch stage fetches the raw crash, dumps, and processed crash at
+            # the same time
+            Stage(name="fetch", func=self.fetch_stage, threads_per_worker=3),
+            Stage(name="transform", func=self.transform_stage),
+            Stage(name="save", func=self.save_stage),
+        ]
+
+    @contextmanager
+    def _stage_sentry_scope(self, job):
+        with sentry_sdk.new_scope() as scope:
+            scope.set_context(
+                "processor",
+                {
+                    "crash_id": job.data["crash_id"],
+                    "ruleset": job.data["ruleset_name"],
+                },
+            )
+            yield scope
+
+    def _record_process_crash_timing(self, job):
+        delta = (time.perf_counter() - job.data["start_time"]) * 1000
+        METRICS.timing(
+            "processor.process_crash",
+            value=delta,
+            tags=[f"ruleset:{job.data['ruleset_name']}"],
+        )
+
+    async def fetch_stage(self, job):
+        """Pipeline stage that fetches crash data from crash storage.
+
+        The raw crash, dumps, and processed crash are fetched concurrently.
+
+        :arg job: the PipelineJob
+
+        :returns: True if the crash should be transformed
+
+        """
+        crash_id, ruleset_name = parse_task(job.args[0])
+        job.data.update(
+            {
+                "crash_id": crash_id,
+                "ruleset_name": ruleset_name,
+                "start_time": time.perf_counter(),
+            }
+        )
+        job.cleanup_funcs.append(partial(self._record_process_crash_timing, job))
+
+        tmpdir = tempfile.mkdtemp(dir=self.temporary_path)
+        job.cleanup_funcs.append(partial(shutil.rmtree, tmpdir, ignore_errors=True))
+        job.data["tmpdir"] = tmpdir
+
+        self.logger.info("starting %s with %s", crash_id, ruleset_name)
+        with self._stage_sentry_scope(job):
+            self.logger.debug("fetching data %s", crash_id)
+            raw_crash, dumps, processed_crash = await asyncio.gather(
+                self.async_source.get_raw_crash(crash_id),
+                self.async_source.get_dumps_as_files(crash_id, tmpdir),
+                self.async_source.get_processed_crash(crash_id),
+                return_exceptions=True,
+            )
+
+            for result in (raw_crash, dumps):
+                if isinstance(result, CrashIDNotFound):
+                    self.pipeline.reject_raw_crash(
+                        crash_id, "crash cannot be found in raw crash storage"
+                    )
+                    return False
+                if isinstance(result, Exception):
+                    sentry_sdk.capture_exception(result)
+                    self.logger.error("error: crash id %s: %r", crash_id, result)
+                    self.pipeline.reject_raw_crash(
+                        crash_id, f"error in loading: {result}"
+                    )
+                    return False
+
+            # There won't be a processed crash if this crash hasn't been processed, yet
+            if isinstance(processed_crash, CrashIDNotFound):
+                new_crash = True
+                processed_crash = {}
+            elif isinstance(processed_crash, Exception):
+                raise processed_crash
+            else:
+                new_crash = False
+
+        job.data.update(
+            {
+                "raw_crash": raw_crash,
+                "dumps": dumps,
+                "processed_crash": processed_crash,
+                "new_crash": new_crash,
+            }
+        )
+        return True
+
+    async def transform_stage(self, job):
+        """Pipeline stage that runs the crash through the processor pipeline.
+
+        :arg job: the PipelineJob
+
+        :returns: True
+
+        """
+        crash_id = job.data["crash_id"]
+        with self._stage_sentry_scope(job):
+            self.logger.debug("processing %s", crash_id)
+            job.data["processed_crash"] = await asyncio.to_thread(
+                self.pipeline.process_crash,
+                ruleset_name=job.data["ruleset_name"],
+                raw_crash=job.data["raw_crash"],
+                dumps=job.data["dumps"],
+                processed_crash=job.data["processed_crash"],
+                tmpdir=job.data["tmpdir"],
+            )
+        return True
+
+    async def save_stage(self, job):
+        """Pipeline stage that saves the processed crash to crash destinations.
+
+        :arg job: the PipelineJob
+
+        :returns: True if the processed crash was saved to all destinations
+
+        """
+        crash_id = job.data["crash_id"]
+        raw_crash = job.data["raw_crash"]
+        processed_crash = job.data["processed_crash"]
+
+        with self._stage_sentry_scope(job):
+            self.logger.debug("saving %s", crash_id)
+            for dest in self.async_destinations:
+                try:
+                    with METRICS.timer(
+                        f"processor.{dest.crash_destination_name}.save_processed_crash"
+                    ):
+                        await dest.save_processed_crash(raw_crash, processed_crash)
+                except Exception as storage_error:
+                    sentry_sdk.capture_exception(storage_error)
+                    self.logger.error(
+                        "error: crash id %s: %r (%s)",
+                        crash_id,
+                        storage_error,
+                        dest.crash_destination_name,
+                    )
+                    return False
+
+        METRICS.incr("processor.save_processed_crash")
+        self.logger.info("saved %s", crash_id)
+
+        if job.data["ruleset_name"] == "default" and job.data["new_crash"]:
+            collected = raw_crash.get("submitted_timestamp", None)
+            if collected:
+                delta = time.time() - isoformat_to_time(collected)
+                delta = delta * 1000
+                METRICS.timing("processor.ingestion_timing", value=delta)
+
+        self.logger.info("completed %s", crash_id)
+        return True
+
     def _set_up_source_and_destination(self):
         """Instantiate classes necessary for processing."""
         self.queue = build_instance_from_settings(settings.QUEUE)
@@ -254,6 +438,10 @@ class ProcessorApp:
             destinations.append(dest_obj)
         self.destinations = destinations
 
+        # Async adapters for pipelined task managers
+        self.async_source = AsyncCrashStorage(self.source)
+        self.async_destinations = [AsyncCrashStorage(dest) for dest in destinations]
+
         self.pipeline = build_instance_from_settings(settings.PROCESSOR["pipeline"])
 
         self.temporary_path = settings.PROCESSOR["temporary_path"]
@@ -271,12 +459,11 @@ class ProcessorApp:
         # Create task manager
         manager_class = settings.PROCESSOR["task_manager"]["class"]
         manager_settings = settings.PROCESSOR["task_manager"]["options"]
-        manager_settings.update(
-            {
-                "job_source_iterator": self.source_iterator,
-                "task_func": self.transform,
-            }
-        )
+        manager_settings["job_source_iterator"] = self.source_iterator
+        if getattr(import_class(manager_class), "uses_stages", False):
+            manager_settings["stages"] = self.build_stages()
+        else:
+            manager_settings["task_func"] = self.transform
         self.task_manager = build_instance(
             class_path=manager_class, kwargs=manager_settings
         )
@@ -315,6 +502,9 @@ class ProcessorApp:
         self._set_up_task_manager()
         self._set_up_source_and_destination()
 
+        # Let the crash queue size pulls to what the task manager can hold
+        self.queue.set_capacity(self.task_manager.capacity)
+
     def main(self):
         """Run task manager blocking_start and then close when done"""
         self.task_manager.blocking_start()
@@ -24,6 +24,10 @@ class AndroidCPUInfoRule(Rule):
         "x86_64": "amd64",
     }
 
+    requires = ("raw_crash.Android_CPU_ABI",)
+    reads = ("cpu_arch",)
+    writes = ("cpu_arch",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         cpu_arch = processed_crash.get("cpu_arch", "unknown")
         return cpu_arch == "unknown" and "Android_CPU_ABI" in raw_crash
@@ -45,6 +49,10 @@ class AndroidOSInfoRule(Rule):
 
     """
 
+    requires = ("raw_crash.Android_Version",)
+    reads = ("os_name",)
+    writes = ("os_name", "os_version")
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         os_name = processed_crash.get("os_name", "unknown").lower()
         return os_name in ("unknown", "android") and "Android_Version" in raw_crash
@@ -13,8 +13,23 @@ class Rule:
     Provides structure for calling rules during the processor pipeline and also
     has some useful utilities for rules.
 
+    Rules can declare the crash data they use so the pipeline can skip rules that
+    don't apply and check rule order when it loads a ruleset:
+
+    * ``requires``: keys that must all be present for the rule to apply, like
+      ``"raw_crash.JavaStackTrace"``, ``"processed_crash.json_dump"``, or
+      ``"dumps.memory_report"``; if any are missing, the pipeline skips the rule
+      without calling ``predicate``, so these must never be looser than the
+      predicate
+    * ``reads``: processed crash keys the rule reads
+    * ``writes``: processed crash keys the rule writes
+
     """
 
+    requires = ()
+    reads = ()
+    writes = ()
+
     def __init__(self):
         self.logger = logging.getLogger(self.name)
 
@@ -3,15 +3,18 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import os
 import shlex
 import subprocess
+import time
 
 from glom import glom
 
 from socorro.libmarkus import METRICS
+from socorro.processor.pipeline import Status
 from socorro.processor.rules.base import Rule
 
 
@@ -31,6 +34,15 @@ class CrashingThreadInfoRule(Rule):
 
     """
 
+    requires = ("processed_crash.json_dump",)
+    writes = (
+        "address",
+        "crashing_thread",
+        "crashing_thread_name",
+        "last_error_value",
+        "reason",
+    )
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return processed_crash.get("json_dump", None) is not None
 
@@ -97,6 +109,9 @@ class CrashInconsistenciesRule(Rule):
 
     """
 
+    requires = ("processed_crash.json_dump",)
+    writes = ("crash_inconsistencies",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return processed_crash.get("json_dump", None) is not None
 
@@ -133,6 +148,9 @@ class PossibleBitFlipsRule(Rule):
 
     """
 
+    requires = ("processed_crash.json_dump",)
+    writes = ("possible_bit_flips_max_confidence",)
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         bit_flips = glom(
             processed_crash, "json_dump.crash_info.possible_bit_flips", default=None
@@ -163,6 +181,9 @@ class HasGuardPageAccessRule(Rule):
 
     """
 
+    requires = ("processed_crash.json_dump",)
+    writes = ("has_guard_page_access",)
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         accesses = glom(
             processed_crash, "json_dump.crash_info.memory_accesses", default=None
@@ -310,12 +331,23 @@ class MinidumpStackwalkRule(Rule):
 
     Also adds processor notes.
 
+    If ``command_line`` doesn't have an ``{output_path}`` parameter, the stackwalker
+    output is read from the process' stdout pipe rather than written to a file in
+    the temporary directory and read back.
+
+    If the crash report has multiple minidumps, up to ``max_parallel_dumps`` of them
+    are stackwalked at the same time. All the stackwalker runs for a crash report
+    share the ``kill_timeout`` budget. Results and notes are merged in the order of
+    the dumps so the processed crash doesn't depend on which run finished first.
+
     Emits:
 
     * processor.minidumpstackwalk.*
 
     """
 
+    writes = ("json_dump",)
+
     def __init__(
         self,
         dump_field="upload_file_minidump",
@@ -338,6 +370,7 @@ class MinidumpStackwalkRule(Rule):
         kill_timeout=600,
         symbol_tmp_path="/tmp/symbols-tmp",
         symbol_cache_path="/tmp/symbols",
+        max_parallel_dumps=4,
     ):
         super().__init__()
 
@@ -345,6 +378,10 @@ class MinidumpStackwalkRule(Rule):
         if kill_timeout is None:
             kill_timeout = 600
 
+        # If max_parallel_dumps is None, set it to 4--the default
+        if max_parallel_dumps is None:
+            max_parallel_dumps = 4
+
         self.dump_field = dump_field
         self.symbols_urls = symbols_urls or []
         self.command_path = command_path
@@ -352,6 +389,11 @@ class MinidumpStackwalkRule(Rule):
         self.kill_timeout = kill_timeout
         self.symbol_tmp_path = symbol_tmp_path
         self.symbol_cache_path = symbol_cache_path
+        self.max_parallel_dumps = max_parallel_dumps
+
+        # If the command line doesn't specify an output file, the stackwalker writes
+        # its output to stdout
+        self.output_to_stdout = "{output_path}" not in command_line
 
         self.stackwalk_version = self.get_version()
         self.build_directories()
@@ -365,6 +407,7 @@ class MinidumpStackwalkRule(Rule):
             "kill_timeout",
             "symbol_tmp_path",
             "symbol_cache_path",
+            "max_parallel_dumps",
         )
         return self.generate_repr(keys=keys)
 
@@ -399,7 +442,8 @@ class MinidumpStackwalkRule(Rule):
 
         :param dump_file_path: the absolute path to the dump file to parse
         :param raw_crash_path: the absolute path to the crash annotations file
-        :param output_path: the absolute path to where the output will go
+        :param output_path: the absolute path to where the output will go or None if
+            the output goes to stdout
         :param log_path: the absolute path to where logging output will go
 
         :returns: command line as a string
@@ -428,9 +472,24 @@ class MinidumpStackwalkRule(Rule):
         return self.command_line.format(**params)
 
     def run_stackwalker(
-        self, crash_id, command_path, command_line, output_path, log_path, status
+        self,
+        crash_id,
+        command_path,
+        command_line,
+        output_path,
+        log_path,
+        status,
+        timeout=None,
     ):
-        ret = execute_process(command_line, timeout=self.kill_timeout)
+        if timeout is None:
+            timeout = self.kill_timeout
+
+        if timeout <= 0:
+            # The kill_timeout budget for this crash report is used up, so treat
+            # this like the stackwalker got killed
+            ret = {"stdout": b"", "stderr": b"", "returncode": -9}
+        else:
+            ret = execute_process(command_line, timeout=timeout)
         returncode = ret["returncode"]
 
         # Grab any log data
@@ -446,10 +505,14 @@ class MinidumpStackwalkRule(Rule):
 
         output = {}
         if returncode == 0:
-            if os.path.exists(output_path):
+            output_raw = None
+            if output_path is None:
+                output_raw = ret["stdout"].decode("utf-8", errors="replace")
+            elif os.path.exists(output_path):
                 with open(output_path, "r") as fp:
                     output_raw = fp.read()
 
+            if output_raw is not None:
                 try:
                     output = json.loads(output_raw)
                 except Exception as exc:
@@ -511,6 +574,82 @@ class MinidumpStackwalkRule(Rule):
 
         return stackwalker_data
 
+    def walk_dump(
+        self, crash_id, dump_name, dump_file_path, raw_crash_path, tmpdir, deadline
+    ):
+        """Runs the stackwalker on a single dump.
+
+        :arg crash_id: the crash report id
+        :arg dump_name: the name of the dump
+        :arg dump_file_path: the path to the dump file
+        :arg raw_crash_path: the path to the crash annotations file
+        :arg tmpdir: a temporary directory to use
+        :arg deadline: ``time.monotonic()`` value by which all stackwalker runs for
+            this crash report must finish
+
+        :returns: ``(stackwalker_data, notes)`` tuple
+
+        """
+        # Each dump gets its own Status so notes can be merged in dump order
+        status = Status()
+
+        file_size = os.path.getsize(dump_file_path)
+        if file_size == 0:
+            # If the dump file is empty (0-bytes), then we don't want to bother
+            # running minidump-stackwalker.
+            #
+            # This is a bad case, so we want to add a note. However, since this
+            # is a shortcut, we also include some stackwalker_data.
+            stackwalker_data = {
+                "mdsw_status_string": "EmptyMinidump",
+                "mdsw_stderr": "Shortcut for 0-bytes minidump.",
+            }
+
+            status.add_note(
+                f"MinidumpStackwalkRule: {dump_name} is empty--skipping "
+                + "minidump processing"
+            )
+            return stackwalker_data, status.notes
+
+        log_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.log")
+        if self.output_to_stdout:
+            output_path = None
+        else:
+            output_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.json")
+        command_line = self.expand_commandline(
+            dump_file_path=dump_file_path,
+            raw_crash_path=raw_crash_path,
+            output_path=output_path,
+            log_path=log_path,
+        )
+
+        stackwalker_data = self.run_stackwalker(
+            crash_id=crash_id,
+            command_path=self.command_path,
+            command_line=command_line,
+            output_path=output_path,
+            log_path=log_path,
+            status=status,
+            timeout=deadline - time.monotonic(),
+        )
+
+        stderr = stackwalker_data.get("mdsw_stderr", "").strip()
+        if stderr:
+            if stderr.startswith("ERROR"):
+                indicator = stderr.split(" ")[1]
+            else:
+                indicator = ""
+
+            status_string = stackwalker_data.get("mdsw_status_string", "")
+            if indicator and status_string in ["OK", "unknown error"]:
+                stackwalker_data["mdsw_status_string"] = indicator
+                status.add_note(
+                    f"MinidumpStackwalkRule: processing {dump_name} had error; "
+                    + "stomped on mdsw_status_string"
+                )
+
+        return stackwalker_data, status.notes
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         crash_id = raw_crash["uuid"]
 
@@ -521,62 +660,36 @@ class MinidumpStackwalkRule(Rule):
         with open(raw_crash_path, "w") as fp:
             json.dump(raw_crash, fp)
 
-        for dump_name, dump_file_path in dumps.items():
-            # This rule only works on minidumps which the crash reporter prefixes
-            # with the value of dump_field (defaults to "upload_file_minidump")
-            if not dump_name.startswith(self.dump_field):
-                continue
-
-            file_size = os.path.getsize(dump_file_path)
-            if file_size == 0:
-                # If the dump file is empty (0-bytes), then we don't want to bother
-                # running minidump-stackwalker.
-                #
-                # This is a bad case, so we want to add a note. However, since this
-                # is a shortcut, we also include some stackwalker_data.
-                stackwalker_data = {
-                    "mdsw_status_string": "EmptyMinidump",
-                    "mdsw_stderr": "Shortcut for 0-bytes minidump.",
-                }
+        # This rule only works on minidumps which the crash reporter prefixes with the
+        # value of dump_field (defaults to "upload_file_minidump")
+        dump_names = [
+            dump_name for dump_name in dumps if dump_name.startswith(self.dump_field)
+        ]
+        if not dump_names:
+            return
 
-                status.add_note(
-                    f"MinidumpStackwalkRule: {dump_name} is empty--skipping "
-                    + "minidump processing"
-                )
+        deadline = time.monotonic() + self.kill_timeout
 
-            else:
-                log_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.log")
-                output_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.json")
-                command_line = self.expand_commandline(
-                    dump_file_path=dump_file_path,
-                    raw_crash_path=raw_crash_path,
-                    output_path=output_path,
-                    log_path=log_path,
-                )
+        def _walk_dump(dump_name):
+            return self.walk_dump(
+                crash_id=crash_id,
+                dump_name=dump_name,
+                dump_file_path=dumps[dump_name],
+                raw_crash_path=raw_crash_path,
+                tmpdir=tmpdir,
+                deadline=deadline,
+            )
 
-                stackwalker_data = self.run_stackwalker(
-                    crash_id=crash_id,
-                    command_path=self.command_path,
-                    command_line=command_line,
-                    output_path=output_path,
-                    log_path=log_path,
-                    status=status,
-                )
+        max_workers = min(self.max_parallel_dumps, len(dump_names))
+        if max_workers <= 1:
+            results = [_walk_dump(dump_name) for dump_name in dump_names]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # map returns results in dump_names order
+                results = list(executor.map(_walk_dump, dump_names))
 
-                stderr = stackwalker_data.get("mdsw_stderr", "").strip()
-                if stderr:
-                    if stderr.startswith("ERROR"):
-                        indicator = stderr.split(" ")[1]
-                    else:
-                        indicator = ""
-
-                    status_string = stackwalker_data.get("mdsw_status_string", "")
-                    if indicator and status_string in ["OK", "unknown error"]:
-                        stackwalker_data["mdsw_status_string"] = indicator
-                        status.add_note(
-                            f"MinidumpStackwalkRule: processing {dump_name} had error; "
-                            + "stomped on mdsw_status_string"
-                        )
+        for dump_name, (stackwalker_data, notes) in zip(dump_names, results):
+            status.add_notes(notes)
 
             if dump_name == self.dump_field:
                 processed_crash.update(stackwalker_data)
@@ -591,6 +704,9 @@ class MinidumpStackwalkRule(Rule):
 class ThreadCountRule(Rule):
     """Copies thread_count from minidump-stackwalk output to processed crash"""
 
+    reads = ("json_dump",)
+    writes = ("thread_count",)
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         processed_crash["thread_count"] = glom(
             processed_crash, "json_dump.thread_count", default=None
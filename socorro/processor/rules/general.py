@@ -93,6 +93,9 @@ class CPUInfoRule(Rule):
 
     """
 
+    reads = ("json_dump",)
+    writes = ("cpu_arch", "cpu_count", "cpu_info", "cpu_microcode_version")
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         # This is the CPU info of the machine the product was running on
         processed_crash["cpu_info"] = glom(
@@ -121,6 +124,9 @@ class CPUInfoRule(Rule):
 
 
 class OSInfoRule(Rule):
+    reads = ("json_dump",)
+    writes = ("os_name", "os_version")
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         os_name = glom(
             processed_crash, "json_dump.system_info.os", default="Unknown"
@@ -10,6 +10,8 @@ from socorro.lib import libjava
 class JavaStackTraceRule(Rule):
     """Process and sanitize JavaStackTrace annotation."""
 
+    requires = ("raw_crash.JavaStackTrace",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return bool(raw_crash.get("JavaStackTrace", None))
 
@@ -20,6 +20,9 @@ class MemoryReportExtraction(Rule):
 
     """
 
+    requires = ("processed_crash.json_dump", "processed_crash.memory_report")
+    writes = ("memory_measures",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         try:
             # Verify that...
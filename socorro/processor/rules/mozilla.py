@@ -229,6 +229,8 @@ class ConvertModuleSignatureInfoRule(Rule):
 
     """
 
+    requires = ("raw_crash.ModuleSignatureInfo",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return not isinstance(raw_crash.get("ModuleSignatureInfo", ""), str)
 
@@ -412,6 +414,8 @@ class DatesAndTimesRule(Rule):
 class BreadcrumbsRule(Rule):
     """Validate and copy over Breadcrumbs data."""
 
+    requires = ("raw_crash.Breadcrumbs",)
+
     def __init__(self, schema):
         super().__init__()
         self.schema = schema
@@ -451,6 +455,8 @@ class MacBootArgsRule(Rule):
 
     """
 
+    requires = ("processed_crash.json_dump",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return bool(glom(processed_crash, "json_dump.mac_boot_args", default=None))
 
@@ -513,6 +519,8 @@ class MozCrashReasonRule(Rule):
         "do not use eval with system privileges",
     )
 
+    requires = ("raw_crash.MozCrashReason",)
+
     def sanitize_reason(self, reason):
         if reason.startswith(self.DISALLOWED_PREFIXES):
             return "sanitized--see moz_crash_reason_raw"
@@ -533,6 +541,9 @@ class OutOfMemoryBinaryRule(Rule):
     # Number of bytes, max, that we accept memory_report value as JSON.
     MAX_SIZE_UNCOMPRESSED = 20 * 1024 * 1024  # ~20Mb
 
+    requires = ("dumps.memory_report",)
+    writes = ("memory_report",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return "memory_report" in dumps
 
@@ -626,6 +637,9 @@ class TopMostFilesRule(Rule):
     Bug #519703.
     """
 
+    requires = ("processed_crash.json_dump",)
+    reads = ("crashing_thread",)
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         try:
             crashing_thread = processed_crash["crashing_thread"]
@@ -669,6 +683,8 @@ class MissingSymbolsRule(Rule):
 
     NULL_DEBUG_ID = "0" * 33
 
+    requires = ("processed_crash.json_dump",)
+
     def format_module(self, item):
         filename = item["filename"]
         filename = self.BAD_FILENAME_CHARACTERS.sub("", filename)
@@ -717,6 +733,9 @@ class ModulesInStackRule(Rule):
     # Debug ids are hex strings
     BAD_DEBUGID_CHARACTERS = re.compile(r"[^a-f0-9]", re.IGNORECASE)
 
+    requires = ("processed_crash.json_dump",)
+    reads = ("crashing_thread",)
+
     def format_module(self, item):
         filename = item.get("filename", "")
         filename = self.BAD_FILENAME_CHARACTERS.sub("", filename)
@@ -902,6 +921,9 @@ class PlatformInfoRule(Rule):
         ("os_version", "OSVersion", ""),
     ]
 
+    reads = ("cpu_arch", "cpu_info", "os_name", "os_version")
+    writes = ("cpu_arch", "cpu_info", "os_name", "os_version")
+
     def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
         for key, annotation, sentinel in self.FIELDS:
             current = processed_crash.get(key, "")
@@ -952,6 +974,9 @@ class OSPrettyVersionRule(Rule):
         # NOTE(willkg): Windows 11 is 10.0.21996 and higher, so it's not in this map
     }
 
+    reads = ("json_dump", "os_name", "os_version")
+    writes = ("os_pretty_version",)
+
     def parse_version(self, os_version):
         if not os_version or not isinstance(os_version, str):
             return None
@@ -1130,6 +1155,8 @@ class PHCRule(Rule):
 
     """
 
+    requires = ("raw_crash.PHCKind",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return "PHCKind" in raw_crash
 
@@ -1172,6 +1199,8 @@ class ModuleURLRewriteRule(Rule):
 
     """
 
+    requires = ("processed_crash.json_dump",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         return bool(glom(processed_crash, "json_dump.modules", default=None))
 
@@ -1305,6 +1334,9 @@ class ReportTypeRule(Rule):
 class SoftErrorsRule(Rule):
     """Copies soft_errors from minidump-stackwalk output to processed crash"""
 
+    requires = ("processed_crash.json_dump",)
+    writes = ("soft_errors",)
+
     def predicate(self, raw_crash, dumps, processed_crash, tmpdir, status):
         # If the value is omitted from the mdsw output entirely, don't add it to
         # the processed crash. If the value is present (even if falsy), add it
@@ -3,9 +3,16 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import email.utils
 import json
 import os
 import os.path
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
 
 from socorro.external.gcs.crashstorage import build_keys
 from socorro.lib.libdatetime import JsonDTEncoder
@@ -32,9 +39,39 @@ To create an API token for Socorro in -prod, visit:
 
     https://crash-stats.mozilla.org/api/tokens/
 
+Crash data that's already in the output directory isn't fetched again, so you can
+rerun the command to resume an interrupted run. Use --workers to fetch several
+crashes at once and --rate to limit how many requests per second are made.
+
 """
 
 
+# Size of chunks in bytes when streaming dumps to disk
+CHUNK_SIZE = 64 * 1024
+
+# Maximum number of times a request is retried after an HTTP 429
+MAX_RATE_LIMITED_RETRIES = 10
+
+# Seconds to wait after an HTTP 429 response without a valid Retry-After header
+DEFAULT_RETRY_AFTER = 10
+
+
+def get_umask():
+    """Return the process umask
+
+    The only way to read the umask is to set it, so this should be called before
+    there are other threads creating files.
+
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Permissions for saved files; the same as open() would create them with
+FILE_MODE = 0o666 & ~get_umask()
+
+
 class CrashDoesNotExist(Exception):
     pass
 
@@ -44,108 +81,255 @@ class BadAPIToken(Exception):
 
 
 def create_dir_if_needed(d):
-    if not os.path.exists(d):
-        os.makedirs(d)
+    os.makedirs(d, exist_ok=True)
+
+
+def parse_retry_after(value, now=None):
+    """Return the number of seconds to wait from a Retry-After header value
+
+    :arg value: the header value which is either seconds or an HTTP date
+    :arg now: the current time as a timezone-aware datetime; defaults to now
+
+    :returns: seconds as a float or None if the value isn't valid
+
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=datetime.timezone.utc)
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_date - now).total_seconds())
+
+
+class HostRateLimiter:
+    """Spaces out requests to each host and pauses them after an HTTP 429
+
+    This is shared by all the worker threads so when one of them gets rate limited,
+    they all back off.
+
+    :arg requests_per_second: maximum requests per second per host; 0 for no limit
+
+    """
+
+    def __init__(self, requests_per_second=0):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        # host -> monotonic time the next request can start at
+        self._next_time = {}
+
+    def wait(self, host):
+        """Block until a request to host can be made"""
+        with self._lock:
+            now = time.monotonic()
+            start_time = max(now, self._next_time.get(host, now))
+            self._next_time[host] = start_time + self.interval
+        if start_time > now:
+            time.sleep(start_time - now)
+
+    def pause(self, host, seconds):
+        """Hold off requests to host for seconds"""
+        with self._lock:
+            self._next_time[host] = max(
+                self._next_time.get(host, 0.0), time.monotonic() + seconds
+            )
+
+
+_thread_local = threading.local()
+
+
+def get_session():
+    """Return a requests session for this thread"""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        # HTTP 429 responses are handled by the HostRateLimiter, so don't retry them
+        # here
+        session = session_with_retries(default_timeout=10.0, status_forcelist=(500,))
+        _thread_local.session = session
+    return session
+
+
+def http_get(limiter, url, **kwargs):
+    """Do a GET request that waits for the rate limiter and retries HTTP 429s
+
+    :arg limiter: the HostRateLimiter
+    :arg url: the url to get
+    :arg kwargs: any additional arguments to pass to ``Session.get``
+
+    :returns: the response
+
+    """
+    host = urlsplit(url).netloc
+    session = get_session()
+    for _ in range(MAX_RATE_LIMITED_RETRIES):
+        limiter.wait(host)
+        resp = session.get(url, **kwargs)
+        if resp.status_code != 429:
+            return resp
+
+        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+        print("Rate limited by %s; waiting %s seconds" % (host, retry_after))
+        limiter.pause(host, retry_after)
+        resp.close()
+    return resp
+
+
+def save_file(fn, write_func, mode="w"):
+    """Save a file so that it's either complete or not there
+
+    :arg fn: the path of the file
+    :arg write_func: function that takes a file object and writes the contents
+    :arg mode: "w" for text or "wb" for binary
+
+    """
+    create_dir_if_needed(os.path.dirname(fn))
+    fd, tmp_fn = tempfile.mkstemp(dir=os.path.dirname(fn), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as fp:
+            write_func(fp)
+        # mkstemp creates files only the owner can read
+        os.chmod(tmp_fn, FILE_MODE)
+        os.replace(tmp_fn, fn)
+    except BaseException:
+        os.unlink(tmp_fn)
+        raise
+
+
+def save_json(fn, data, **kwargs):
+    save_file(fn, lambda fp: json.dump(data, fp, cls=JsonDTEncoder, **kwargs))
 
 
 def fetch_crash(
-    host, fetchraw, fetchdumps, fetchprocessed, outputdir, api_token, crash_id
+    host,
+    fetchraw,
+    fetchdumps,
+    fetchprocessed,
+    outputdir,
+    api_token,
+    crash_id,
+    skip_existing=False,
+    limiter=None,
 ):
     """Fetch crash data and save to correct place on the file system
 
     https://antenna.readthedocs.io/en/latest/overview.html#cloud-storage-file-hierarchy
 
+    If skip_existing is True, files already in outputdir aren't fetched again.
+    Files are only put in place once they're complete, so an interrupted run can be
+    resumed.
+
     """
     if api_token:
         headers = {"Auth-Token": api_token}
     else:
         headers = {}
 
-    session = session_with_retries(default_timeout=10.0)
+    limiter = limiter or HostRateLimiter()
+
+    def get_path(name):
+        return os.path.join(outputdir, build_keys(name, crash_id)[0])
 
     if fetchraw:
-        # Fetch raw crash metadata
-        print("Fetching raw %s" % crash_id)
-        resp = session.get(
-            host + "/api/RawCrash/",
-            params={"crash_id": crash_id, "format": "meta"},
-            headers=headers,
-        )
+        fn = get_path("raw_crash")
+        if skip_existing and os.path.exists(fn):
+            print("Already have raw %s" % crash_id)
+            with open(fn) as fp:
+                raw_crash = json.load(fp)
+        else:
+            # Fetch raw crash metadata
+            print("Fetching raw %s" % crash_id)
+            resp = http_get(
+                limiter,
+                host + "/api/RawCrash/",
+                params={"crash_id": crash_id, "format": "meta"},
+                headers=headers,
+            )
 
-        # Handle 404 and 403 so we can provide the user more context
-        if resp.status_code == 404:
-            raise CrashDoesNotExist(crash_id)
-        if api_token and resp.status_code == 403:
-            raise BadAPIToken(resp.json().get("error", "No error provided"))
+            # Handle 404 and 403 so we can provide the user more context
+            if resp.status_code == 404:
+                raise CrashDoesNotExist(crash_id)
+            if api_token and resp.status_code == 403:
+                raise BadAPIToken(resp.json().get("error", "No error provided"))
 
-        # Raise an error for any other non-200 response
-        resp.raise_for_status()
+            # Raise an error for any other non-200 response
+            resp.raise_for_status()
 
-        # Save raw crash to file system
-        raw_crash = resp.json()
-        key = build_keys("raw_crash", crash_id)[0]
-        fn = os.path.join(outputdir, key)
-        create_dir_if_needed(os.path.dirname(fn))
-        with open(fn, "w") as fp:
-            json.dump(raw_crash, fp, cls=JsonDTEncoder, indent=2, sort_keys=True)
+            # Save raw crash to file system
+            raw_crash = resp.json()
+            save_json(fn, raw_crash, indent=2, sort_keys=True)
 
     if fetchdumps:
-        # Fetch dumps
-        dumps = {}
-
         # The dump_checksums is in a different place depending on the raw_crash
         # structure version
         raw_crash_version = raw_crash.get("version", 1)
         if raw_crash_version == 1:
-            dump_names = raw_crash.get("dump_checksums", {}).keys()
+            dump_names = list(raw_crash.get("dump_checksums", {}).keys())
         elif raw_crash_version == 2:
-            dump_names = raw_crash.get("metadata", {}).get("dump_checksums", {}).keys()
+            dump_names = list(
+                raw_crash.get("metadata", {}).get("dump_checksums", {}).keys()
+            )
 
         for dump_name in dump_names:
-            print("Fetching dump %s/%s" % (crash_id, dump_name))
-
             # We store "upload_file_minidump" as "dump", so we need to use that
             # name when requesting from the RawCrash api
             file_name = dump_name
             if file_name == "upload_file_minidump":
                 file_name = "dump"
 
-            resp = session.get(
+            fn = get_path(file_name)
+            if skip_existing and os.path.exists(fn):
+                print("Already have dump %s/%s" % (crash_id, dump_name))
+                continue
+
+            print("Fetching dump %s/%s" % (crash_id, dump_name))
+            resp = http_get(
+                limiter,
                 host + "/api/RawCrash/",
                 params={"crash_id": crash_id, "format": "raw", "name": file_name},
                 headers=headers,
+                stream=True,
             )
-
-            if resp.status_code != 200:
-                raise Exception(
-                    "Something unexpected happened. status_code %s, content %s"
-                    % (resp.status_code, resp.content)
+            with resp:
+                if resp.status_code != 200:
+                    raise Exception(
+                        "Something unexpected happened. status_code %s, content %s"
+                        % (resp.status_code, resp.content)
+                    )
+
+                # Stream the dump to disk
+                save_file(
+                    fn,
+                    lambda fp, resp=resp: fp.writelines(
+                        resp.iter_content(chunk_size=CHUNK_SIZE)
+                    ),
+                    mode="wb",
                 )
 
-            dumps[dump_name] = resp.content
-
-        # Save dump_names to file system
-        key = build_keys("dump_names", crash_id)[0]
-        fn = os.path.join(outputdir, key)
-        create_dir_if_needed(os.path.dirname(fn))
-        with open(fn, "w") as fp:
-            json.dump(list(dumps.keys()), fp)
-
-        # Save dumps to file system
-        for dump_name, data in dumps.items():
-            if dump_name == "upload_file_minidump":
-                dump_name = "dump"
-
-            key = build_keys(dump_name, crash_id)[0]
-            fn = os.path.join(outputdir, key)
-            create_dir_if_needed(os.path.dirname(fn))
-            with open(fn, "wb") as fp:
-                fp.write(data)
+        # Save dump_names to file system after the dumps so it's there only if all
+        # the dumps are
+        save_json(get_path("dump_names"), dump_names)
 
     if fetchprocessed:
+        fn = get_path("processed_crash")
+        if skip_existing and os.path.exists(fn):
+            print("Already have processed %s" % crash_id)
+            return
+
         # Fetch processed crash data
         print("Fetching processed %s" % crash_id)
-        resp = session.get(
+        resp = http_get(
+            limiter,
             host + "/api/ProcessedCrash/",
             params={"crash_id": crash_id, "format": "meta"},
             headers=headers,
@@ -162,11 +346,7 @@ def fetch_crash(
 
         # Save processed crash to file system
         processed_crash = resp.json()
-        key = build_keys("processed_crash", crash_id)[0]
-        fn = os.path.join(outputdir, key)
-        create_dir_if_needed(os.path.dirname(fn))
-        with open(fn, "w") as fp:
-            json.dump(processed_crash, fp, cls=JsonDTEncoder, indent=2, sort_keys=True)
+        save_json(fn, processed_crash, indent=2, sort_keys=True)
 
 
 def main(argv=None):
@@ -205,6 +385,27 @@ def main(argv=None):
         help="whether or not to save processed crash data",
     )
 
+    parser.add_argument(
+        "--skip-existing",
+        "--no-skip-existing",
+        dest="skip_existing",
+        action=FlagAction,
+        default=True,
+        help="whether or not to skip crash data that's already in the output directory",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of crashes to fetch concurrently",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="maximum number of requests per second to the host; 0 for no limit",
+    )
+
     parser.add_argument("outputdir", help="directory to place crash data in")
     parser.add_argument(
         "crashid",
@@ -237,18 +438,43 @@ def main(argv=None):
             "No api token provided. Skipping dumps and personally identifiable information."
         )
 
-    for crash_id in args.crashid:
-        crash_id = crash_id.strip()
+    # Remove duplicates so two workers don't write the same files
+    crash_ids = list(dict.fromkeys(crash_id.strip() for crash_id in args.crashid))
+    crash_ids = [crash_id for crash_id in crash_ids if crash_id]
 
-        print("Working on %s..." % crash_id)
-        fetch_crash(
-            host=args.host,
-            fetchraw=args.fetchraw,
-            fetchdumps=args.fetchdumps,
-            fetchprocessed=args.fetchprocessed,
-            outputdir=outputdir,
-            api_token=api_token,
-            crash_id=crash_id,
-        )
+    limiter = HostRateLimiter(requests_per_second=args.rate)
+    failed = []
 
+    def fetch(crash_id):
+        print("Working on %s..." % crash_id)
+        try:
+            fetch_crash(
+                host=args.host,
+                fetchraw=args.fetchraw,
+                fetchdumps=args.fetchdumps,
+                fetchprocessed=args.fetchprocessed,
+                outputdir=outputdir,
+                api_token=api_token,
+                crash_id=crash_id,
+                skip_existing=args.skip_existing,
+                limiter=limiter,
+            )
+        except BadAPIToken:
+            raise
+        except Exception as exc:
+            print("Error fetching %s: %r" % (crash_id, exc))
+            failed.append(crash_id)
+
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        try:
+            for _ in executor.map(fetch, crash_ids):
+                pass
+        except BadAPIToken:
+            # Every other request is going to fail, too, so stop
+            executor.shutdown(cancel_futures=True)
+            raise
+
+    if failed:
+        print("Failed to fetch %d crashes: %s" % (len(failed), " ".join(failed)))
+        return 1
     return 0
@@ -64,6 +64,10 @@ INFINITY = Infinity()
 def fetch_crashids(host, params, num_results):
     """Generator that returns crash ids
 
+    Pages are fetched with the ``search_after`` cursor Super Search returns for
+    sorted queries. If the host doesn't return a cursor, this falls back to
+    ``_results_offset``.
+
     :arg str host: the host to query
     :arg dict params: dict of super search parameters to base the query on
     :arg varies num: number of results to get or INFINITY
@@ -75,7 +79,9 @@ def fetch_crashids(host, params, num_results):
 
     session = session_with_retries()
 
-    # Set up first page
+    # Set up first page; the cursor requires a sort
+    params.setdefault("_sort", "-date")
+    params.pop("_search_after", None)
     params["_results_offset"] = 0
     params["_results_number"] = min(MAX_PAGE, num_results)
 
@@ -86,7 +92,8 @@ def fetch_crashids(host, params, num_results):
         if resp.status_code != 200:
             raise Exception(f"Bad response: {resp.status_code} {resp.content}")
 
-        hits = resp.json()["hits"]
+        data = resp.json()
+        hits = data["hits"]
 
         for hit in hits:
             crashids_count += 1
@@ -97,12 +104,20 @@ def fetch_crashids(host, params, num_results):
                 return
 
         # If there are no more crash ids to get, we return
-        total = resp.json()["total"]
+        total = data["total"]
         if not hits or crashids_count >= total:
             return
 
         # Get the next page, but only as many results as we need
-        params["_results_offset"] += MAX_PAGE
+        search_after = data.get("search_after")
+        if search_after:
+            params.pop("_results_offset", None)
+            params["_search_after"] = search_after
+        elif "_search_after" in params:
+            # The last page wasn't full, so there aren't any more to get
+            return
+        else:
+            params["_results_offset"] += MAX_PAGE
         params["_results_number"] = min(
             # MAX_PAGE is the maximum we can request
             MAX_PAGE,
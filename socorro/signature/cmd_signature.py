@@ -9,7 +9,7 @@ import sys
 
 import requests
 
-from .generator import SignatureGenerator
+from .generator import get_cached_generator
 from .utils import convert_to_crash_data, parse_crashid
 
 
@@ -197,12 +197,7 @@ def main(argv=None):
 
     api_token = os.environ.get("SOCORRO_API_TOKEN", "")
 
-    generator_kwargs = {}
-    if args.signature_list_dir:
-        generator_kwargs = {
-            "signature_list_dir": args.signature_list_dir,
-        }
-    generator = SignatureGenerator(**generator_kwargs)
+    generator = get_cached_generator(signature_list_dir=args.signature_list_dir or None)
 
     if args.crashids:
         crashids_iterable = args.crashids
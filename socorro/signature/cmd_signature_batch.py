@@ -0,0 +1,304 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import argparse
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import gzip
+import itertools
+import json
+import os
+import sys
+
+from .generator import get_cached_generator
+from .utils import convert_to_crash_data
+
+
+DESCRIPTION = """
+Regenerates signatures for processed crashes stored locally and outputs old and new
+signatures. Processed crashes are read from a file system crash storage directory
+(gzipped ``.jsonz`` files) or a JSONL file with one processed crash per line.
+Signature generation runs in a pool of worker processes.
+"""
+
+
+# Number of processed crashes per task sent to a worker process
+BATCH_SIZE = 100
+
+# Number of tasks queued per worker process; this bounds how many processed crashes
+# are held in memory at once
+TASKS_PER_WORKER = 4
+
+
+def iter_fs_sources(path):
+    """Yield processed crash file paths in a file system crash storage directory.
+
+    :arg path: the root of a file system crash storage directory
+
+    :returns: generator of ``(kind, path)`` tuples
+
+    """
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".jsonz"):
+                yield ("jsonz", os.path.join(dirpath, filename))
+
+
+def iter_jsonl_sources(path):
+    """Yield lines of a JSONL file that has one processed crash per line.
+
+    :arg path: path to the JSONL file; ``-`` for stdin
+
+    :returns: generator of ``(kind, line)`` tuples
+
+    """
+    fp = sys.stdin if path == "-" else open(path)
+    try:
+        for line in fp:
+            line = line.strip()
+            if line:
+                yield ("json", line)
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+
+
+def load_processed_crash(kind, source):
+    """Load a processed crash from a source.
+
+    :arg kind: ``"jsonz"`` if the source is a path to a gzipped JSON file or
+        ``"json"`` if the source is a JSON string
+    :arg source: the path or JSON string
+
+    :returns: the processed crash as a dict
+
+    """
+    if kind == "jsonz":
+        with gzip.open(source, "rb") as fp:
+            return json.load(fp)
+    return json.loads(source)
+
+
+def regenerate_batch(batch, signature_list_dir=None):
+    """Regenerate signatures for a batch of processed crashes.
+
+    This runs in worker processes.
+
+    :arg batch: list of ``(kind, source)`` tuples
+    :arg signature_list_dir: the directory of signature list files to use or
+        ``None`` for the included ones
+
+    :returns: list of row dicts with ``crashid``, ``old``, ``new``, ``notes``, and
+        ``error`` keys
+
+    """
+    generator = get_cached_generator(signature_list_dir=signature_list_dir)
+    rows = []
+    for kind, source in batch:
+        try:
+            processed_crash = load_processed_crash(kind, source)
+            crash_id = processed_crash.get("uuid", "")
+            old_signature = processed_crash.get("signature", "")
+            result = generator.generate(convert_to_crash_data(processed_crash))
+        except Exception as exc:
+            rows.append(
+                {
+                    "crashid": source if kind == "jsonz" else "",
+                    "old": "",
+                    "new": "",
+                    "notes": [],
+                    "error": f"{exc.__class__.__name__}: {exc}",
+                }
+            )
+            continue
+
+        rows.append(
+            {
+                "crashid": crash_id,
+                "old": old_signature,
+                "new": result.signature,
+                "notes": result.notes,
+                "error": "",
+            }
+        )
+    return rows
+
+
+def run_batches(sources, workers, signature_list_dir=None, batch_size=BATCH_SIZE):
+    """Regenerate signatures for sources using a pool of worker processes.
+
+    Results are yielded in the same order as the sources. Only a bounded number of
+    batches are queued at a time.
+
+    :arg sources: iterable of ``(kind, source)`` tuples
+    :arg workers: number of worker processes; if 0, signatures are generated in
+        this process
+    :arg signature_list_dir: the directory of signature list files to use or
+        ``None`` for the included ones
+    :arg batch_size: number of processed crashes per task
+
+    :returns: generator of row dicts
+
+    """
+    sources = iter(sources)
+    batches = iter(lambda: list(itertools.islice(sources, batch_size)), [])
+
+    if workers <= 0:
+        for batch in batches:
+            yield from regenerate_batch(batch, signature_list_dir=signature_list_dir)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(
+                executor.submit(
+                    regenerate_batch, batch, signature_list_dir=signature_list_dir
+                )
+            )
+            if len(pending) >= workers * TASKS_PER_WORKER:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+class CSVOutput:
+    def __init__(self, fp):
+        self.out = csv.writer(fp, quoting=csv.QUOTE_ALL)
+        self.out.writerow(["crashid", "old", "new", "same?", "notes", "error"])
+
+    def row(self, row):
+        self.out.writerow(
+            [
+                row["crashid"],
+                row["old"],
+                row["new"],
+                str(row["old"] == row["new"]),
+                row["notes"],
+                row["error"],
+            ]
+        )
+
+
+class JSONLOutput:
+    def __init__(self, fp):
+        self.fp = fp
+
+    def row(self, row):
+        row = dict(row)
+        row["same"] = row["old"] == row["new"]
+        self.fp.write(json.dumps(row) + "\n")
+
+
+class Summary:
+    """Aggregate counts of signature changes"""
+
+    def __init__(self):
+        self.total = 0
+        self.changed = 0
+        self.errors = 0
+        self.changes = Counter()
+
+    def add(self, row):
+        self.total += 1
+        if row["error"]:
+            self.errors += 1
+        elif row["old"] != row["new"]:
+            self.changed += 1
+            self.changes[(row["old"], row["new"])] += 1
+
+    def write(self, fp, top=20):
+        unchanged = self.total - self.changed - self.errors
+        print(f"Total:     {self.total}", file=fp)
+        print(f"Changed:   {self.changed}", file=fp)
+        print(f"Unchanged: {unchanged}", file=fp)
+        print(f"Errors:    {self.errors}", file=fp)
+        if self.changes:
+            print(f"Most common changes (top {top}):", file=fp)
+            for (old, new), count in self.changes.most_common(top):
+                print(f"  {count:>8}  {old}", file=fp)
+                print(f"        ->  {new}", file=fp)
+
+
+def main(argv=None):
+    """Regenerates signatures for locally stored processed crashes"""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument(
+        "--fs-root",
+        help="root directory of file system crash storage with processed crashes",
+    )
+    source_group.add_argument(
+        "--jsonl",
+        help="JSONL file with one processed crash per line; - for stdin",
+    )
+    parser.add_argument(
+        "--format",
+        default="csv",
+        choices=["csv", "jsonl"],
+        help="output format: csv (default) or jsonl",
+    )
+    parser.add_argument(
+        "--output", default="-", help="file to write rows to; defaults to stdout"
+    )
+    parser.add_argument(
+        "--different-only",
+        dest="different",
+        action="store_true",
+        help="limit output to just the signatures that changed",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes; 0 to run in this process",
+    )
+    parser.add_argument(
+        "--signature-list-dir",
+        required=False,
+        help=(
+            "directory of signature list files to use; if not specified, uses the "
+            + "included signature list files"
+        ),
+    )
+
+    if argv is None:
+        args = parser.parse_args()
+    else:
+        args = parser.parse_args(argv)
+
+    if args.fs_root:
+        sources = iter_fs_sources(args.fs_root)
+    else:
+        sources = iter_jsonl_sources(args.jsonl)
+
+    outputter = CSVOutput if args.format == "csv" else JSONLOutput
+    out_fp = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+
+    summary = Summary()
+    try:
+        out = outputter(out_fp)
+        rows = run_batches(
+            sources,
+            workers=args.workers,
+            signature_list_dir=args.signature_list_dir or None,
+        )
+        for row in rows:
+            summary.add(row)
+            if args.different and row["old"] == row["new"] and not row["error"]:
+                continue
+            out.row(row)
+    finally:
+        if out_fp is not sys.stdout:
+            out_fp.close()
+
+    summary.write(sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
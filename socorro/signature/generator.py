@@ -5,6 +5,7 @@
 import dataclasses
 import inspect
 import sys
+import threading
 from typing import Any, Dict, List
 
 from .rules import (
@@ -23,6 +24,7 @@ from .rules import (
     StackOverflowSignature,
     StackwalkerErrorSignatureRule,
 )
+from .siglists_utils import get_signature_lists_mtimes, INCLUDED
 
 
 DEFAULT_RULESET = [
@@ -151,3 +153,41 @@ class SignatureGenerator:
                 result.info(rule_name, "Rule failed: %s", exc)
 
         return result
+
+
+# signature_list_dir -> (signature list mtimes, SignatureGenerator)
+_GENERATOR_CACHE = {}
+_GENERATOR_CACHE_LOCK = threading.Lock()
+
+
+def get_cached_generator(signature_list_dir=None):
+    """Return a shared SignatureGenerator that uses the default ruleset
+
+    Building a SignatureGenerator reads and compiles all the signature lists, so
+    this builds one per signature list directory and reuses it. If a signature list
+    file changes, the SignatureGenerator is rebuilt.
+
+    The returned generator is shared between threads, so don't change it.
+
+    :param signature_list_dir: path to the directory with the signature lists to use
+        or ``None`` to use the included ones
+
+    :returns: ``SignatureGenerator`` instance
+
+    """
+    key = str(signature_list_dir) if signature_list_dir is not None else None
+    mtimes = get_signature_lists_mtimes(
+        source=INCLUDED if signature_list_dir is None else signature_list_dir
+    )
+
+    with _GENERATOR_CACHE_LOCK:
+        cached = _GENERATOR_CACHE.get(key)
+        if cached is not None and cached[0] == mtimes:
+            return cached[1]
+
+        generator_kwargs = {}
+        if signature_list_dir is not None:
+            generator_kwargs["signature_list_dir"] = signature_list_dir
+        generator = SignatureGenerator(**generator_kwargs)
+        _GENERATOR_CACHE[key] = (mtimes, generator)
+        return generator
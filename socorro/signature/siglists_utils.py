@@ -30,6 +30,15 @@ _SPECIAL_EXTENDED_VALUES = {
 }
 
 
+# The signature lists signature generation uses
+SIGNATURE_LISTS = (
+    "irrelevant_signature_re",
+    "prefix_signature_re",
+    "signature_sentinels",
+    "signatures_with_line_numbers_re",
+)
+
+
 class BadRegularExpressionLineError(Exception):
     """Raised when a file contains an invalid regular expression."""
 
@@ -99,3 +108,25 @@ def get_signature_list_content(name, source=INCLUDED):
         lines = lines + _SPECIAL_EXTENDED_VALUES[source]
 
     return tuple(lines)
+
+
+def get_signature_lists_mtimes(source=INCLUDED):
+    """Return the modification times of the signature list files.
+
+    :param source: where to look for the signature list files: ``INCLUDED`` to look
+        at included signature list files or the directory on the file system as a
+        Path or string
+
+    :returns: tuple of ``(name, mtime_ns)`` tuples; mtime_ns is ``None`` if the file
+        doesn't exist or doesn't support stat
+
+    """
+    mtimes = []
+    for name in SIGNATURE_LISTS:
+        filepath = get_filepath(name, source=source)
+        try:
+            mtime_ns = filepath.stat().st_mtime_ns
+        except (AttributeError, OSError):
+            mtime_ns = None
+        mtimes.append((name, mtime_ns))
+    return tuple(mtimes)
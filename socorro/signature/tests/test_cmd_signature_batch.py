@@ -0,0 +1,96 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import gzip
+import importlib
+import json
+
+
+# NOTE(willkg): We do this so that we can extract signature generation into its
+# own namespace as an external library. This allows the tests to run if it's in
+# "siggen" or "socorro.signature".
+base_module = ".".join(__name__.split(".")[:-2])
+cmd_signature_batch = importlib.import_module(base_module + ".cmd_signature_batch")
+
+
+def build_processed_crash(crash_id, signature, function):
+    return {
+        "uuid": crash_id,
+        "signature": signature,
+        "json_dump": {
+            "crash_info": {"crashing_thread": 0},
+            "threads": [
+                {"frames": [{"frame": 0, "function": function, "module": "xul.dll"}]}
+            ],
+        },
+    }
+
+
+CRASHES = [
+    build_processed_crash("de1bb258-cbbf-4589-a673-34f800160918", "foo", "foo"),
+    build_processed_crash("de1bb258-cbbf-4589-a673-34f800160919", "old", "bar"),
+]
+
+
+class TestSignatureBatch:
+    def test_jsonl(self, tmp_path, capsys):
+        jsonl_path = tmp_path / "crashes.jsonl"
+        jsonl_path.write_text(
+            "\n".join(json.dumps(crash) for crash in CRASHES) + "\nnot json\n"
+        )
+        output_path = tmp_path / "out.jsonl"
+
+        ret = cmd_signature_batch.main(
+            [
+                "--jsonl",
+                str(jsonl_path),
+                "--format",
+                "jsonl",
+                "--output",
+                str(output_path),
+                "--workers",
+                "0",
+            ]
+        )
+        assert ret == 0
+
+        rows = [json.loads(line) for line in output_path.read_text().splitlines()]
+        assert [(row["crashid"], row["old"], row["new"]) for row in rows] == [
+            ("de1bb258-cbbf-4589-a673-34f800160918", "foo", "foo"),
+            ("de1bb258-cbbf-4589-a673-34f800160919", "old", "bar"),
+            ("", "", ""),
+        ]
+        assert rows[2]["error"].startswith("JSONDecodeError")
+
+        summary = capsys.readouterr().err
+        assert "Total:     3" in summary
+        assert "Changed:   1" in summary
+        assert "Errors:    1" in summary
+
+    def test_fs_root_with_workers(self, tmp_path, capsys):
+        for crash in CRASHES:
+            crash_dir = tmp_path / "20160918" / "name" / crash["uuid"][:2]
+            crash_dir.mkdir(parents=True, exist_ok=True)
+            with gzip.open(crash_dir / f"{crash['uuid']}.jsonz", "wb") as fp:
+                fp.write(json.dumps(crash).encode("utf-8"))
+
+        ret = cmd_signature_batch.main(
+            ["--fs-root", str(tmp_path), "--workers", "2", "--different-only"]
+        )
+        assert ret == 0
+
+        out, err = capsys.readouterr()
+        lines = out.splitlines()
+        assert lines[0] == '"crashid","old","new","same?","notes","error"'
+        assert lines[1:] == [
+            '"de1bb258-cbbf-4589-a673-34f800160919","old","bar","False","[]",""'
+        ]
+        assert "Total:     2" in err
+
+    def test_run_batches_keeps_order(self):
+        sources = [("json", json.dumps(crash)) for crash in CRASHES * 5]
+        rows = list(cmd_signature_batch.run_batches(sources, workers=2, batch_size=3))
+        assert [row["crashid"] for row in rows] == [
+            crash["uuid"] for crash in CRASHES * 5
+        ]
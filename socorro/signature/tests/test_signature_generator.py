@@ -3,6 +3,9 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 import importlib
+import os
+from pathlib import Path
+import shutil
 from unittest import mock
 
 
@@ -60,3 +63,32 @@ class TestSignatureGenerator:
                 extra={"rule": "BadRule"},
             )
         ]
+
+
+class TestGetCachedGenerator:
+    def test_cached(self):
+        generator_obj = generator.get_cached_generator()
+        assert generator_obj is generator.get_cached_generator()
+
+        ret = generator_obj.generate({})
+        assert ret.signature == "EMPTY: no frame data available"
+
+    def test_rebuilt_when_siglist_changes(self, tmp_path):
+        siglists_dir = Path(generator.__file__).parent / "siglists"
+        for path in siglists_dir.glob("*.txt"):
+            shutil.copy(path, tmp_path / path.name)
+
+        generator_obj = generator.get_cached_generator(signature_list_dir=tmp_path)
+        assert generator_obj is generator.get_cached_generator(
+            signature_list_dir=tmp_path
+        )
+        assert generator_obj is not generator.get_cached_generator()
+
+        # Change a signature list file and make sure the mtime is different
+        prefix_path = tmp_path / "prefix_signature_re.txt"
+        prefix_path.write_text(prefix_path.read_text() + "\nfooBarStuff\n")
+        stat = prefix_path.stat()
+        os.utime(prefix_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        new_generator_obj = generator.get_cached_generator(signature_list_dir=tmp_path)
+        assert new_generator_obj is not generator_obj
@@ -0,0 +1,253 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import os
+import pathlib
+import time
+
+from markus.testing import AnyTagValue, MetricsMock
+import pytest
+
+from socorro.external.cache import crashstorage as cache_crashstorage
+from socorro.external.cache.crashstorage import BlobCache, CachingCrashStorage
+from socorro.external.crashstorage_base import CrashIDNotFound
+
+
+CRASH_ID = "0bba929f-8721-460c-dead-a43c20071025"
+
+
+@pytest.fixture(autouse=True)
+def clear_blob_caches():
+    cache_crashstorage._BLOB_CACHES.clear()
+    yield
+    cache_crashstorage._BLOB_CACHES.clear()
+
+
+class TestBlobCache:
+    def test_get_set_delete(self, tmp_path):
+        cache = BlobCache(tmp_path)
+        assert cache.get("raw_crash", CRASH_ID, ttl=60) == (None, "miss")
+
+        cache.set("raw_crash", CRASH_ID, b"data")
+        assert cache.get("raw_crash", CRASH_ID, ttl=60) == (b"data", "memory")
+
+        # A new cache with the same path finds it on disk
+        cache2 = BlobCache(tmp_path)
+        assert cache2.get("raw_crash", CRASH_ID, ttl=60) == (b"data", "disk")
+        assert cache2.get("raw_crash", CRASH_ID, ttl=60) == (b"data", "memory")
+
+        cache2.delete("raw_crash", CRASH_ID)
+        assert cache2.get("raw_crash", CRASH_ID, ttl=60) == (None, "miss")
+
+    def test_ttl(self, tmp_path):
+        cache = BlobCache(tmp_path)
+        cache.set("raw_crash", CRASH_ID, b"data")
+
+        path = cache.get_file_path("raw_crash", CRASH_ID)
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        cache.memory.clear()
+        cache.memory_size = 0
+
+        assert cache.get("raw_crash", CRASH_ID, ttl=60) == (None, "miss")
+        assert not os.path.exists(path)
+
+    def test_delete_directory(self, tmp_path):
+        cache = BlobCache(tmp_path)
+        cache.set("dump", f"{CRASH_ID}/dump", b"abc")
+        cache.set("dump", f"{CRASH_ID}/other", b"def")
+
+        cache.delete("dump", CRASH_ID)
+        assert cache.get("dump", f"{CRASH_ID}/dump", ttl=60) == (None, "miss")
+        assert cache.get("dump", f"{CRASH_ID}/other", ttl=60) == (None, "miss")
+
+    def test_memory_bounds(self, tmp_path):
+        cache = BlobCache(tmp_path, max_memory_size=10, max_memory_item_size=5)
+        cache.set("dump", "a", b"123456")
+        cache.set("dump", "b", b"1234")
+        cache.set("dump", "c", b"1234")
+        cache.set("dump", "d", b"1234")
+
+        # a is too big for memory and b got evicted; all are on disk
+        assert list(cache.memory) == [("dump", "c"), ("dump", "d")]
+        assert cache.memory_size == 8
+        assert cache.get("dump", "a", ttl=60) == (b"123456", "disk")
+        assert cache.get("dump", "b", ttl=60) == (b"1234", "disk")
+
+    def test_prune(self, tmp_path):
+        cache = BlobCache(tmp_path, max_size=20)
+        for i in range(5):
+            cache.set("dump", str(i), b"12345")
+            path = cache.get_file_path("dump", str(i))
+            os.utime(path, (1000 + i, 1000 + i))
+
+        cache.prune()
+        # The oldest files were deleted to get under 90% of max size
+        remaining = sorted(os.listdir(tmp_path / "dump"))
+        assert remaining == ["2", "3", "4"]
+
+    def test_set_from_file(self, tmp_path):
+        src_path = tmp_path / "src"
+        src_path.write_bytes(b"abcd")
+
+        cache = BlobCache(tmp_path / "cache")
+        cache.set_from_file("dump", f"{CRASH_ID}/dump", str(src_path))
+
+        # It's not kept in memory, but it's on disk
+        assert not cache.memory
+        path = cache.get_path("dump", f"{CRASH_ID}/dump", ttl=60)
+        assert path == cache.get_file_path("dump", f"{CRASH_ID}/dump")
+        assert pathlib.Path(path).read_bytes() == b"abcd"
+
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        assert cache.get_path("dump", f"{CRASH_ID}/dump", ttl=60) is None
+        assert not os.path.exists(path)
+
+
+def build_storage(tmp_path, **kwargs):
+    return CachingCrashStorage(
+        crashstorage={
+            "class": "socorro.external.crashstorage_base.InMemoryCrashStorage"
+        },
+        cache_path=str(tmp_path),
+        **kwargs,
+    )
+
+
+class TestCachingCrashStorage:
+    def test_read_through(self, tmp_path):
+        crashstorage = build_storage(tmp_path)
+        wrapped = crashstorage.crashstorage
+        wrapped.save_raw_crash(
+            {"uuid": CRASH_ID}, {"upload_file_minidump": b"abcd"}, CRASH_ID
+        )
+
+        with MetricsMock() as metricsmock:
+            assert crashstorage.get_raw_crash(CRASH_ID) == {"uuid": CRASH_ID}
+            assert crashstorage.get_dumps(CRASH_ID) == {"upload_file_minidump": b"abcd"}
+            metricsmock.assert_incr(
+                "socorro.crashstorage_cache.lookup",
+                tags=["datatype:raw_crash", "result:miss", AnyTagValue("host")],
+            )
+
+        # Remove the data from the wrapped storage; it's still served from the cache
+        wrapped.delete_crash(CRASH_ID)
+        assert crashstorage.get_raw_crash(CRASH_ID) == {"uuid": CRASH_ID}
+        assert crashstorage.get_dumps(CRASH_ID) == {"upload_file_minidump": b"abcd"}
+        assert crashstorage.get_raw_dump(CRASH_ID, "upload_file_minidump") == b"abcd"
+
+        (tmp_path / "tmp").mkdir()
+        dumps = crashstorage.get_dumps_as_files(CRASH_ID, str(tmp_path / "tmp"))
+        assert list(dumps) == ["upload_file_minidump"]
+
+        # Instances with the same cache path share the cache
+        crashstorage2 = build_storage(tmp_path)
+        assert crashstorage2.get_raw_crash(CRASH_ID) == {"uuid": CRASH_ID}
+
+    def test_dumps_as_files(self, tmp_path):
+        crashstorage = build_storage(tmp_path / "cache")
+        wrapped = crashstorage.crashstorage
+        wrapped.save_raw_crash(
+            {"uuid": CRASH_ID},
+            {"upload_file_minidump": b"abcd", "memory_report": b"efgh"},
+            CRASH_ID,
+        )
+        tmpdir = tmp_path / "tmp"
+        tmpdir.mkdir()
+
+        with MetricsMock() as metricsmock:
+            dumps = crashstorage.get_dumps_as_files(CRASH_ID, str(tmpdir))
+            metricsmock.assert_incr(
+                "socorro.crashstorage_cache.lookup",
+                tags=["datatype:dump", "result:miss", AnyTagValue("host")],
+            )
+        for path in dumps.values():
+            os.remove(path)
+
+        # Remove the data from the wrapped storage; the dumps are copied from the
+        # cache without going through memory
+        wrapped.delete_crash(CRASH_ID)
+        with MetricsMock() as metricsmock:
+            dumps = crashstorage.get_dumps_as_files(CRASH_ID, str(tmpdir))
+            metricsmock.assert_incr(
+                "socorro.crashstorage_cache.lookup",
+                tags=["datatype:dump", "result:disk", AnyTagValue("host")],
+            )
+        assert not [key for key in crashstorage.cache.memory if key[0] == "dump"]
+        assert sorted(dumps) == ["memory_report", "upload_file_minidump"]
+        assert pathlib.Path(dumps["upload_file_minidump"]).read_bytes() == b"abcd"
+        assert pathlib.Path(dumps["memory_report"]).read_bytes() == b"efgh"
+        assert os.path.dirname(dumps["memory_report"]) == str(tmpdir)
+
+        # The dumps are also shared with get_dumps
+        assert crashstorage.get_raw_dump(CRASH_ID, "memory_report") == b"efgh"
+
+    def test_dumps_as_files_pruned(self, tmp_path):
+        crashstorage = build_storage(tmp_path / "cache")
+        crashstorage.crashstorage.save_raw_crash(
+            {"uuid": CRASH_ID}, {"upload_file_minidump": b"abcd"}, CRASH_ID
+        )
+        tmpdir = tmp_path / "tmp"
+        tmpdir.mkdir()
+        crashstorage.get_dumps_as_files(CRASH_ID, str(tmpdir))
+
+        # The dump file was pruned, but the dump names weren't, so it gets fetched
+        # again
+        os.remove(crashstorage.cache.get_file_path("dump", f"{CRASH_ID}/dump"))
+        dumps = crashstorage.get_dumps_as_files(CRASH_ID, str(tmpdir))
+        assert pathlib.Path(dumps["upload_file_minidump"]).read_bytes() == b"abcd"
+
+    def test_not_found(self, tmp_path):
+        crashstorage = build_storage(tmp_path)
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_raw_crash(CRASH_ID)
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_processed_crash(CRASH_ID)
+
+    def test_processed_crash_write_through(self, tmp_path):
+        crashstorage = build_storage(tmp_path)
+        crashstorage.save_processed_crash(
+            {"uuid": CRASH_ID}, {"uuid": CRASH_ID, "signature": "OOM | small"}
+        )
+        crashstorage.crashstorage.delete_crash(CRASH_ID)
+
+        assert crashstorage.get_processed_crash(CRASH_ID) == {
+            "uuid": CRASH_ID,
+            "signature": "OOM | small",
+        }
+
+    def test_processed_crash_ttl(self, tmp_path):
+        crashstorage = build_storage(tmp_path, processed_crash_ttl=0)
+        crashstorage.save_processed_crash(
+            {"uuid": CRASH_ID}, {"uuid": CRASH_ID, "signature": "OOM | small"}
+        )
+        crashstorage.crashstorage.delete_crash(CRASH_ID)
+
+        time.sleep(0.01)
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_processed_crash(CRASH_ID)
+
+    def test_delete_crash_invalidates(self, tmp_path):
+        crashstorage = build_storage(tmp_path)
+        crashstorage.save_raw_crash(
+            {"uuid": CRASH_ID}, {"upload_file_minidump": b"abcd"}, CRASH_ID
+        )
+        crashstorage.save_processed_crash({"uuid": CRASH_ID}, {"uuid": CRASH_ID})
+        crashstorage.get_raw_crash(CRASH_ID)
+        crashstorage.get_dumps(CRASH_ID)
+
+        crashstorage.delete_crash(CRASH_ID)
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_raw_crash(CRASH_ID)
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_dumps(CRASH_ID)
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_processed_crash(CRASH_ID)
+
+    def test_passes_through_attributes(self, tmp_path):
+        crashstorage = build_storage(tmp_path)
+        assert crashstorage._raw_crash_data is crashstorage.crashstorage._raw_crash_data
+        with pytest.raises(AttributeError):
+            crashstorage.does_not_exist  # noqa: B018
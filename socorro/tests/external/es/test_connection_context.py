@@ -2,8 +2,15 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import socket
+from unittest import mock
+
+from markus.testing import MetricsMock
+
 from socorro import settings
-from socorro.libclass import build_instance
+from socorro.external.es import connection_context
+from socorro.external.es.connection_context import KeepAliveUrllib3HttpNode
+from socorro.libclass import build_instance, build_instance_from_settings
 from socorro.lib.libdatetime import utc_now
 
 
@@ -61,3 +68,55 @@ class TestConnectionContext:
         # Delete the index and assert it's no longer there
         conn.delete_index(index_name)
         assert index_name not in list(es_helper.get_indices())
+
+    def test_shared_client(self):
+        conn = self.build_conn()
+        other_conn = self.build_conn()
+        assert conn.connection() is other_conn.connection()
+
+        # Different settings get a different client
+        other_conn.connections_per_node = conn.connections_per_node + 1
+        assert conn.connection() is not other_conn.connection()
+
+    def test_timeout_override(self):
+        conn = self.build_conn()
+        client = conn.connection(timeout=conn.timeout + 5)
+        assert client is not conn.connection()
+        # The override shares the shared client's connections
+        assert client.transport is conn.connection().transport
+
+    def test_keepalive(self):
+        conn = self.build_conn()
+        conn.keepalive_idle = 30
+        client = conn.connection()
+        assert client is conn.connection()
+
+        for node in client.transport.node_pool.all():
+            assert isinstance(node, KeepAliveUrllib3HttpNode)
+            assert (
+                socket.SOL_SOCKET,
+                socket.SO_KEEPALIVE,
+                1,
+            ) in node.pool.conn_kw["socket_options"]
+
+    def test_pool_metrics(self, monkeypatch):
+        monkeypatch.setattr(connection_context, "_pool_metrics_captured", {})
+        crashstorage = build_instance_from_settings(settings.ES_STORAGE)
+        with MetricsMock() as mm:
+            # Metrics are only captured once per interval
+            for _ in range(3):
+                with crashstorage.client():
+                    pass
+
+            records = mm.filter_records(
+                "gauge", stat="socorro.processor.es.connection_pool.utilization"
+            )
+            assert len(records) == 1
+            assert records[0].value == 0
+
+    def test_pool_stats_unexpected_pool(self):
+        conn = self.build_conn()
+        client = conn.connection()
+        node = client.transport.node_pool.all()[0]
+        with mock.patch.object(node, "pool", new=None):
+            assert conn.get_pool_stats() == []
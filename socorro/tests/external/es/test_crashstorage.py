@@ -4,20 +4,26 @@
 
 from copy import deepcopy
 from datetime import timedelta
+import threading
+import time
 from unittest import mock
 
+import elasticsearch
 import glom
 from markus.testing import AnyTagValue, MetricsMock
 import pytest
 
 from socorro import settings
 from socorro.external.es.crashstorage import (
+    BulkIndexError,
+    DocumentBuilder,
     fix_boolean,
     fix_double,
     fix_integer,
     fix_keyword,
     fix_long,
     fix_string,
+    PendingDocument,
 )
 
 from socorro.external.es.super_search_fields import build_mapping
@@ -453,6 +459,259 @@ class TestESCrashStorage:
         doc = es_helper.get_crash_data(crash_id)
         assert glom.glom(doc, key, default=REMOVED_VALUE) == REMOVED_VALUE
 
+    def test_bulk_index_crashes(self, es_helper):
+        crashstorage = self.build_crashstorage()
+        crashstorage.bulk_max_documents = 5
+        crashstorage.bulk_flush_interval = 0.5
+
+        crash_ids = [create_new_ooid() for _ in range(5)]
+
+        def save(crash_id):
+            crashstorage.save_processed_crash(
+                raw_crash={},
+                processed_crash={
+                    "date_processed": date_from_ooid(crash_id),
+                    "uuid": crash_id,
+                },
+            )
+
+        # Save crashes from several threads like the processor does; they're indexed
+        # with bulk requests as the threads start saving
+        with MetricsMock() as mm:
+            threads = [threading.Thread(target=save, args=(cid,)) for cid in crash_ids]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            records = mm.filter_records(
+                "histogram", stat="socorro.processor.es.bulk_documents"
+            )
+            assert sum(record.value for record in records) == 5
+
+        es_helper.refresh()
+        for crash_id in crash_ids:
+            assert es_helper.get_crash_data(crash_id)["crash_id"] == crash_id
+
+    def test_bulk_flush_when_savers_waiting(self):
+        crashstorage = self.build_crashstorage()
+        crashstorage.bulk_max_documents = 10
+        # Long enough that the test times out if the flusher waits for it
+        crashstorage.bulk_flush_interval = 30
+
+        release = threading.Event()
+
+        def save():
+            crashstorage._buffer_document(create_new_ooid(), "socorro_a", {"a": 1})
+            release.wait(timeout=5)
+
+        # Don't start a flusher thread so the test can get the batch itself
+        with mock.patch.object(crashstorage, "_bulk_flusher_main"):
+            threads = [threading.Thread(target=save) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 5
+            while len(crashstorage._bulk_buffer) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            # There are fewer saving threads than bulk_max_documents, so the batch is
+            # ready once each of them is waiting on a document
+            start_time = time.monotonic()
+            batch = crashstorage._next_bulk_batch()
+            assert len(batch) == 3
+            assert time.monotonic() - start_time < 5
+
+            release.set()
+            for thread in threads:
+                thread.join()
+
+    @pytest.mark.parametrize(
+        "key, value",
+        [
+            pytest.param(
+                "processed_crash.user_comments",
+                "a" * 32_767,  # max string lengthis 32_766 bytes
+                id="max_bytes_length_exceeded",
+            ),
+            pytest.param(
+                "processed_crash.user_comments", {"foo": "bar"}, id="unknown_property"
+            ),
+        ],
+    )
+    def test_bulk_invalid_fields_removed(self, key, value, es_helper):
+        crashstorage = self.build_crashstorage()
+
+        batch = []
+        for _ in range(2):
+            crash_id = create_new_ooid()
+            doc = {
+                "crash_id": crash_id,
+                "processed_crash": {
+                    "date_processed": date_from_ooid(crash_id),
+                    "uuid": crash_id,
+                },
+            }
+            index_name = crashstorage.get_index_for_date(date_from_ooid(crash_id))
+            batch.append(PendingDocument(crash_id, index_name, doc))
+        good, bad = batch
+        glom.assign(bad.crash_document, key, value, missing=dict)
+
+        # Only the bad document gets sent again after the field is removed
+        with MetricsMock() as mm:
+            crashstorage._submit_bulk_to_elasticsearch(batch)
+
+            records = mm.filter_records(
+                "histogram", stat="socorro.processor.es.bulk_documents"
+            )
+            assert [record.value for record in records] == [2, 1]
+
+        assert good.future.result() is None
+        assert bad.future.result() is None
+        es_helper.refresh()
+
+        doc = es_helper.get_crash_data(good.crash_id)
+        assert "removed_fields" not in doc
+        doc = es_helper.get_crash_data(bad.crash_id)
+        assert glom.glom(doc, key, default=REMOVED_VALUE) == REMOVED_VALUE
+        assert doc["removed_fields"] == "processed_crash.user_comments"
+
+    def test_bulk_unfixable_error(self):
+        crashstorage = self.build_crashstorage()
+        crash_id = create_new_ooid()
+        pending = PendingDocument(crash_id, "socorro_index", {"crash_id": crash_id})
+
+        mock_connection = mock.MagicMock()
+        mock_connection.__enter__.return_value.bulk.return_value = {
+            "errors": True,
+            "items": [
+                {
+                    "index": {
+                        "_id": crash_id,
+                        "status": 400,
+                        "error": {
+                            "type": "mapper_parsing_exception",
+                            "reason": "something unexpected",
+                            "caused_by": {"type": "other_exception"},
+                        },
+                    }
+                }
+            ],
+        }
+        with mock.patch.object(crashstorage, "create_index"):
+            with mock.patch.object(crashstorage, "client") as mock_client:
+                mock_client.return_value = mock_connection
+                crashstorage._submit_bulk_to_elasticsearch([pending])
+
+        with pytest.raises(BulkIndexError):
+            pending.future.result()
+
+    def test_bulk_error_handling_only_fails_that_document(self):
+        crashstorage = self.build_crashstorage()
+        good = PendingDocument(create_new_ooid(), "socorro_a", {"a": 1})
+        # This error is missing "caused_by", so _remove_bad_field raises KeyError
+        bad_error = PendingDocument(create_new_ooid(), "socorro_a", {"a": 1})
+        # This document's index is gone and creating it again fails
+        missing_index = PendingDocument(create_new_ooid(), "socorro_b", {"a": 1})
+
+        mock_connection = mock.MagicMock()
+        mock_connection.__enter__.return_value.bulk.return_value = {
+            "errors": True,
+            "items": [
+                {"index": {"_id": good.crash_id, "status": 201}},
+                {
+                    "index": {
+                        "_id": bad_error.crash_id,
+                        "status": 400,
+                        "error": {
+                            "type": "document_parsing_exception",
+                            "reason": "something unexpected",
+                        },
+                    }
+                },
+                {
+                    "index": {
+                        "_id": missing_index.crash_id,
+                        "status": 404,
+                        "error": {"type": "index_not_found_exception"},
+                    }
+                },
+            ],
+        }
+        crashstorage._known_indices.update({"socorro_a", "socorro_b"})
+        with mock.patch.object(crashstorage, "create_index") as mock_create_index:
+            mock_create_index.side_effect = Exception("unable to create index")
+            with mock.patch.object(crashstorage, "client") as mock_client:
+                mock_client.return_value = mock_connection
+                crashstorage._submit_bulk_to_elasticsearch(
+                    [good, bad_error, missing_index]
+                )
+
+        assert good.future.result() is None
+        with pytest.raises(KeyError):
+            bad_error.future.result()
+        with pytest.raises(Exception, match="unable to create index"):
+            missing_index.future.result()
+
+    def test_ensure_index_cached(self):
+        crashstorage = self.build_crashstorage()
+        index_name = crashstorage.get_index_for_date(utc_now())
+
+        with mock.patch.object(crashstorage, "client") as mock_client:
+            crashstorage.ensure_index(index_name)
+            # Creates this index and the upcoming ones
+            created = [
+                call.kwargs["index_name"]
+                for call in mock_client.create_index.call_args_list
+            ]
+            assert created[0] == index_name
+            assert created[-1] == crashstorage.get_index_for_date(
+                utc_now() + timedelta(weeks=crashstorage.index_weeks_future)
+            )
+            assert len(created) == len(set(created))
+
+            # Known indices don't get created again
+            mock_client.reset_mock()
+            crashstorage.ensure_index(index_name)
+            mock_client.create_index.assert_not_called()
+
+            # Until they're deleted
+            crashstorage.delete_index(index_name)
+            crashstorage.ensure_index(index_name)
+            assert mock_client.create_index.call_count == 1
+
+    def test_default_mappings_cached(self):
+        crashstorage = self.build_crashstorage()
+        assert (
+            crashstorage.get_default_mappings() is crashstorage.get_default_mappings()
+        )
+
+    def test_submit_recreates_missing_index(self):
+        crashstorage = self.build_crashstorage()
+        crash_id = create_new_ooid()
+        index_name = crashstorage.get_index_for_date(utc_now())
+        not_found = elasticsearch.NotFoundError(
+            message="index_not_found_exception",
+            meta=mock.Mock(status=404),
+            body={"error": {"type": "index_not_found_exception"}},
+        )
+
+        with mock.patch.object(crashstorage, "client") as mock_client:
+            crashstorage.ensure_index(index_name)
+            mock_client.reset_mock()
+
+            conn = mock_client.return_value.__enter__.return_value
+            conn.index.side_effect = [not_found, None]
+            crashstorage._submit_crash_to_elasticsearch(
+                crash_id=crash_id,
+                index_name=index_name,
+                crash_document={"crash_id": crash_id},
+            )
+
+            assert conn.index.call_count == 2
+            mock_client.create_index.assert_called_once_with(
+                index_name=index_name, index_settings=mock.ANY
+            )
+
 
 @pytest.mark.parametrize(
     "value, expected",
@@ -564,3 +823,141 @@ def test_fix_long(value, expected):
 def test_fix_double(value, expected):
     new_value = fix_double(value)
     assert new_value == expected
+
+
+DOCUMENT_BUILDER_FIELDS = {
+    "product": {
+        "name": "product",
+        "namespace": "processed_crash",
+        "in_database_name": "product",
+        "storage_mapping": {"type": "keyword"},
+    },
+    "uptime": {
+        "name": "uptime",
+        "namespace": "processed_crash",
+        "in_database_name": "uptime",
+        "storage_mapping": {"type": "integer"},
+    },
+    "cpu_count": {
+        "name": "cpu_count",
+        "namespace": "processed_crash",
+        "in_database_name": "cpu_count",
+        "source_key": "processed_crash.json_dump.system_info.cpu_count",
+        "destination_keys": [
+            "processed_crash.json_dump.system_info.cpu_count",
+            "processed_crash.cpu_count",
+        ],
+        "storage_mapping": {"type": "short"},
+    },
+    "modules": {
+        "name": "modules",
+        "namespace": "processed_crash",
+        "in_database_name": "modules",
+        "storage_mapping": {"type": "keyword"},
+    },
+    "not_indexed": {
+        "name": "not_indexed",
+        "namespace": "processed_crash",
+        "in_database_name": "not_indexed",
+        "storage_mapping": None,
+    },
+}
+
+
+class TestDocumentBuilder:
+    def test_plan(self):
+        document_builder = DocumentBuilder(
+            DOCUMENT_BUILDER_FIELDS,
+            all_keys={
+                "processed_crash.product",
+                "processed_crash.modules",
+                "processed_crash.cpu_count",
+            },
+        )
+        # Fields that aren't indexable or have no valid destination keys are skipped
+        assert [src_path for src_path, _, _, _ in document_builder.plan] == [
+            ("processed_crash", "product"),
+            ("processed_crash", "json_dump", "system_info", "cpu_count"),
+            ("processed_crash", "modules"),
+        ]
+
+    def test_build(self):
+        document_builder = DocumentBuilder(
+            DOCUMENT_BUILDER_FIELDS,
+            all_keys={
+                "processed_crash.product",
+                "processed_crash.uptime",
+                "processed_crash.json_dump.system_info.cpu_count",
+                "processed_crash.cpu_count",
+                "processed_crash.modules",
+            },
+        )
+        processed_crash = {
+            "product": "Firefox",
+            # Out of bounds, so it's skipped
+            "uptime": 2**40,
+            "json_dump": {"system_info": {"cpu_count": 8}},
+            "modules": ["xul.dll", 5],
+            "not_indexed": "foo",
+        }
+        crash_document = {"crash_id": "abc", "processed_crash": {}}
+        document_builder.build({"processed_crash": processed_crash}, crash_document)
+
+        assert crash_document == {
+            "crash_id": "abc",
+            "processed_crash": {
+                "product": "Firefox",
+                "json_dump": {"system_info": {"cpu_count": 8}},
+                "cpu_count": 8,
+                "modules": ["xul.dll", "BAD DATA"],
+            },
+        }
+
+    def test_build_missing_values(self):
+        document_builder = DocumentBuilder(
+            DOCUMENT_BUILDER_FIELDS,
+            all_keys={
+                "processed_crash.product",
+                "processed_crash.json_dump.system_info.cpu_count",
+            },
+        )
+        crash_document = {"crash_id": "abc", "processed_crash": {}}
+        document_builder.build(
+            {"processed_crash": {"product": None, "json_dump": "not a dict"}},
+            crash_document,
+        )
+        assert crash_document == {"crash_id": "abc", "processed_crash": {}}
+
+    def test_build_copies_containers(self):
+        fields = {
+            "memory_report": {
+                "name": "memory_report",
+                "namespace": "processed_crash",
+                "in_database_name": "memory_report",
+                "storage_mapping": {"type": "object"},
+            },
+        }
+        document_builder = DocumentBuilder(
+            fields, all_keys={"processed_crash.memory_report"}
+        )
+        processed_crash = {"memory_report": {"reports": [1, 2]}}
+        crash_document = {"crash_id": "abc", "processed_crash": {}}
+        document_builder.build({"processed_crash": processed_crash}, crash_document)
+
+        # Changing the crash document doesn't change the processed crash
+        del crash_document["processed_crash"]["memory_report"]["reports"]
+        assert processed_crash == {"memory_report": {"reports": [1, 2]}}
+
+    def test_get_document_builder_cached(self):
+        crashstorage = build_instance_from_settings(settings.ES_STORAGE)
+        document_builder = crashstorage.get_document_builder(
+            {"processed_crash.product"}
+        )
+        assert (
+            crashstorage.get_document_builder({"processed_crash.product"})
+            is document_builder
+        )
+        assert (
+            crashstorage.get_document_builder({"processed_crash.uptime"})
+            is not document_builder
+        )
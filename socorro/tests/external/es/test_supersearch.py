@@ -14,7 +14,12 @@ import pytest
 from socorro import settings
 from socorro.external.es import search_common
 from socorro.external.es.super_search_fields import FIELDS
-from socorro.external.es.supersearch import SuperSearch
+from socorro.external.es.supersearch import (
+    APPROXIMATE_TOTAL_HITS,
+    SuperSearch,
+    decode_search_after,
+    encode_search_after,
+)
 from socorro.lib import BadArgumentError, libdatetime
 from socorro.lib.libdatetime import utc_now
 from socorro.lib.libooid import create_new_ooid
@@ -58,6 +63,18 @@ class SuperSearchWithFields(SuperSearch):
         return super().get(**kwargs)
 
 
+def test_search_after_cursor_roundtrip():
+    sort_fields = ["-processed_crash.date_processed", "processed_crash.uuid"]
+    cursor = encode_search_after(sort_fields, [1700000000000, "de1bb258"])
+    assert decode_search_after(cursor, sort_fields) == [1700000000000, "de1bb258"]
+
+    with pytest.raises(BadArgumentError):
+        decode_search_after(cursor, ["processed_crash.uuid"])
+
+    with pytest.raises(BadArgumentError):
+        decode_search_after("not a cursor", sort_fields)
+
+
 class TestIntegrationSuperSearch:
     """Test SuperSearch with an elasticsearch database containing fake data."""
 
@@ -648,6 +665,52 @@ class TestIntegrationSuperSearch:
         assert res["total"] == number_of_crashes
         assert len(res["hits"]) == 0
 
+    def test_get_with_search_after(self, es_helper):
+        crashstorage = self.build_crashstorage()
+        api = SuperSearchWithFields(crashstorage=crashstorage)
+        number_of_crashes = 21
+        processed_crash = {"signature": "something"}
+        es_helper.index_many_crashes(number_of_crashes, processed_crash=processed_crash)
+
+        uuids = []
+        kwargs = {"_results_number": "10", "_sort": "-date", "_columns": ["uuid"]}
+        for _ in range(3):
+            res = api.get(**kwargs)
+            assert res["total"] == number_of_crashes
+            uuids.extend(hit["uuid"] for hit in res["hits"])
+            if "search_after" not in res:
+                break
+            kwargs["_search_after"] = res["search_after"]
+
+        # Every crash is returned exactly once and the last page has no cursor
+        assert len(uuids) == number_of_crashes
+        assert len(set(uuids)) == number_of_crashes
+        assert len(res["hits"]) == 1
+        assert "search_after" not in res
+
+        # Unsorted searches don't return a cursor
+        res = api.get(_results_number="10")
+        assert "search_after" not in res
+
+    def test_get_with_search_after_errors(self, es_helper):
+        crashstorage = self.build_crashstorage()
+        api = SuperSearchWithFields(crashstorage=crashstorage)
+
+        with pytest.raises(BadArgumentError):
+            api.get(_sort="-date", _search_after="not a cursor")
+
+        cursor = encode_search_after(
+            ["processed_crash.product", "processed_crash.uuid"], ["a", "b"]
+        )
+        with pytest.raises(BadArgumentError):
+            api.get(_sort="-date", _search_after=cursor)
+
+        cursor = encode_search_after(
+            ["-processed_crash.date_processed", "processed_crash.uuid"], [1, "b"]
+        )
+        with pytest.raises(BadArgumentError):
+            api.get(_sort="-date", _search_after=cursor, _results_offset=10)
+
     def test_get_with_sorting(self, es_helper):
         """Test a search with sort returns expected results"""
         now = utc_now()
@@ -1799,6 +1862,19 @@ class TestIntegrationSuperSearch:
         assert "query" in query
         assert "aggs" in query
         assert "size" in query
+        # The total comes from the search response
+        assert query["track_total_hits"] is True
+
+    def test_get_approximate_total(self, es_helper):
+        crashstorage = self.build_crashstorage()
+        api = SuperSearchWithFields(crashstorage=crashstorage)
+
+        res = api.get(_results_number=0, _approximate_total=True, _return_query=True)
+        assert res["query"]["track_total_hits"] == APPROXIMATE_TOTAL_HITS
+
+        # Searches that return hits always get an exact total
+        res = api.get(_results_number=10, _approximate_total=True, _return_query=True)
+        assert res["query"]["track_total_hits"] is True
 
     def test_get_with_zero(self, es_helper):
         crashstorage = self.build_crashstorage()
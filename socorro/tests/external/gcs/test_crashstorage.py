@@ -351,6 +351,27 @@ class TestGcsCrashStorage:
             ),
         }
         assert result == expected
+        with open(result["city_dump"], "rb") as fp:
+            assert fp.read() == b'this is "city_dump", the last one'
+
+    def test_get_dumps_as_files_not_found(self, gcs_helper, tmp_path):
+        crashstorage = build_instance_from_settings(CRASHSTORAGE_SETTINGS)
+        bucket = CRASHSTORAGE_SETTINGS["options"]["bucket"]
+        crash_id = create_new_ooid()
+
+        gcs_helper.create_bucket(bucket)
+        gcs_helper.upload(
+            bucket_name=bucket,
+            key=f"v1/dump_names/{crash_id}",
+            data=b'["dump", "content_dump"]',
+        )
+        gcs_helper.upload(
+            bucket_name=bucket,
+            key=f"v1/dump/{crash_id}",
+            data=b'this is "dump", the first one',
+        )
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_dumps_as_files(crash_id=crash_id, tmpdir=str(tmp_path))
 
     def test_get_processed_crash(self, gcs_helper):
         crashstorage = build_instance_from_settings(CRASHSTORAGE_SETTINGS)
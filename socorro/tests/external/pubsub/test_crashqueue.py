@@ -3,13 +3,23 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 # This is tested using test settings (docker/config/test.env) and Pub/Sub emulator.
+# Tests ending in _stubbed use StubbedPubSub and don't need the emulator.
 
+import datetime
+import logging
+import threading
 import time
+from types import SimpleNamespace
+from unittest import mock
 
+from markus.testing import AnyTagValue, MetricsMock
 import pytest
 
 from socorro import settings
-from socorro.external.pubsub.crashqueue import CrashIdsFailedToPublish
+from socorro.external.pubsub.crashqueue import (
+    CrashIdsFailedToPublish,
+    PubSubCrashQueue,
+)
 from socorro.libclass import build_instance_from_settings
 from socorro.lib.libooid import create_new_ooid
 
@@ -18,6 +28,71 @@ from socorro.lib.libooid import create_new_ooid
 PUBSUB_DELAY_PULL = 0.5
 
 
+def build_received_message(ack_id, crash_id=None):
+    """Builds a stand-in for a message received from a pull"""
+    return SimpleNamespace(
+        ack_id=ack_id,
+        message=SimpleNamespace(
+            data=(crash_id or create_new_ooid()).encode("utf-8"),
+            publish_time=datetime.datetime.now(tz=datetime.timezone.utc),
+        ),
+    )
+
+
+class StubbedPubSub:
+    """Stands in for the Pub/Sub subscriptions of a crash queue
+
+    This stubs out pulling and acknowledging so the crash queue's scheduling and
+    acknowledgement batching can be tested without the Pub/Sub emulator.
+
+    """
+
+    def __init__(self, crashqueue):
+        self.queue_to_path = {
+            "standard": crashqueue.standard_subscription_path,
+            "priority": crashqueue.priority_subscription_path,
+            "reprocessing": crashqueue.reprocessing_subscription_path,
+        }
+        # subscription path -> list of messages waiting to be pulled
+        self.messages = {path: [] for path in self.queue_to_path.values()}
+        # list of (queue, max_messages) for pulls
+        self.pulls = []
+        # list of (subscription path, ack ids) for acknowledge requests
+        self.ack_requests = []
+        self.next_ack_id = 0
+
+        crashqueue._pull = self.pull
+        crashqueue.subscriber.acknowledge = self.acknowledge
+
+    def publish(self, queue, crash_id):
+        self.next_ack_id += 1
+        self.messages[self.queue_to_path[queue]].append(
+            build_received_message(f"ack{self.next_ack_id}", crash_id)
+        )
+
+    def pull(self, subscription_path, max_messages):
+        queue = {path: queue for queue, path in self.queue_to_path.items()}[
+            subscription_path
+        ]
+        self.pulls.append((queue, max_messages))
+        msgs = self.messages[subscription_path][:max_messages]
+        del self.messages[subscription_path][:max_messages]
+        return msgs
+
+    def acknowledge(self, subscription, ack_ids):
+        self.ack_requests.append((subscription, list(ack_ids)))
+
+
+def build_stubbed_crashqueue(**options):
+    """Builds a PubSubCrashQueue with stubbed pulls and acks
+
+    :returns: tuple of (crashqueue, StubbedPubSub)
+
+    """
+    crashqueue = PubSubCrashQueue(**{**settings.QUEUE_PUBSUB["options"], **options})
+    return crashqueue, StubbedPubSub(crashqueue)
+
+
 class TestPubSubCrashQueue:
     def test_iter(self, pubsub_helper):
         standard_crash = create_new_ooid()
@@ -42,7 +117,10 @@ class TestPubSubCrashQueue:
             assert isinstance(item, tuple)
             assert isinstance(item[0], tuple)  # *args
             assert isinstance(item[1], dict)  # **kwargs
-            assert list(item[1].keys()) == ["finished_func"]
+            if item[0] == (priority_crash,):
+                assert list(item[1].keys()) == ["finished_func", "priority"]
+            else:
+                assert list(item[1].keys()) == ["finished_func"]
 
         new_crash_args = {item[0] for item in new_crashes}
         # Assert new_crashes order is the correct order
@@ -99,6 +177,51 @@ class TestPubSubCrashQueue:
             sorted(reprocessing_crashids)
         )
 
+    def test_priority_lane(self, pubsub_helper):
+        standard_crashids = []
+        for _ in range(10):
+            crashid = "000" + create_new_ooid()[3:]
+            standard_crashids.append(crashid)
+            pubsub_helper.publish("standard", crashid)
+
+        priority_crashid = "222" + create_new_ooid()[3:]
+        pubsub_helper.publish("priority", priority_crashid)
+
+        # wait for published messages to become available before pulling
+        time.sleep(PUBSUB_DELAY_PULL)
+
+        crashqueue = build_instance_from_settings(settings.QUEUE_PUBSUB)
+        new_crashes = list(crashqueue.new_crashes())
+
+        # Priority crash ids come first and are marked as priority
+        assert new_crashes[0][0] == (priority_crashid,)
+        assert new_crashes[0][1]["priority"] is True
+        assert sorted(item[0][0] for item in new_crashes[1:]) == sorted(
+            standard_crashids
+        )
+
+    def test_priority_lane_between_batches(self, pubsub_helper):
+        for _ in range(5):
+            pubsub_helper.publish("standard", "000" + create_new_ooid()[3:])
+
+        # wait for published messages to become available before pulling
+        time.sleep(PUBSUB_DELAY_PULL)
+
+        crashqueue = PubSubCrashQueue(
+            **{**settings.QUEUE_PUBSUB["options"], "priority_poll_interval": 0}
+        )
+        new_crashes = crashqueue.new_crashes()
+        first = next(new_crashes)
+        assert first[0][0].startswith("000")
+
+        # A priority crash id published while standard crash ids are being yielded
+        # comes next
+        priority_crashid = "222" + create_new_ooid()[3:]
+        pubsub_helper.publish("priority", priority_crashid)
+        time.sleep(PUBSUB_DELAY_PULL)
+
+        assert next(new_crashes)[0] == (priority_crashid,)
+
     def test_ack(self, pubsub_helper):
         original_crash_id = create_new_ooid()
 
@@ -129,6 +252,394 @@ class TestPubSubCrashQueue:
         new_crashes = list(crashqueue.new_crashes())
         assert new_crashes == []
 
+    def test_ack_batched(self, pubsub_helper):
+        crash_ids = [create_new_ooid() for _ in range(3)]
+        for crash_id in crash_ids:
+            pubsub_helper.publish("standard", crash_id)
+
+        # wait for published messages to become available before pulling
+        time.sleep(PUBSUB_DELAY_PULL)
+
+        # Use a long flush interval so acks stay buffered until close
+        crashqueue = PubSubCrashQueue(
+            **{**settings.QUEUE_PUBSUB["options"], "ack_flush_interval": 60}
+        )
+        new_crashes = list(crashqueue.new_crashes())
+        assert {item[0] for item in new_crashes} == {
+            (crash_id,) for crash_id in crash_ids
+        }
+
+        for _, kwargs in new_crashes:
+            kwargs["finished_func"]()
+
+        # Acks are buffered and not sent yet
+        assert crashqueue.outstanding == 0
+        assert len(crashqueue.pending_acks[crashqueue.standard_subscription_path]) == 3
+
+        # Closing the crash queue flushes the acks
+        crashqueue.close()
+        assert crashqueue.pending_acks == {}
+
+        time.sleep(pubsub_helper.ack_deadline_seconds + 1)
+
+        # Acked crash ids don't get redelivered
+        assert list(crashqueue.new_crashes()) == []
+
+    def test_ack_batch_full(self, pubsub_helper):
+        crash_ids = [create_new_ooid() for _ in range(2)]
+        for crash_id in crash_ids:
+            pubsub_helper.publish("standard", crash_id)
+
+        # wait for published messages to become available before pulling
+        time.sleep(PUBSUB_DELAY_PULL)
+
+        crashqueue = PubSubCrashQueue(
+            **{
+                **settings.QUEUE_PUBSUB["options"],
+                "ack_batch_size": 2,
+                "ack_flush_interval": 60,
+            }
+        )
+        new_crashes = list(crashqueue.new_crashes())
+        assert len(new_crashes) == 2
+
+        new_crashes[0][1]["finished_func"]()
+        assert len(crashqueue.pending_acks[crashqueue.standard_subscription_path]) == 1
+
+        # Filling the batch sends the acks
+        new_crashes[1][1]["finished_func"]()
+        assert crashqueue.pending_acks == {}
+        crashqueue.close()
+
+    def test_max_outstanding_messages(self, pubsub_helper):
+        for _ in range(3):
+            pubsub_helper.publish("standard", create_new_ooid())
+
+        # wait for published messages to become available before pulling
+        time.sleep(PUBSUB_DELAY_PULL)
+
+        crashqueue = PubSubCrashQueue(
+            **{**settings.QUEUE_PUBSUB["options"], "max_outstanding_messages": 2}
+        )
+        new_crashes = crashqueue.new_crashes()
+        first = next(new_crashes)
+        next(new_crashes)
+        assert crashqueue.outstanding == 2
+
+        # The iterator waits for an outstanding crash to finish before pulling the
+        # third crash id rather than stopping
+        timer = threading.Timer(0.5, first[1]["finished_func"])
+        timer.start()
+        next(new_crashes)
+        timer.join()
+        assert crashqueue.outstanding == 2
+        crashqueue.close()
+
+    def test_max_outstanding_messages_wait_times_out(self, caplogpp):
+        crashqueue = PubSubCrashQueue(
+            **{
+                **settings.QUEUE_PUBSUB["options"],
+                "max_outstanding_messages": 1,
+                "capacity_wait_timeout": 0.1,
+            }
+        )
+        with mock.patch.object(crashqueue, "_pull") as mock_pull:
+            mock_pull.side_effect = lambda path, max_messages: (
+                [build_received_message("ack1")]
+                if path == crashqueue.standard_subscription_path
+                else []
+            )
+            new_crashes = crashqueue.new_crashes()
+            next(new_crashes)
+
+            # The crash id is never finished, so the iterator gives up waiting for
+            # room and returns rather than waiting forever
+            with caplogpp.at_level(logging.WARNING, logger="socorro.external.pubsub"):
+                assert list(new_crashes) == []
+            assert "no room for more messages" in caplogpp.text
+        assert crashqueue.outstanding == 1
+
+    def test_outstanding_expires_after_ack_deadline(self):
+        crashqueue = PubSubCrashQueue(
+            **{
+                **settings.QUEUE_PUBSUB["options"],
+                "max_outstanding_messages": 1,
+                "ack_deadline": 0.1,
+            }
+        )
+        ack_ids = ["ack1", "ack2"]
+        with mock.patch.object(crashqueue, "_pull") as mock_pull:
+            mock_pull.side_effect = lambda path, max_messages: (
+                [build_received_message(ack_ids.pop(0))]
+                if path == crashqueue.standard_subscription_path and ack_ids
+                else []
+            )
+            new_crashes = crashqueue.new_crashes()
+            next(new_crashes)
+            assert crashqueue.outstanding == 1
+
+            # Pub/Sub redelivers the lost crash id after the ack deadline, so it
+            # stops counting as outstanding and the iterator pulls more
+            with MetricsMock() as metricsmock:
+                next(new_crashes)
+                metricsmock.assert_incr(
+                    "socorro.processor.pubsub.outstanding_expired",
+                    value=1,
+                    tags=[AnyTagValue("host")],
+                )
+        assert crashqueue.outstanding == 1
+
+    def test_iter_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue()
+        standard_crash = create_new_ooid()
+        pubsub.publish("standard", standard_crash)
+        reprocessing_crash = create_new_ooid()
+        pubsub.publish("reprocessing", reprocessing_crash)
+        priority_crash = create_new_ooid()
+        pubsub.publish("priority", priority_crash)
+        pubsub.publish("standard", "test")
+
+        new_crashes = list(crashqueue.new_crashes())
+        assert [item[0] for item in new_crashes] == [
+            (priority_crash,),
+            (standard_crash,),
+            (reprocessing_crash,),
+        ]
+        assert list(new_crashes[0][1].keys()) == ["finished_func", "priority"]
+        assert list(new_crashes[1][1].keys()) == ["finished_func"]
+
+        # The test crash id is acked and dropped
+        assert crashqueue.pending_acks == {
+            crashqueue.standard_subscription_path: ["ack4"]
+        }
+        crashqueue.close()
+        assert pubsub.ack_requests == [
+            (crashqueue.standard_subscription_path, ["ack4"])
+        ]
+        assert crashqueue.outstanding == 3
+
+    def test_pull_max_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue()
+        for _ in range(10):
+            pubsub.publish("standard", "000" + create_new_ooid()[3:])
+        for _ in range(5):
+            pubsub.publish("reprocessing", "111" + create_new_ooid()[3:])
+
+        new_crashes = [item[0][0] for item in crashqueue.new_crashes()]
+
+        # Subscriptions share rounds by weight and pull twice as many messages in
+        # the next round while there's a backlog
+        assert [item[0:3] for item in new_crashes] == (
+            ["000"] * 5 + ["111"] + ["000"] * 5 + ["111"] * 2 + ["111"] * 2
+        )
+        assert [size for queue, size in pubsub.pulls if queue != "priority"] == [
+            5,
+            1,
+            10,
+            2,
+            20,
+            4,
+        ]
+
+    def test_pull_max_messages_limit_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue(pull_max_messages_limit=12)
+        for _ in range(40):
+            pubsub.publish("standard", create_new_ooid())
+
+        assert len(list(crashqueue.new_crashes())) == 40
+        # Pull sizes grow up to the limit
+        assert [size for queue, size in pubsub.pulls if queue == "standard"] == [
+            5,
+            10,
+            10,
+            10,
+            10,
+        ]
+
+        # Once the backlog is gone, pulls go back to the configured size
+        pubsub.pulls.clear()
+        assert list(crashqueue.new_crashes()) == []
+        assert [size for queue, size in pubsub.pulls if queue == "standard"] == [5]
+
+    def test_priority_lane_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue()
+        standard_crashids = []
+        for _ in range(10):
+            crashid = "000" + create_new_ooid()[3:]
+            standard_crashids.append(crashid)
+            pubsub.publish("standard", crashid)
+        priority_crashid = "222" + create_new_ooid()[3:]
+        pubsub.publish("priority", priority_crashid)
+
+        new_crashes = list(crashqueue.new_crashes())
+
+        # Priority crash ids come first and are marked as priority
+        assert new_crashes[0][0] == (priority_crashid,)
+        assert new_crashes[0][1]["priority"] is True
+        assert sorted(item[0][0] for item in new_crashes[1:]) == sorted(
+            standard_crashids
+        )
+        assert pubsub.pulls[0][0] == "priority"
+
+    def test_priority_lane_between_batches_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue(priority_poll_interval=0)
+        for _ in range(5):
+            pubsub.publish("standard", "000" + create_new_ooid()[3:])
+
+        new_crashes = crashqueue.new_crashes()
+        first = next(new_crashes)
+        assert first[0][0].startswith("000")
+
+        # A priority crash id published while standard crash ids are being yielded
+        # comes next
+        priority_crashid = "222" + create_new_ooid()[3:]
+        pubsub.publish("priority", priority_crashid)
+        assert next(new_crashes)[0] == (priority_crashid,)
+
+        # Then the rest of the standard crash ids
+        rest = list(new_crashes)
+        assert len(rest) == 4
+        assert all(item[0][0].startswith("000") for item in rest)
+
+    def test_ack_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue(ack_batch_size=1)
+        crash_id = create_new_ooid()
+        pubsub.publish("standard", crash_id)
+
+        ((args, kwargs),) = list(crashqueue.new_crashes())
+        assert args == (crash_id,)
+        assert crashqueue.outstanding == 1
+
+        # Without batching, finishing a crash acks it right away
+        kwargs["finished_func"]()
+        assert crashqueue.outstanding == 0
+        assert pubsub.ack_requests == [
+            (crashqueue.standard_subscription_path, ["ack1"])
+        ]
+
+    def test_lost_crash_is_not_acked_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue(ack_batch_size=1)
+        pubsub.publish("standard", create_new_ooid())
+
+        ((_, kwargs),) = list(crashqueue.new_crashes())
+        kwargs["finished_func"](acked=False)
+        assert crashqueue.outstanding == 0
+        assert pubsub.ack_requests == []
+
+    def test_ack_batched_stubbed(self):
+        # Use a long flush interval so acks stay buffered until close
+        crashqueue, pubsub = build_stubbed_crashqueue(ack_flush_interval=60)
+        for _ in range(3):
+            pubsub.publish("standard", create_new_ooid())
+        pubsub.publish("reprocessing", create_new_ooid())
+
+        new_crashes = list(crashqueue.new_crashes())
+        for _, kwargs in new_crashes:
+            kwargs["finished_func"]()
+
+        # Acks are buffered and not sent yet
+        assert crashqueue.outstanding == 0
+        assert pubsub.ack_requests == []
+        assert len(crashqueue.pending_acks[crashqueue.standard_subscription_path]) == 3
+
+        # Closing the crash queue sends one request per subscription
+        crashqueue.close()
+        assert crashqueue.pending_acks == {}
+        assert sorted(pubsub.ack_requests) == sorted(
+            [
+                (crashqueue.standard_subscription_path, ["ack1", "ack2", "ack3"]),
+                (crashqueue.reprocessing_subscription_path, ["ack4"]),
+            ]
+        )
+
+    def test_ack_batch_full_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue(
+            ack_batch_size=2, ack_flush_interval=60
+        )
+        for _ in range(3):
+            pubsub.publish("standard", create_new_ooid())
+
+        new_crashes = list(crashqueue.new_crashes())
+        new_crashes[0][1]["finished_func"]()
+        assert pubsub.ack_requests == []
+
+        # Filling the batch sends the acks
+        new_crashes[1][1]["finished_func"]()
+        assert pubsub.ack_requests == [
+            (crashqueue.standard_subscription_path, ["ack1", "ack2"])
+        ]
+        assert crashqueue.pending_acks == {}
+
+        new_crashes[2][1]["finished_func"]()
+        crashqueue.close()
+        assert pubsub.ack_requests[-1] == (
+            crashqueue.standard_subscription_path,
+            ["ack3"],
+        )
+
+    def test_ack_flush_interval_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue(ack_flush_interval=0.1)
+        pubsub.publish("standard", create_new_ooid())
+
+        ((_, kwargs),) = list(crashqueue.new_crashes())
+        kwargs["finished_func"]()
+
+        # The flusher thread sends buffered acks
+        end_time = time.monotonic() + 5
+        while not pubsub.ack_requests and time.monotonic() < end_time:
+            time.sleep(0.05)
+        assert pubsub.ack_requests == [
+            (crashqueue.standard_subscription_path, ["ack1"])
+        ]
+        crashqueue.close()
+
+    def test_ack_failure_stubbed(self, caplogpp):
+        crashqueue, pubsub = build_stubbed_crashqueue(ack_flush_interval=60)
+        pubsub.publish("standard", create_new_ooid())
+        ((_, kwargs),) = list(crashqueue.new_crashes())
+        kwargs["finished_func"]()
+
+        # Failed acks are logged and dropped; Pub/Sub redelivers those messages
+        crashqueue.subscriber.acknowledge = mock.Mock(side_effect=Exception("boom"))
+        with caplogpp.at_level(logging.ERROR, logger="socorro.external.pubsub"):
+            crashqueue.close()
+        assert "failed to ack 1 messages" in caplogpp.text
+        assert crashqueue.pending_acks == {}
+
+    def test_max_outstanding_messages_stubbed(self):
+        crashqueue, pubsub = build_stubbed_crashqueue(max_outstanding_messages=2)
+        for _ in range(3):
+            pubsub.publish("standard", create_new_ooid())
+
+        new_crashes = crashqueue.new_crashes()
+        first = next(new_crashes)
+        next(new_crashes)
+        assert crashqueue.outstanding == 2
+
+        # The iterator waits for an outstanding crash to finish before pulling the
+        # third crash id rather than stopping
+        timer = threading.Timer(0.2, first[1]["finished_func"])
+        timer.start()
+        next(new_crashes)
+        timer.join()
+        assert crashqueue.outstanding == 2
+
+        # Pulls are sized to the room there is
+        assert all(size <= 2 for queue, size in pubsub.pulls if queue != "priority")
+        crashqueue.close()
+
+    def test_set_capacity(self):
+        crashqueue = build_instance_from_settings(settings.QUEUE_PUBSUB)
+        crashqueue.set_capacity(12)
+        assert crashqueue.max_outstanding_messages == 12
+
+        # An explicitly configured limit isn't changed
+        crashqueue = PubSubCrashQueue(
+            **{**settings.QUEUE_PUBSUB["options"], "max_outstanding_messages": 5}
+        )
+        crashqueue.set_capacity(12)
+        assert crashqueue.max_outstanding_messages == 5
+
     @pytest.mark.parametrize("queue", ["standard", "priority", "reprocessing"])
     def test_publish_one(self, pubsub_helper, queue):
         crash_id = create_new_ooid()
@@ -2,10 +2,15 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import asyncio
+
 import pytest
 
 from socorro.external.crashstorage_base import (
+    AsyncCrashStorage,
+    CrashIDNotFound,
     CrashStorageBase,
+    InMemoryCrashStorage,
     MemoryDumpsMapping,
 )
 
@@ -35,6 +40,42 @@ class TestCrashStorageBase:
         crashstorage.close()
 
 
+class TestAsyncCrashStorage:
+    def test_wraps_crashstorage(self, tmp_path):
+        crashstorage = InMemoryCrashStorage()
+        crashstorage.crash_destination_name = "dest1"
+        async_crashstorage = AsyncCrashStorage(crashstorage)
+
+        crash_id = "0bba929f-8721-460c-dead-a43c20071025"
+        crashstorage.save_raw_crash(
+            raw_crash={"uuid": crash_id},
+            dumps={"upload_file_minidump": b"abcd"},
+            crash_id=crash_id,
+        )
+
+        async def run():
+            await async_crashstorage.save_processed_crash(
+                {"uuid": crash_id}, {"uuid": crash_id, "signature": "OOM | small"}
+            )
+            return await asyncio.gather(
+                async_crashstorage.get_raw_crash(crash_id),
+                async_crashstorage.get_dumps(crash_id),
+                async_crashstorage.get_dumps_as_files(crash_id, tmp_path),
+                async_crashstorage.get_processed_crash(crash_id),
+            )
+
+        raw_crash, dumps, file_dumps, processed_crash = asyncio.run(run())
+        assert async_crashstorage.crash_destination_name == "dest1"
+        assert raw_crash == {"uuid": crash_id}
+        assert dumps == {"upload_file_minidump": b"abcd"}
+        assert list(file_dumps.keys()) == ["upload_file_minidump"]
+        assert processed_crash == {"uuid": crash_id, "signature": "OOM | small"}
+
+        asyncio.run(async_crashstorage.delete_crash(crash_id))
+        with pytest.raises(CrashIDNotFound):
+            asyncio.run(async_crashstorage.get_raw_crash(crash_id))
+
+
 class TestDumpsMappings:
     def test_simple(self):
         mdm = MemoryDumpsMapping(
@@ -0,0 +1,214 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import asyncio
+from functools import partial
+import threading
+
+from markus.testing import MetricsMock
+import pytest
+
+from socorro.lib.asyncio_task_manager import AsyncioPipelineTaskManager, Stage
+
+
+def job_source(count, finished):
+    for x in range(count):
+        yield ((x,), {"finished_func": partial(finished.append, x)})
+
+
+class TestAsyncioPipelineTaskManager:
+    def test_requires_stages(self):
+        with pytest.raises(ValueError):
+            AsyncioPipelineTaskManager(stages=[])
+
+    def test_jobs_go_through_stages(self):
+        finished = []
+        calls = []
+
+        async def first(job):
+            calls.append(("first", job.args[0]))
+            job.data["value"] = job.args[0] * 10
+            return True
+
+        async def second(job):
+            calls.append(("second", job.data["value"]))
+            return True
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source(5, finished),
+            stages=[Stage(name="first", func=first), Stage(name="second", func=second)],
+        )
+        tm.blocking_start()
+
+        assert sorted(finished) == [0, 1, 2, 3, 4]
+        assert sorted(call for call in calls if call[0] == "first") == [
+            ("first", x) for x in range(5)
+        ]
+        assert sorted(call for call in calls if call[0] == "second") == [
+            ("second", x * 10) for x in range(5)
+        ]
+
+    def test_stages_overlap(self):
+        finished = []
+        active = {"fetch": 0, "save": 0}
+        overlapped = []
+
+        def stage_func(name, other):
+            async def _stage_func(job):
+                active[name] += 1
+                if active[other]:
+                    overlapped.append(job.args[0])
+                await asyncio.sleep(0.01)
+                active[name] -= 1
+                return True
+
+            return _stage_func
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source(10, finished),
+            stages=[
+                Stage(name="fetch", func=stage_func("fetch", "save")),
+                Stage(name="save", func=stage_func("save", "fetch")),
+            ],
+        )
+        tm.blocking_start()
+
+        assert sorted(finished) == list(range(10))
+        # While one job is being saved, the next one is being fetched
+        assert overlapped
+
+    def test_stop_and_error_finish_job(self):
+        finished = []
+        cleaned_up = []
+        second_calls = []
+
+        async def first(job):
+            job.cleanup_funcs.append(partial(cleaned_up.append, job.args[0]))
+            if job.args[0] == 1:
+                return False
+            if job.args[0] == 2:
+                raise ValueError("intentional error")
+            return True
+
+        async def second(job):
+            second_calls.append(job.args[0])
+            return True
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source(4, finished),
+            stages=[Stage(name="first", func=first), Stage(name="second", func=second)],
+        )
+        tm.blocking_start()
+
+        assert sorted(second_calls) == [0, 3]
+        assert sorted(cleaned_up) == [0, 1, 2, 3]
+        assert sorted(finished) == [0, 1, 2, 3]
+
+    def test_stages_have_own_threads(self):
+        finished = []
+        fetching = asyncio.Event()
+        saved = threading.Event()
+        results = []
+
+        def wait_for_save():
+            results.append(saved.wait(timeout=2))
+
+        async def fetch(job):
+            if job.args[0] == 0:
+                return True
+            # Use more threads than there are stage workers; this only holds up
+            # this stage
+            tasks = [
+                asyncio.create_task(asyncio.to_thread(wait_for_save)) for _ in range(4)
+            ]
+            await asyncio.sleep(0)
+            fetching.set()
+            await asyncio.gather(*tasks)
+            return False
+
+        async def save(job):
+            await fetching.wait()
+            await asyncio.to_thread(saved.set)
+            return False
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source(2, finished),
+            stages=[Stage(name="fetch", func=fetch), Stage(name="save", func=save)],
+        )
+        tm.blocking_start()
+
+        assert sorted(finished) == [0, 1]
+        assert results == [True] * 4
+
+    def test_threads_per_worker(self):
+        finished = []
+        barrier = threading.Barrier(3)
+
+        async def fetch(job):
+            # Each of these blocks until all three are running
+            await asyncio.gather(
+                *(asyncio.to_thread(barrier.wait, timeout=2) for _ in range(3))
+            )
+            return True
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source(2, finished),
+            stages=[Stage(name="fetch", func=fetch, threads_per_worker=3)],
+        )
+        tm.blocking_start()
+
+        assert sorted(finished) == [0, 1]
+        assert not barrier.broken
+
+    def test_concurrency(self):
+        finished = []
+        active = []
+        max_active = []
+
+        async def slow(job):
+            active.append(job.args[0])
+            max_active.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(job.args[0])
+            return True
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            stage_concurrency={"slow": 3},
+            job_source_iterator=job_source(9, finished),
+            stages=[Stage(name="slow", func=slow)],
+        )
+        tm.blocking_start()
+
+        assert sorted(finished) == list(range(9))
+        assert max(max_active) == 3
+
+    def test_metrics(self):
+        finished = []
+
+        async def noop(job):
+            return True
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source(2, finished),
+            stages=[Stage(name="fetch", func=noop)],
+        )
+        with MetricsMock() as mm:
+            tm.blocking_start()
+
+        assert (
+            len(mm.filter_records("gauge", "socorro.processor.pipeline.queue_size"))
+            == 2
+        )
+        assert (
+            len(mm.filter_records("timing", "socorro.processor.pipeline.queue_wait"))
+            == 2
+        )
+        mm.assert_timing("socorro.processor.pipeline.stage_timing")
@@ -0,0 +1,233 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import datetime
+from functools import partial
+import os
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from socorro import settings
+from socorro.external.pubsub.crashqueue import PubSubCrashQueue
+from socorro.lib.libooid import create_new_ooid
+from socorro.lib.process_pool_task_manager import (
+    ProcessPoolTaskManager,
+    worker_process_main,
+)
+
+
+def write_pid_file(path, item):
+    # Runs in a worker process, so write a file the test can see
+    (path / str(item)).write_text(str(os.getpid()))
+
+
+class TestProcessPoolTaskManager:
+    def test_start(self):
+        pptm = ProcessPoolTaskManager(
+            idle_delay=1,
+            number_of_processes=1,
+            maximum_queue_size=1,
+        )
+        try:
+            pptm.start()
+            time.sleep(0.2)
+            assert pptm.queueing_thread.is_alive()
+            assert len(pptm.process_list) == 1
+            assert pptm.process_list[0].is_alive()
+            pptm.stop()
+            assert not pptm.queueing_thread.is_alive()
+            assert not pptm.results_thread.is_alive()
+            assert not pptm.process_list[0].is_alive()
+        finally:
+            pptm.wait_for_completion()
+
+    def test_doing_work_in_worker_processes(self, tmp_path):
+        pptm = ProcessPoolTaskManager(
+            number_of_processes=2,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            task_func=partial(write_pid_file, tmp_path),
+        )
+        pptm.blocking_start()
+
+        assert sorted(int(path.name) for path in tmp_path.iterdir()) == list(range(10))
+        pids = {path.read_text() for path in tmp_path.iterdir()}
+        assert str(os.getpid()) not in pids
+
+    def test_finished_func_called_in_parent(self, tmp_path):
+        finished = []
+
+        def finished_func(item):
+            finished.append((item, os.getpid()))
+
+        def job_source():
+            for x in range(10):
+                yield ((x,), {"finished_func": partial(finished_func, x)})
+
+        pptm = ProcessPoolTaskManager(
+            number_of_processes=2,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source,
+            task_func=partial(write_pid_file, tmp_path),
+        )
+        pptm.blocking_start()
+
+        # finished_func is called in the parent process for every job
+        assert sorted(finished) == [(x, os.getpid()) for x in range(10)]
+        assert len(list(tmp_path.iterdir())) == 10
+        assert pptm.in_flight == {}
+
+    def test_finished_func_called_when_task_errors(self):
+        finished = []
+
+        def bad_task_func(item):
+            raise ValueError("intentional error")
+
+        def job_source():
+            for x in range(3):
+                yield ((x,), {"finished_func": partial(finished.append, x)})
+
+        pptm = ProcessPoolTaskManager(
+            number_of_processes=1,
+            maximum_queue_size=1,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source,
+            task_func=bad_task_func,
+        )
+        pptm.blocking_start()
+
+        assert sorted(finished) == [0, 1, 2]
+
+    def test_dead_worker_is_replaced(self):
+        finished = []
+        lost = []
+
+        def finished_func(item, acked=True):
+            (finished if acked else lost).append(item)
+
+        def exit_task_func(item):
+            if item == 0:
+                # Simulate the worker process dying in the middle of a job
+                os._exit(1)
+
+        def job_source():
+            for x in range(3):
+                yield ((x,), {"finished_func": partial(finished_func, x)})
+
+        pptm = ProcessPoolTaskManager(
+            number_of_processes=1,
+            maximum_queue_size=1,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source,
+            task_func=exit_task_func,
+        )
+        pptm.blocking_start()
+
+        # The job the worker died on is released without being acked; the
+        # replacement worker handles the rest
+        assert sorted(finished) == [1, 2]
+        assert lost == [0]
+        assert pptm.in_flight == {}
+
+    def test_worker_dies_before_starting_job(self, tmp_path):
+        finished = []
+        lost = []
+
+        def finished_func(item, acked=True):
+            (finished if acked else lost).append(item)
+
+        def job_source():
+            for x in range(3):
+                yield ((x,), {"finished_func": partial(finished_func, x)})
+
+        def dying_worker_process_main(task_func, task_queue, result_queue, slot):
+            marker = tmp_path / "died"
+            if not marker.exists():
+                marker.write_text("")
+                # Simulate the worker process dying after it took a job off its task
+                # queue, but before it started working on it
+                task_queue.get()
+                os._exit(1)
+            worker_process_main(task_func, task_queue, result_queue, slot)
+
+        pptm = ProcessPoolTaskManager(
+            number_of_processes=1,
+            maximum_queue_size=1,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source,
+        )
+        with mock.patch(
+            "socorro.lib.process_pool_task_manager.worker_process_main",
+            dying_worker_process_main,
+        ):
+            pptm.blocking_start()
+
+        # The parent process knows which job the worker process had, so it's released
+        # instead of staying in flight forever
+        assert sorted(finished) == [1, 2]
+        assert lost == [0]
+        assert pptm.in_flight == {}
+
+    def test_dead_worker_releases_crash_queue_slot(self):
+        # Worker processes are forked, so keep real Pub/Sub clients out of this
+        with mock.patch.multiple(
+            "socorro.external.pubsub.crashqueue",
+            PublisherClient=mock.DEFAULT,
+            SubscriberClient=mock.DEFAULT,
+        ) as mocks:
+            subscriber = mocks["SubscriberClient"].return_value
+            subscriber.subscription_path.side_effect = lambda project, name: name
+            crashqueue = PubSubCrashQueue(
+                **{**settings.QUEUE_PUBSUB["options"], "max_outstanding_messages": 2}
+            )
+        publish_time = datetime.datetime.now(tz=datetime.timezone.utc)
+        msgs = [
+            SimpleNamespace(
+                ack_id=f"ack{i}",
+                message=SimpleNamespace(
+                    data=create_new_ooid().encode("utf-8"),
+                    publish_time=publish_time,
+                ),
+            )
+            for i in range(3)
+        ]
+        # Pulls are sized to the outstanding limit, so each pull gets one message
+        pulls = [[msg] for msg in msgs]
+
+        def pull(subscription_path, max_messages):
+            if subscription_path == crashqueue.standard_subscription_path and pulls:
+                return pulls.pop(0)
+            return []
+
+        def exit_task_func(crash_id):
+            if crash_id == msgs[0].message.data.decode("utf-8"):
+                # Simulate the worker process getting killed in the middle of a job
+                os._exit(1)
+
+        crashqueue._pull = pull
+        pptm = ProcessPoolTaskManager(
+            number_of_processes=1,
+            maximum_queue_size=1,
+            quit_on_empty_queue=True,
+            job_source_iterator=crashqueue,
+            task_func=exit_task_func,
+        )
+        pptm.blocking_start()
+        crashqueue.close()
+
+        # The lost crash id isn't acked, so it gets redelivered, but it doesn't hold
+        # on to an outstanding slot
+        assert crashqueue.outstanding == 0
+        acked = [
+            ack_id
+            for call in crashqueue.subscriber.acknowledge.call_args_list
+            for ack_id in call.kwargs["ack_ids"]
+        ]
+        assert sorted(acked) == ["ack1", "ack2"]
+
+    def test_capacity(self):
+        pptm = ProcessPoolTaskManager(number_of_processes=2, maximum_queue_size=3)
+        assert pptm.capacity == 5
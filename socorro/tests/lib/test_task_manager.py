@@ -4,7 +4,23 @@
 
 from unittest import mock
 
-from socorro.lib.task_manager import TaskManager
+import pytest
+
+from socorro.lib.task_manager import split_priority, TaskManager
+
+
+@pytest.mark.parametrize(
+    "job_params, expected",
+    [
+        ((1,), ((1,), False)),
+        (((1,), {}), (((1,), {}), False)),
+        (((1,), {"x": 2}), (((1,), {"x": 2}), False)),
+        (((1,), {"x": 2, "priority": True}), (((1,), {"x": 2}), True)),
+        (((1,), {"priority": False}), (((1,), {}), False)),
+    ],
+)
+def test_split_priority(job_params, expected):
+    assert split_priority(job_params) == expected
 
 
 class TestTaskManager:
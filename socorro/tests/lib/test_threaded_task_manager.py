@@ -2,9 +2,24 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import threading
 import time
 
-from socorro.lib.threaded_task_manager import ThreadedTaskManager
+from socorro.lib.threaded_task_manager import LaneQueue, ThreadedTaskManager
+
+
+def test_lane_queue():
+    lane_queue = LaneQueue(2)
+    lane_queue.put(1)
+    lane_queue.put(2)
+    assert lane_queue.full()
+
+    # Priority items don't block when the queue is full and come out first
+    lane_queue.put_priority(3)
+    lane_queue.put_priority(4)
+    assert lane_queue.qsize() == 4
+    assert [lane_queue.get() for _ in range(4)] == [3, 4, 1, 2]
+    assert lane_queue.empty()
 
 
 class TestThreadedTaskManager:
@@ -86,3 +101,38 @@ class TestThreadedTaskManager:
 
         tm.blocking_start()
         assert len(calls) == 10
+
+    def test_capacity(self):
+        ttm = ThreadedTaskManager(number_of_threads=4, maximum_queue_size=8)
+        assert ttm.capacity == 12
+
+    def test_priority_jobs_go_first(self):
+        done = []
+        # The blocker job keeps the only worker busy until the queue has filled up
+        started = threading.Event()
+        release = threading.Event()
+
+        def task_func(item):
+            if item == "blocker":
+                started.set()
+                release.wait(timeout=5)
+            done.append(item)
+
+        def job_source():
+            yield (("blocker",), {})
+            started.wait(timeout=5)
+            for x in range(3):
+                yield ((f"standard{x}",), {})
+            yield (("priority",), {"priority": True})
+            release.set()
+
+        ttm = ThreadedTaskManager(
+            number_of_threads=1,
+            maximum_queue_size=10,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_source,
+            task_func=task_func,
+        )
+        ttm.blocking_start()
+
+        assert done == ["blocker", "priority", "standard0", "standard1", "standard2"]
@@ -4,6 +4,8 @@
 
 import copy
 import json
+import threading
+import time
 from unittest import mock
 
 from markus.testing import AnyTagValue, MetricsMock
@@ -913,6 +915,46 @@ class TestMinidumpStackwalkRule:
                 tags=["outcome:success", "exitcode:0", AnyTagValue("host")],
             )
 
+    def test_output_to_stdout(self, tmp_path):
+        rule = MinidumpStackwalkRule(
+            command_line=(
+                "{command_path} --evil-json={raw_crash_path} --log-file={log_path} "
+                + "--json {dump_file_path}"
+            ),
+            symbol_tmp_path=str(tmp_path / "tmp"),
+            symbol_cache_path=str(tmp_path / "cache"),
+        )
+        assert rule.output_to_stdout is True
+
+        dumppath = tmp_path / "dumpfile.dmp"
+        dumppath.write_text("abcde")
+
+        raw_crash = {"uuid": example_uuid}
+        dumps = {rule.dump_field: str(dumppath)}
+        processed_crash = {}
+        status = Status()
+
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.return_value = ProcessCompletedMock(
+                returncode=0,
+                stdout=MINIMAL_STACKWALKER_OUTPUT_STR.encode("utf-8"),
+                stderr=b"",
+            )
+
+            rule.act(raw_crash, dumps, processed_crash, str(tmp_path), status)
+
+        # No output file was written or read
+        assert not (tmp_path / f"{example_uuid}.{rule.dump_field}.json").exists()
+        command_line = mock_subprocess.run.call_args[0][0]
+        assert not any(arg.startswith("--output-file") for arg in command_line)
+
+        assert processed_crash["mdsw_return_code"] == 0
+        assert processed_crash["mdsw_status_string"] == "OK"
+        assert processed_crash["success"] is True
+        assert processed_crash["json_dump"] == MINIMAL_STACKWALKER_OUTPUT
+
     def test_stackwalker_timeout(self, tmp_path):
         # NOTE(willkg): we run the stackwalker with a "timeout --signal KILL ..." When
         # stackwalker exceeds the amount of time allotted, timeout kills it with a
@@ -1014,6 +1056,107 @@ class TestMinidumpStackwalkRule:
         assert processed_crash["mdsw_status_string"] == "EmptyMinidump"
         assert processed_crash["mdsw_stderr"] == "Shortcut for 0-bytes minidump."
 
+    def test_multiple_dumps_in_parallel(self, tmp_path):
+        rule = MinidumpStackwalkRule(
+            command_line="{command_path} --json {dump_file_path}",
+            symbol_tmp_path=str(tmp_path / "tmp"),
+            symbol_cache_path=str(tmp_path / "cache"),
+            max_parallel_dumps=3,
+        )
+
+        dump_names = [
+            "upload_file_minidump",
+            "upload_file_minidump_browser",
+            "upload_file_minidump_content",
+        ]
+        dumps = {}
+        for dump_name in dump_names:
+            dumppath = tmp_path / dump_name
+            dumppath.write_text("abcde")
+            dumps[dump_name] = str(dumppath)
+
+        raw_crash = {"uuid": example_uuid}
+        processed_crash = {}
+        status = Status()
+
+        # Every run waits until all three are running, so this only finishes if the
+        # runs happen at the same time
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_run(args, timeout, capture_output):
+            barrier.wait()
+            dump_name = args[-1].rsplit("/", 1)[-1]
+            output = copy.deepcopy(MINIMAL_STACKWALKER_OUTPUT)
+            output["status"] = "OK" if dump_name == "upload_file_minidump" else "bad"
+            return ProcessCompletedMock(
+                returncode=0,
+                stdout=json.dumps(output).encode("utf-8"),
+                stderr=b"",
+            )
+
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_run
+            rule.act(raw_crash, dumps, processed_crash, str(tmp_path), status)
+
+        assert mock_subprocess.run.call_count == 3
+        assert processed_crash["mdsw_status_string"] == "OK"
+        assert processed_crash["additional_minidumps"] == [
+            "upload_file_minidump_browser",
+            "upload_file_minidump_content",
+        ]
+        assert processed_crash["upload_file_minidump_browser"]["success"] is False
+        assert processed_crash["upload_file_minidump_content"]["success"] is False
+
+        # Notes are in dump order regardless of which run finished first
+        assert status.notes == [
+            "MinidumpStackwalkRule: minidump-stackwalk: failed: 0: bad",
+            "MinidumpStackwalkRule: minidump-stackwalk: failed: 0: bad",
+        ]
+
+    def test_multiple_dumps_share_kill_timeout(self, tmp_path):
+        rule = MinidumpStackwalkRule(
+            command_line="{command_path} --json {dump_file_path}",
+            symbol_tmp_path=str(tmp_path / "tmp"),
+            symbol_cache_path=str(tmp_path / "cache"),
+            kill_timeout=0.1,
+            max_parallel_dumps=1,
+        )
+
+        dumps = {}
+        for dump_name in ["upload_file_minidump", "upload_file_minidump_browser"]:
+            dumppath = tmp_path / dump_name
+            dumppath.write_text("abcde")
+            dumps[dump_name] = str(dumppath)
+
+        raw_crash = {"uuid": example_uuid}
+        processed_crash = {}
+        status = Status()
+
+        def slow_run(args, timeout, capture_output):
+            # The first run uses up the budget
+            time.sleep(0.2)
+            return ProcessCompletedMock(
+                returncode=0,
+                stdout=MINIMAL_STACKWALKER_OUTPUT_STR.encode("utf-8"),
+                stderr=b"",
+            )
+
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = slow_run
+            rule.act(raw_crash, dumps, processed_crash, str(tmp_path), status)
+
+        # The second dump didn't get run because there was no time left
+        assert mock_subprocess.run.call_count == 1
+        assert processed_crash["mdsw_return_code"] == 0
+        assert processed_crash["upload_file_minidump_browser"]["mdsw_return_code"] == -9
+        assert status.notes == [
+            "MinidumpStackwalkRule: minidump-stackwalk: timeout (SIGKILL)"
+        ]
+
 
 class TestThreadCountRule:
     @pytest.mark.parametrize(
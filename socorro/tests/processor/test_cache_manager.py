@@ -7,6 +7,7 @@ import time
 from unittest.mock import ANY
 
 from fillmore.test import diff_structure
+from inotify_simple import Event, flags
 from markus.testing import AnyTagValue, MetricsMock
 import pytest
 
@@ -14,8 +15,11 @@ from socorro import settings
 from socorro.processor.cache_manager import (
     count_sentry_scrub_error,
     DiskCacheManager,
+    FileDeleter,
+    FrequencySketch,
     get_index,
     LastUpdatedOrderedDict,
+    TinyLFUPolicy,
 )
 
 
@@ -73,12 +77,85 @@ class TestLastUpdatedOrderedDict:
         assert list(lru.items()) == [("key2", 2)]
 
 
+class TestFrequencySketch:
+    def test_increment_and_estimate(self):
+        sketch = FrequencySketch(width=64)
+        assert sketch.estimate("key1") == 0
+
+        for _ in range(3):
+            sketch.increment("key1")
+        sketch.increment("key2")
+        assert sketch.estimate("key1") == 3
+        assert sketch.estimate("key2") == 1
+
+    def test_saturates(self):
+        sketch = FrequencySketch(width=64)
+        for _ in range(20):
+            sketch.increment("key1")
+        assert sketch.estimate("key1") == FrequencySketch.MAX_COUNT
+
+    def test_aging(self):
+        sketch = FrequencySketch(width=64)
+        for _ in range(8):
+            sketch.increment("key1")
+
+        # Enough other increments to reach the sample size halve all counters
+        for i in range(sketch.sample_size):
+            sketch.increment(f"other{i}")
+        assert sketch.estimate("key1") <= 4
+
+    def test_bad_width(self):
+        with pytest.raises(ValueError):
+            FrequencySketch(width=100)
+
+
+class TestTinyLFUPolicy:
+    def test_passes_over_frequently_used(self):
+        policy = TinyLFUPolicy(sketch=FrequencySketch(width=64))
+        lru = LastUpdatedOrderedDict()
+        lru["hot"] = 1
+        lru["cold"] = 1
+        lru["new"] = 1
+        for _ in range(5):
+            policy.record_access("hot")
+        policy.record_access("cold")
+        policy.record_access("new")
+
+        assert policy.pop_victim(lru, candidate="new") == ("cold", 1)
+        # hot was touched rather than evicted
+        assert list(lru.keys()) == ["new", "hot"]
+
+    def test_scan_limit(self, monkeypatch):
+        monkeypatch.setattr(TinyLFUPolicy, "SCAN_LIMIT", 2)
+        policy = TinyLFUPolicy(sketch=FrequencySketch(width=64))
+        lru = LastUpdatedOrderedDict()
+        for key in ["hot1", "hot2", "hot3"]:
+            lru[key] = 1
+            for _ in range(5):
+                policy.record_access(key)
+
+        # Every file is used more than the new one, so after passing over SCAN_LIMIT
+        # files, the oldest gets evicted anyway
+        assert policy.pop_victim(lru, candidate="new") == ("hot3", 1)
+
+
+@pytest.fixture
+def inventory_path(tmp_path_factory):
+    return tmp_path_factory.mktemp("inventory") / "cache_inventory"
+
+
 @pytest.fixture
-def cm(tmp_path):
-    """Test cache manager setup with tmp_path."""
+def cm(tmp_path, inventory_path):
+    """Test cache manager setup with tmp_path.
+
+    The low watermark is the max size so evictions are exactly what's needed.
+
+    """
     with settings.override(
         SYMBOLS_CACHE_PATH=str(tmp_path),
         SYMBOLS_CACHE_MAX_SIZE=10,
+        SYMBOLS_CACHE_LOW_WATERMARK=100,
+        SYMBOLS_CACHE_INVENTORY_PATH=str(inventory_path),
     ):
         cache_manager = DiskCacheManager()
         cache_manager.set_up()
@@ -209,6 +286,275 @@ def test_eviction_of_least_recently_used(cm, tmp_path):
     assert sorted(files) == sorted([str(file1), str(file4), str(file5)])
 
 
+def test_inventory_resume(cm, tmp_path, inventory_path):
+    dir1 = tmp_path / "dir1"
+    dir1.mkdir()
+    file1 = dir1 / "file1.symc"
+    file1.write_bytes(b"ab")
+    file2 = tmp_path / "file2.symc"
+    file2.write_bytes(b"abc")
+    cm.run_once()
+
+    # Touch file1 so it's most recently used and write the inventory
+    cm.lru.touch(str(file1))
+    cm.write_inventory()
+    assert inventory_path.exists()
+    assert cm.read_inventory() == {str(file2): 3, str(file1): 2}
+    cm.shutdown()
+
+    # Change the cache while the cache manager isn't running
+    file2.unlink()
+    file3 = dir1 / "file3.symc"
+    file3.write_bytes(b"abcd")
+
+    # Start a new cache manager which resumes from the inventory: file1 keeps its
+    # order, file2 is gone, and file3 is added as most recent
+    cm2 = DiskCacheManager()
+    cm2.run_once()
+    try:
+        assert list(cm2.lru.items()) == [(str(file1), 2), (str(file3), 4)]
+        assert cm2.total_size == 6
+    finally:
+        cm2.shutdown()
+
+
+def test_inventory_background(cm, tmp_path, inventory_path):
+    file1 = tmp_path / "file1.symc"
+    file1.write_bytes(b"ab")
+    cm.run_once()
+
+    cm.write_inventory(background=True)
+    # The snapshot is taken before the thread starts, so changes after that aren't
+    # in the inventory
+    cm.lru[str(tmp_path / "file2.symc")] = 3
+    cm.inventory_thread.join()
+    assert cm.read_inventory() == {str(file1): 2}
+
+
+def test_inventory_sizes_not_restated(cm, tmp_path, inventory_path):
+    file1 = tmp_path / "file1.symc"
+    file1.write_bytes(b"ab")
+    cm.run_once()
+    cm.lru[str(file1)] = 7
+    cm.shutdown()
+
+    # The size from the inventory is used rather than stat'ing the file again
+    cm2 = DiskCacheManager()
+    cm2.run_once()
+    try:
+        assert cm2.lru == {str(file1): 7}
+    finally:
+        cm2.shutdown()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"junk",
+        b"socorro-cache-inventory-1\n{}\n",
+        b'socorro-cache-inventory-1\n{"cachepath": "/other", "byteorder": "little"}\n',
+    ],
+)
+def test_inventory_unusable(cm, tmp_path, inventory_path, data):
+    inventory_path.write_bytes(data)
+    file1 = tmp_path / "file1.symc"
+    file1.write_bytes(b"ab")
+
+    cm.run_once()
+    assert cm.lru == {str(file1): 2}
+
+
+def test_tinylfu_keeps_frequently_used(tmp_path, inventory_path):
+    with settings.override(
+        SYMBOLS_CACHE_PATH=str(tmp_path),
+        SYMBOLS_CACHE_MAX_SIZE=10,
+        SYMBOLS_CACHE_INVENTORY_PATH=str(inventory_path),
+        SYMBOLS_CACHE_EVICTION_POLICY="tinylfu",
+    ):
+        cm = DiskCacheManager()
+    cm.run_once()
+
+    try:
+        xul = tmp_path / "xul.symc"
+        xul.write_bytes(b"abcd")
+        cm.run_once()
+        # NOTE: inotify coalesces identical events that haven't been read, so run the
+        # loop after each open
+        for _ in range(3):
+            xul.read_bytes()
+            cm.run_once()
+        assert cm.hits == 3
+
+        # A burst of rarely used files evicts each other and not xul
+        rare = []
+        for i in range(4):
+            path = tmp_path / f"rare{i}.symc"
+            path.write_bytes(b"abc")
+            rare.append(path)
+            cm.run_once()
+
+        assert str(xul) in cm.lru
+        assert cm.lru == {str(xul): 4, str(rare[2]): 3, str(rare[3]): 3}
+        assert cm.total_size == 10
+    finally:
+        cm.shutdown()
+
+
+def test_hit_miss_metrics(cm, tmp_path):
+    cm.run_once()
+
+    file1 = tmp_path / "file1.symc"
+    file1.write_bytes(b"ab")
+    cm.run_once()
+    file1.read_bytes()
+    cm.run_once()
+    file1.read_bytes()
+    cm.run_once()
+    assert cm.misses == 1
+    assert cm.hits == 2
+
+
+def test_bad_eviction_policy(tmp_path, inventory_path):
+    with settings.override(
+        SYMBOLS_CACHE_PATH=str(tmp_path),
+        SYMBOLS_CACHE_MAX_SIZE=10,
+        SYMBOLS_CACHE_INVENTORY_PATH=str(inventory_path),
+        SYMBOLS_CACHE_EVICTION_POLICY="arc",
+    ):
+        with pytest.raises(ValueError):
+            DiskCacheManager()
+
+
+def test_eviction_to_low_watermark(tmp_path, inventory_path):
+    with settings.override(
+        SYMBOLS_CACHE_PATH=str(tmp_path),
+        SYMBOLS_CACHE_MAX_SIZE=10,
+        SYMBOLS_CACHE_LOW_WATERMARK=50,
+        SYMBOLS_CACHE_INVENTORY_PATH=str(inventory_path),
+    ):
+        cm = DiskCacheManager()
+    cm.run_once()
+
+    try:
+        files = []
+        for i in range(5):
+            path = tmp_path / f"file{i}.symc"
+            path.write_bytes(b"ab")
+            files.append(path)
+        cm.run_once()
+        assert cm.total_size == 10
+
+        # Going over the max size evicts down to 5 bytes in one batch
+        file5 = tmp_path / "file5.symc"
+        file5.write_bytes(b"a")
+        cm.run_once()
+        assert cm.lru == {str(files[3]): 2, str(files[4]): 2, str(file5): 1}
+        assert cm.total_size == 5
+        assert sorted(tmp_path.iterdir()) == sorted([files[3], files[4], file5])
+    finally:
+        cm.shutdown()
+
+
+def test_bad_low_watermark(tmp_path, inventory_path):
+    with settings.override(
+        SYMBOLS_CACHE_PATH=str(tmp_path),
+        SYMBOLS_CACHE_MAX_SIZE=10,
+        SYMBOLS_CACHE_LOW_WATERMARK=0,
+        SYMBOLS_CACHE_INVENTORY_PATH=str(inventory_path),
+    ):
+        with pytest.raises(ValueError):
+            DiskCacheManager()
+
+
+def test_file_deleter_cancel(tmp_path):
+    file1 = tmp_path / "dir1" / "file1.symc"
+    file1.parent.mkdir()
+    file1.write_bytes(b"ab")
+    file2 = tmp_path / "file2.symc"
+    file2.write_bytes(b"ab")
+
+    deleter = FileDeleter()
+    deleter.delete([str(file1), str(file2)])
+    assert deleter.is_pending(str(file2))
+    deleter.cancel(str(file2))
+
+    deleter.start()
+    deleter.join()
+    deleter.stop()
+
+    # file1 and its empty directory are gone, but file2 was cancelled
+    assert list(tmp_path.iterdir()) == [file2]
+
+
+def test_reconcile_dirs(cm, tmp_path):
+    dir1 = tmp_path / "dir1"
+    dir1.mkdir()
+    file1 = dir1 / "file1.symc"
+    file1.write_bytes(b"ab")
+    cm.run_once()
+    assert cm.lru == {str(file1): 2}
+
+    # Make the bookkeeping stale like it would be if inotify dropped events
+    cm.lru[str(file1)] = 1
+    cm.total_size = 1
+    file2 = dir1 / "file2.symc"
+    file2.write_bytes(b"abc")
+    dir2 = dir1 / "dir2"
+    dir2.mkdir()
+    file3 = dir2 / "file3.symc"
+    file3.write_bytes(b"abcd")
+    cm.remove_watch(str(dir2))
+    file4 = tmp_path / "file4.symc"
+    file4.write_bytes(b"a")
+
+    cm.reconcile_dirs([str(dir1)])
+    # file1 keeps its size; new files in dir1 and the new subdirectory are added,
+    # but file4 is outside the directories, so it's not
+    assert cm.lru == {str(file1): 1, str(file2): 3, str(file3): 4}
+    assert cm.total_size == 8
+    assert str(dir2) in cm.watches
+
+
+def test_q_overflow_reconciles(cm, tmp_path, monkeypatch):
+    cm.run_once()
+
+    dir1 = tmp_path / "dir1"
+    dir1.mkdir()
+    file1 = dir1 / "file1.symc"
+    file1.write_bytes(b"ab")
+    file2 = tmp_path / "file2.symc"
+    file2.write_bytes(b"abc")
+    monkeypatch.setattr(
+        cm.inotify,
+        "read",
+        lambda timeout: [Event(-1, flags.Q_OVERFLOW, 0, "")],
+    )
+
+    # The rest of the cache is walked a directory at a time between reads
+    monkeypatch.setattr(
+        "socorro.processor.cache_manager.RECONCILE_DIRS_PER_ITERATION", 1
+    )
+    cm.run_once()
+    assert cm.lru == {str(file2): 3}
+    assert cm.reconciler is not None
+
+    monkeypatch.setattr(cm.inotify, "read", lambda timeout: [])
+    cm.run_once()
+    assert cm.lru == {str(file2): 3, str(file1): 2}
+    cm.run_once()
+    assert cm.reconciler is None
+
+    # Another overflow right away doesn't start another walk of the whole cache
+    monkeypatch.setattr(
+        cm.inotify,
+        "read",
+        lambda timeout: [Event(-1, flags.Q_OVERFLOW, 0, "")],
+    )
+    cm.run_once()
+    assert cm.reconciler is None
+
+
 def test_add_file(cm, tmp_path):
     cm.run_once()
     assert cm.lru == {}
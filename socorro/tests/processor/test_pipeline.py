@@ -2,10 +2,13 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import logging
+import pstats
 from unittest.mock import ANY
 
 import freezegun
 from fillmore.test import diff_structure
+import pytest
 
 from socorro.lib.libdatetime import date_to_string, utc_now
 from socorro.processor.processor_app import ProcessorApp
@@ -19,6 +22,29 @@ class BadRule(Rule):
         raise KeyError("pii")
 
 
+class RecordingRule(Rule):
+    """Rule that records the rules that ran in processed_crash["ran"]"""
+
+    def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        processed_crash.setdefault("ran", []).append(self.__class__.__name__)
+
+
+class NeedsFooRule(RecordingRule):
+    requires = ("raw_crash.Foo",)
+
+
+class WritesBarRule(RecordingRule):
+    writes = ("bar",)
+
+    def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        super().action(raw_crash, dumps, processed_crash, tmpdir, status)
+        processed_crash["bar"] = 1
+
+
+class NeedsBarRule(RecordingRule):
+    requires = ("processed_crash.bar",)
+
+
 # NOTE(willkg): If this changes, we should update it and look for new things that should
 # be scrubbed. Use ANY for things that change between tests like timestamps, source code
 # data (line numbers, file names, post/pre_context), event ids, build ids, versions,
@@ -53,7 +79,7 @@ RULE_ERROR_EVENT = {
                             "abs_path": "/app/socorro/processor/pipeline.py",
                             "context_line": ANY,
                             "filename": "socorro/processor/pipeline.py",
-                            "function": "process_crash",
+                            "function": "apply_rules",
                             "in_app": True,
                             "lineno": ANY,
                             "module": "socorro.processor.pipeline",
@@ -171,3 +197,121 @@ class TestPipeline:
         assert "previousnotes" not in processed_crash["processor_notes"]
         processor_history = "".join(processed_crash["processor_history"])
         assert "previousnotes" in processor_history
+
+    def test_rule_timing(self, tmp_path, metricsmock, caplog):
+        caplog.set_level(logging.DEBUG, logger="socorro.processor.pipeline")
+        raw_crash = {"uuid": "7c67ad15-518b-4ccb-9be0-6f4c82220721"}
+
+        rulesets = {"default": [CPUInfoRule(), OSInfoRule()]}
+        pipeline = Pipeline(rulesets=rulesets, hostname="testhost")
+
+        with metricsmock as mm:
+            pipeline.process_crash("default", raw_crash, {}, {}, str(tmp_path))
+
+            records = mm.filter_records("histogram", "socorro.processor.rule.cpu_time")
+            rule_tags = [
+                tag
+                for record in records
+                for tag in record.tags
+                if tag.startswith("rule:")
+            ]
+            assert rule_tags == ["rule:CPUInfoRule", "rule:OSInfoRule"]
+
+        summary = [
+            record.message
+            for record in caplog.records
+            if record.message.startswith("slowest rules for crash")
+        ]
+        assert len(summary) == 1
+        assert "CPUInfoRule" in summary[0]
+        assert "OSInfoRule" in summary[0]
+
+    def test_profile_sampling(self, tmp_path):
+        profile_path = tmp_path / "profiles"
+        rulesets = {"default": [CPUInfoRule(), OSInfoRule()]}
+        pipeline = Pipeline(
+            rulesets=rulesets,
+            hostname="testhost",
+            profile_sample_rate=2,
+            profile_path=str(profile_path),
+        )
+
+        crash_ids = [
+            "7c67ad15-518b-4ccb-9be0-6f4c82220721",
+            "7c67ad15-518b-4ccb-9be0-6f4c82220722",
+            "7c67ad15-518b-4ccb-9be0-6f4c82220723",
+            "7c67ad15-518b-4ccb-9be0-6f4c82220724",
+        ]
+        for crash_id in crash_ids:
+            pipeline.process_crash("default", {"uuid": crash_id}, {}, {}, str(tmp_path))
+
+        # Every second crash report is profiled
+        assert sorted(path.name for path in profile_path.iterdir()) == [
+            f"{crash_ids[1]}.default.prof",
+            f"{crash_ids[3]}.default.prof",
+        ]
+        stats = pstats.Stats(str(profile_path / f"{crash_ids[1]}.default.prof"))
+        functions = {func_name for _, _, func_name in stats.stats}
+        assert "apply_rules" in functions
+
+    def test_profile_sample_rate_requires_path(self):
+        with pytest.raises(ValueError):
+            Pipeline(rulesets={}, hostname="testhost", profile_sample_rate=10)
+
+    @pytest.mark.parametrize(
+        "raw_crash, expected",
+        [
+            ({"uuid": "1"}, ["RecordingRule"]),
+            ({"uuid": "1", "Foo": "1"}, ["NeedsFooRule", "RecordingRule"]),
+        ],
+    )
+    def test_requires_skips_rules(self, tmp_path, raw_crash, expected):
+        rulesets = {"default": [NeedsFooRule(), RecordingRule()]}
+        pipeline = Pipeline(rulesets=rulesets, hostname="testhost")
+
+        processed_crash = pipeline.process_crash(
+            "default", raw_crash, {}, {}, str(tmp_path)
+        )
+        assert processed_crash["ran"] == expected
+
+    def test_requires_checked_when_reached(self, tmp_path):
+        rulesets = {"default": [WritesBarRule(), NeedsBarRule()]}
+        pipeline = Pipeline(rulesets=rulesets, hostname="testhost")
+
+        processed_crash = pipeline.process_crash(
+            "default", {"uuid": "1"}, {}, {}, str(tmp_path)
+        )
+        assert processed_crash["ran"] == ["WritesBarRule", "NeedsBarRule"]
+
+    def test_plan_groups_rules(self):
+        rulesets = {
+            "default": [NeedsFooRule(), NeedsFooRule(), RecordingRule(), NeedsFooRule()]
+        }
+        pipeline = Pipeline(rulesets=rulesets, hostname="testhost")
+        assert [
+            (group.requires, len(group.rules)) for group in pipeline.plans["default"]
+        ] == [
+            ((("raw_crash", "Foo"),), 2),
+            ((), 1),
+            ((("raw_crash", "Foo"),), 1),
+        ]
+
+    def test_bad_requires(self):
+        class BadRequiresRule(Rule):
+            requires = ("processedcrash.bar",)
+
+        with pytest.raises(ValueError, match="processedcrash.bar"):
+            Pipeline(rulesets={"default": [BadRequiresRule()]}, hostname="testhost")
+
+    def test_rule_order_validation(self):
+        # NeedsBarRule reads bar, so WritesBarRule has to run before it
+        rulesets = {"default": [NeedsBarRule(), WritesBarRule()]}
+        with pytest.raises(ValueError, match="WritesBarRule writes 'bar', but runs"):
+            Pipeline(rulesets=rulesets, hostname="testhost")
+
+    def test_mozilla_rulesets_order(self):
+        # Loading the rulesets validates the order of the rules in them
+        pipeline = Pipeline(
+            rulesets="socorro.mozilla_rulesets.RULESETS", hostname="testhost"
+        )
+        assert set(pipeline.plans) == {"default", "regenerate_signature"}
@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import asyncio
 from unittest import mock
 from unittest.mock import ANY
 
@@ -11,6 +12,7 @@ import pytest
 
 from socorro import settings
 from socorro.external.crashstorage_base import CrashIDNotFound
+from socorro.lib.asyncio_task_manager import AsyncioPipelineTaskManager, PipelineJob
 from socorro.processor.processor_app import ProcessorApp, count_sentry_scrub_error
 
 
@@ -106,6 +108,34 @@ class TestProcessorApp:
         )
         assert finished_func.call_count == 1
 
+    def test_transform_new_crash(self, processor_settings):
+        app = ProcessorApp()
+        app._set_up_source_and_destination()
+
+        fake_raw_crash = {"raw": "1"}
+        app.source.get_raw_crash = mock.Mock(return_value=fake_raw_crash)
+        fake_dumps = {"upload_file_minidump": "fake_dump_TEMPORARY.dump"}
+        app.source.get_dumps_as_files = mock.Mock(return_value=fake_dumps)
+        app.source.get_processed_crash = mock.Mock(side_effect=CrashIDNotFound(17))
+
+        app.pipeline.process_crash = mock.Mock(return_value={"processed": "1"})
+        app.destinations[0].save_processed_crash = mock.Mock()
+
+        app.transform("17")
+
+        # The crash hasn't been processed before, so it's processed from scratch
+        app.source.get_processed_crash.assert_called_with("17")
+        app.pipeline.process_crash.assert_called_with(
+            ruleset_name="default",
+            raw_crash=fake_raw_crash,
+            dumps=fake_dumps,
+            processed_crash={},
+            tmpdir=ANY,
+        )
+        app.destinations[0].save_processed_crash.assert_called_with(
+            {"raw": "1"}, {"processed": "1"}
+        )
+
     def test_transform_crash_id_missing(self, processor_settings):
         app = ProcessorApp()
         app._set_up_source_and_destination()
@@ -143,6 +173,79 @@ class TestProcessorApp:
         )
         assert finished_func.call_count == 1
 
+    def test_pipeline_stages_success(self, processor_settings, tmp_path):
+        with settings.override(**{"PROCESSOR.temporary_path": str(tmp_path)}):
+            app = ProcessorApp()
+            app._set_up_source_and_destination()
+
+        crash_id = "930b08ba-e425-49bf-adbd-7c9172220721"
+        raw_crash = {"uuid": crash_id}
+        app.source.save_raw_crash(
+            crash_id=crash_id,
+            raw_crash=raw_crash,
+            dumps={"upload_file_minidump": b"abcd"},
+        )
+
+        mocked_process_crash = mock.Mock(return_value={"uuid": crash_id})
+        app.pipeline.process_crash = mocked_process_crash
+        finished_func = mock.Mock()
+
+        tm = AsyncioPipelineTaskManager(
+            quit_on_empty_queue=True,
+            job_source_iterator=[((crash_id,), {"finished_func": finished_func})],
+            stages=app.build_stages(),
+        )
+        tm.blocking_start()
+
+        app.pipeline.process_crash.assert_called_with(
+            ruleset_name="default",
+            raw_crash=raw_crash,
+            dumps={"upload_file_minidump": ANY},
+            processed_crash={},
+            tmpdir=ANY,
+        )
+        dest = get_destination(app, "dest1")
+        assert dest.get_processed_crash(crash_id) == {"uuid": crash_id}
+        assert finished_func.call_count == 1
+
+        # The temporary directory was cleaned up
+        assert list(tmp_path.iterdir()) == []
+
+    def test_fetch_stage_crash_id_missing(self, processor_settings, tmp_path):
+        with settings.override(**{"PROCESSOR.temporary_path": str(tmp_path)}):
+            app = ProcessorApp()
+            app._set_up_source_and_destination()
+
+        mocked_reject_raw_crash = mock.Mock()
+        app.pipeline.reject_raw_crash = mocked_reject_raw_crash
+
+        job = PipelineJob(args=("17",), kwargs={})
+        assert asyncio.run(app.fetch_stage(job)) is False
+        app.pipeline.reject_raw_crash.assert_called_with(
+            "17", "crash cannot be found in raw crash storage"
+        )
+
+    def test_save_stage_error(self, processor_settings, tmp_path):
+        with settings.override(**{"PROCESSOR.temporary_path": str(tmp_path)}):
+            app = ProcessorApp()
+            app._set_up_source_and_destination()
+
+        app.destinations[0].save_processed_crash = mock.Mock(
+            side_effect=ValueError("simulated error")
+        )
+
+        job = PipelineJob(args=("17",), kwargs={})
+        job.data.update(
+            {
+                "crash_id": "17",
+                "ruleset_name": "default",
+                "raw_crash": {},
+                "processed_crash": {},
+                "new_crash": True,
+            }
+        )
+        assert asyncio.run(app.save_stage(job)) is False
+
 
 # NOTE(willkg): If this changes, we should update it and look for new things that should
 # be scrubbed. Use ANY for things that change between tests like timestamps, source code
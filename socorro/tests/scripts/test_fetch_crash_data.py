@@ -0,0 +1,169 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import datetime
+import json
+import os
+from unittest import mock
+
+import pytest
+
+from socorro.scripts import fetch_crash_data
+from socorro.scripts.fetch_crash_data import (
+    HostRateLimiter,
+    get_umask,
+    main,
+    parse_retry_after,
+    save_file,
+)
+
+
+HOST = "http://socorro.example.com"
+CRASH_ID = "de1bb258-cbbf-4589-a673-34f800160918"
+RAW_CRASH = {"version": 2, "metadata": {"dump_checksums": {"upload_file_minidump": 1}}}
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("", None),
+        ("junk", None),
+        ("5", 5.0),
+        ("-5", 0.0),
+        ("Mon, 01 Jan 2024 00:00:30 GMT", 30.0),
+        ("Sun, 31 Dec 2023 23:59:00 GMT", 0.0),
+    ],
+)
+def test_parse_retry_after(value, expected):
+    now = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    assert parse_retry_after(value, now=now) == expected
+
+
+def test_host_rate_limiter_pause():
+    limiter = HostRateLimiter()
+    with mock.patch.object(fetch_crash_data.time, "sleep") as mock_sleep:
+        limiter.wait("example.com")
+        mock_sleep.assert_not_called()
+
+        limiter.pause("example.com", 30)
+        limiter.wait("example.com")
+        assert mock_sleep.call_args[0][0] == pytest.approx(30, abs=1)
+
+        # Other hosts aren't affected
+        mock_sleep.reset_mock()
+        limiter.wait("other.example.com")
+        mock_sleep.assert_not_called()
+
+
+def register_crash(requests_mock):
+    requests_mock.get(
+        f"{HOST}/api/RawCrash/?crash_id={CRASH_ID}&format=meta", json=RAW_CRASH
+    )
+    requests_mock.get(
+        f"{HOST}/api/RawCrash/?crash_id={CRASH_ID}&format=raw&name=dump",
+        content=b"abcde" * 1000,
+    )
+    requests_mock.get(
+        f"{HOST}/api/ProcessedCrash/?crash_id={CRASH_ID}&format=meta",
+        json={"uuid": CRASH_ID},
+    )
+
+
+def get_files(path):
+    return sorted(
+        str(item.relative_to(path)) for item in path.rglob("*") if item.is_file()
+    )
+
+
+def test_save_file_permissions(tmp_path):
+    fn = str(tmp_path / "subdir" / "file.json")
+    save_file(fn, lambda fp: fp.write("{}"))
+
+    # Saved files get the same permissions open() would give them, not the ones
+    # from mkstemp
+    assert os.stat(fn).st_mode & 0o777 == 0o666 & ~get_umask()
+    assert os.listdir(tmp_path / "subdir") == ["file.json"]
+
+
+class TestFetchCrashData:
+    def test_fetch(self, tmp_path, requests_mock):
+        register_crash(requests_mock)
+
+        ret = main(["--host", HOST, "--processed", str(tmp_path), CRASH_ID])
+        assert ret == 0
+        assert get_files(tmp_path) == [
+            "v1/dump/" + CRASH_ID,
+            "v1/dump_names/" + CRASH_ID,
+            "v1/processed_crash/" + CRASH_ID,
+            "v1/raw_crash/20160918/" + CRASH_ID,
+        ]
+        assert (tmp_path / "v1" / "dump" / CRASH_ID).read_bytes() == b"abcde" * 1000
+        dump_names = json.loads((tmp_path / "v1" / "dump_names" / CRASH_ID).read_text())
+        assert dump_names == ["upload_file_minidump"]
+
+    def test_skip_existing(self, tmp_path, requests_mock):
+        register_crash(requests_mock)
+        main(["--host", HOST, "--processed", str(tmp_path), CRASH_ID])
+        assert requests_mock.call_count == 3
+
+        requests_mock.reset_mock()
+        ret = main(["--host", HOST, "--processed", str(tmp_path), CRASH_ID])
+        assert ret == 0
+        assert requests_mock.call_count == 0
+
+        ret = main(
+            [
+                "--host",
+                HOST,
+                "--processed",
+                "--no-skip-existing",
+                str(tmp_path),
+                CRASH_ID,
+            ]
+        )
+        assert ret == 0
+        assert requests_mock.call_count == 3
+
+    def test_rate_limited(self, tmp_path, requests_mock):
+        register_crash(requests_mock)
+        requests_mock.get(
+            f"{HOST}/api/RawCrash/?crash_id={CRASH_ID}&format=meta",
+            [
+                {"status_code": 429, "headers": {"Retry-After": "7"}},
+                {"json": RAW_CRASH},
+            ],
+        )
+
+        with mock.patch.object(fetch_crash_data.time, "sleep") as mock_sleep:
+            ret = main(["--host", HOST, "--no-dumps", str(tmp_path), CRASH_ID])
+        assert ret == 0
+        assert mock_sleep.call_args[0][0] == pytest.approx(7, abs=1)
+        assert get_files(tmp_path) == ["v1/raw_crash/20160918/" + CRASH_ID]
+
+    def test_concurrent_with_missing_crash(self, tmp_path, requests_mock):
+        register_crash(requests_mock)
+        missing_crash_id = "de1bb258-cbbf-4589-a673-34f800160919"
+        requests_mock.get(
+            f"{HOST}/api/RawCrash/?crash_id={missing_crash_id}&format=meta",
+            status_code=404,
+        )
+
+        ret = main(
+            [
+                "--host",
+                HOST,
+                "--workers",
+                "2",
+                str(tmp_path),
+                missing_crash_id,
+                CRASH_ID,
+            ]
+        )
+        # The crash that exists gets fetched and the command reports the failure
+        assert ret == 1
+        assert get_files(tmp_path) == [
+            "v1/dump/" + CRASH_ID,
+            "v1/dump_names/" + CRASH_ID,
+            "v1/raw_crash/20160918/" + CRASH_ID,
+        ]
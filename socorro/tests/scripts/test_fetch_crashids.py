@@ -6,7 +6,7 @@ import operator
 
 import pytest
 
-from socorro.scripts.fetch_crashids import INFINITY
+from socorro.scripts.fetch_crashids import INFINITY, fetch_crashids
 
 
 @pytest.mark.parametrize(
@@ -44,3 +44,30 @@ def test_infinity_lhs_subtraction():
 def test_infinity_rhs_subtraction():
     with pytest.raises(ValueError):
         5 - INFINITY
+
+
+def test_fetch_crashids_search_after(requests_mock):
+    host = "http://socorro.example.com"
+    requests_mock.get(
+        host + "/api/SuperSearch/",
+        [
+            {
+                "json": {
+                    "hits": [{"uuid": "a"}, {"uuid": "b"}],
+                    "total": 3,
+                    "search_after": "cursor1",
+                }
+            },
+            {"json": {"hits": [{"uuid": "c"}], "total": 3}},
+        ],
+    )
+
+    crashids = list(fetch_crashids(host, {"product": "Firefox"}, INFINITY))
+    assert crashids == ["a", "b", "c"]
+
+    first, second = requests_mock.request_history
+    assert first.qs["_sort"] == ["-date"]
+    assert first.qs["_results_offset"] == ["0"]
+    assert "_search_after" not in first.qs
+    assert second.qs["_search_after"] == ["cursor1"]
+    assert "_results_offset" not in second.qs
@@ -38,7 +38,7 @@ from crashstats.tokens import models as tokens_models
 from socorro.external.crashstorage_base import CrashIDNotFound
 from socorro.lib import BadArgumentError, MissingArgumentError
 from socorro.lib.libooid import is_crash_id_valid
-from socorro.signature.generator import SignatureGenerator
+from socorro.signature.generator import get_cached_generator
 
 
 # List of all modules that contain models we want to expose.
@@ -743,7 +743,7 @@ class CrashSignatureAPI(SocorroAPIView):
         is_debug = request.META.get("DEBUG", "0") == "1"
         # FIXME(willkg): add payload schema validation if is_debug is true
 
-        signature_generator = SignatureGenerator()
+        signature_generator = get_cached_generator()
 
         jobs = request.data.get("jobs", [])
         if not jobs:
@@ -5,8 +5,8 @@
 """
 This command verifies that all the incoming crash reports for the day before the
 specified day were processed. It does this by listing the raw crash files for the day,
-then checking to see if each of those raw crash files have corresponding processed crash
-files.
+then checking storage for processed crash files and checking Elasticsearch for the
+rest.
 """
 
 import concurrent.futures
@@ -16,7 +16,6 @@ from functools import partial
 from more_itertools import chunked
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db.utils import IntegrityError
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 
@@ -34,12 +33,84 @@ WORKER_TIMEOUT = 15 * 60
 # Number of prefix variations to pass to a check_crashids subprocess
 CHUNK_SIZE = 4
 
+# Number of crash ids to look up in a single Elasticsearch query; this is the maximum
+# _results_number SuperSearch allows
+ES_BATCH_SIZE = 1000
+
+# Number of crash ids to create MissingProcessedCrash records for and publish to the
+# reprocessing queue at a time
+REPROCESS_BATCH_SIZE = 100
+
+# Listing a page of objects in storage is a Class A operation which costs about this
+# many times as much as checking whether a single object exists (Class B operation)
+LIST_COST_RATIO = 10
+
+# Storage clients and SuperSearch used by check_crashids_for_date; these are built
+# once per process rather than once per task
+_WORKER_STATE = {}
+
+
+def init_worker():
+    """Build storage clients and SuperSearch for this process."""
+    _WORKER_STATE["crash_source"] = build_instance_from_settings(
+        socorro_settings.CRASH_SOURCE
+    )
+    _WORKER_STATE["crash_dest"] = build_instance_from_settings(socorro_settings.STORAGE)
+    _WORKER_STATE["supersearch"] = SuperSearchUnredacted()
+
+
+def get_worker_state():
+    if not _WORKER_STATE:
+        init_worker()
+    return _WORKER_STATE
+
 
 def is_in_storage(crash_dest, crash_id):
     """Is the processed crash in storage."""
     return crash_dest.exists_object(f"v1/processed_crash/{crash_id}")
 
 
+def check_storage(crash_dest, firstchars, crash_ids):
+    """Checks storage and returns set of crash ids missing processed crashes.
+
+    Processed crashes aren't keyed by date, so listing processed crashes that start
+    with firstchars walks every processed crash with that prefix that's still in
+    storage. That can be cheaper than checking each crash id, but it depends on the
+    retention period and how many crash ids there are.
+
+    This checks crash ids one at a time if there are fewer of them than one page
+    of listing costs. Otherwise it lists processed crashes until it has spent as
+    much as checking the remaining crash ids one at a time would cost, then checks
+    the remaining crash ids one at a time. That bounds the cost to about twice
+    whichever strategy would have been cheaper.
+
+    """
+    missing = set(crash_ids)
+    if len(missing) < LIST_COST_RATIO:
+        return {
+            crash_id for crash_id in missing if not is_in_storage(crash_dest, crash_id)
+        }
+
+    page_iterator = crash_dest.list_objects_paginator(
+        prefix=f"v1/processed_crash/{firstchars}",
+    )
+    num_pages = 0
+    for page in page_iterator:
+        num_pages += 1
+        for item in page:
+            missing.discard(item.split("/")[-1])
+        if not missing:
+            return missing
+        if num_pages * LIST_COST_RATIO >= len(missing):
+            break
+    else:
+        # We listed everything, so whatever is left is missing
+        return missing
+
+    METRICS.incr("cron.verifyprocessed.storage_list_abandoned")
+    return {crash_id for crash_id in missing if not is_in_storage(crash_dest, crash_id)}
+
+
 def check_elasticsearch(supersearch, crash_ids):
     """Checks Elasticsearch and returns list of missing crash ids.
 
@@ -60,6 +131,7 @@ def check_elasticsearch(supersearch, crash_ids):
         "_columns": ["uuid"],
         "_facets": [],
         "_facets_size": 0,
+        "_results_number": len(crash_ids),
     }
     search_results = supersearch.get(**params)
 
@@ -69,12 +141,13 @@ def check_elasticsearch(supersearch, crash_ids):
 
 def check_crashids_for_date(firstchars_chunk, date):
     """Check crash ids for a given firstchars and date"""
-    crash_source = build_instance_from_settings(socorro_settings.CRASH_SOURCE)
-    crash_dest = build_instance_from_settings(socorro_settings.STORAGE)
+    state = get_worker_state()
+    crash_source = state["crash_source"]
+    crash_dest = state["crash_dest"]
+    supersearch = state["supersearch"]
 
-    supersearch = SuperSearchUnredacted()
-
-    missing = []
+    missing = set()
+    in_storage = []
 
     for firstchars in firstchars_chunk:
         # Grab all the crash ids at the given date directory
@@ -82,24 +155,24 @@ def check_crashids_for_date(firstchars_chunk, date):
             prefix=f"v1/raw_crash/{date}/{firstchars}",
         )
 
-        for page in page_iterator:
-            # NOTE(willkg): Keys here look like /v1/raw_crash/DATE/CRASHID
-            crash_ids = [item.split("/")[-1] for item in page]
+        # NOTE(willkg): Keys here look like /v1/raw_crash/DATE/CRASHID
+        crash_ids = [item.split("/")[-1] for page in page_iterator for item in page]
 
-            if not crash_ids:
-                continue
+        if not crash_ids:
+            continue
 
-            # Check storage first
-            for crash_id in crash_ids:
-                if not is_in_storage(crash_dest, crash_id):
-                    missing.append(crash_id)
+        # Check storage first
+        missing_in_storage = check_storage(crash_dest, firstchars, crash_ids)
+        missing.update(missing_in_storage)
+        in_storage.extend(
+            crash_id for crash_id in crash_ids if crash_id not in missing_in_storage
+        )
 
-            # Check Elasticsearch in batches
-            for crash_ids_batch in chunked(crash_ids, 100):
-                missing_in_es = check_elasticsearch(supersearch, crash_ids_batch)
-                missing.extend(missing_in_es)
+    # Check Elasticsearch in batches
+    for crash_ids_batch in chunked(in_storage, ES_BATCH_SIZE):
+        missing.update(check_elasticsearch(supersearch, crash_ids_batch))
 
-    return list(set(missing))
+    return sorted(missing)
 
 
 class Command(BaseCommand):
@@ -133,11 +206,12 @@ class Command(BaseCommand):
         firstchars_chunked = chunked(self.get_threechars(), CHUNK_SIZE)
 
         if num_workers == 1:
+            init_worker()
             for result in map(check_crashids, firstchars_chunked):
                 missing.extend(result)
         else:
             with concurrent.futures.ProcessPoolExecutor(
-                max_workers=num_workers
+                max_workers=num_workers, initializer=init_worker
             ) as executor:
                 for result in executor.map(
                     check_crashids, firstchars_chunked, timeout=WORKER_TIMEOUT
@@ -151,20 +225,19 @@ class Command(BaseCommand):
         METRICS.gauge("cron.verifyprocessed.missing_processed", len(missing))
         if missing:
             reprocessing_api = Reprocessing()
-            for crash_id in missing:
-                self.stdout.write(f"Missing: {crash_id}")
-
-                try:
-                    MissingProcessedCrash.objects.create(
-                        crash_id=crash_id, is_processed=False
-                    )
-                except IntegrityError as ie:
-                    if "violates unique constraint" in str(ie):
-                        # If there's already one, that's fine
-                        pass
-                    else:
-                        raise
-                reprocessing_api.post(crash_ids=crash_id)
+            for crash_ids in chunked(missing, REPROCESS_BATCH_SIZE):
+                for crash_id in crash_ids:
+                    self.stdout.write(f"Missing: {crash_id}")
+
+                # If there's already a record for a crash id, that's fine
+                MissingProcessedCrash.objects.bulk_create(
+                    [
+                        MissingProcessedCrash(crash_id=crash_id, is_processed=False)
+                        for crash_id in crash_ids
+                    ],
+                    ignore_conflicts=True,
+                )
+                reprocessing_api.post(crash_ids=crash_ids)
 
         else:
             self.stdout.write(f"All crashes for {date} were processed.")
@@ -4,9 +4,15 @@
 
 
 from crashstats.crashstats.models import MissingProcessedCrash
-from crashstats.crashstats.management.commands.verifyprocessed import Command
+from crashstats.crashstats.management.commands.verifyprocessed import (
+    LIST_COST_RATIO,
+    Command,
+    check_storage,
+)
+from socorro import settings as socorro_settings
 from socorro.lib.libdatetime import utc_now
 from socorro.lib.libooid import create_new_ooid, date_from_ooid
+from socorro.libclass import build_instance_from_settings
 
 
 TODAY = utc_now().strftime("%Y%m%d")
@@ -60,6 +66,55 @@ class TestVerifyProcessed:
         assert threechars[0] == "000"
         assert threechars[-1] == "fff"
 
+    def test_check_storage(self, storage_helper):
+        bucket = storage_helper.get_crashstorage_bucket()
+        storage_helper.create_bucket(bucket)
+
+        crash_id_1 = "000" + create_new_ooid()[3:]
+        crash_id_2 = "000" + create_new_ooid()[3:]
+        # Processed crash with the same prefix that isn't for this day
+        crash_id_3 = "000" + create_new_ooid()[3:]
+        for crash_id in [crash_id_1, crash_id_3]:
+            self.create_processed_crash_in_storage(
+                storage_helper, bucket_name=bucket, crash_id=crash_id
+            )
+
+        crash_dest = build_instance_from_settings(socorro_settings.STORAGE)
+        missing = check_storage(crash_dest, "000", [crash_id_1, crash_id_2])
+        assert missing == {crash_id_2}
+
+    def test_check_storage_stops_listing(self):
+        """Verify check_storage stops listing when checking crash ids is cheaper."""
+
+        class FakeStorage:
+            def __init__(self, keys):
+                self.keys = keys
+                self.pages_listed = 0
+                self.exists_checks = 0
+
+            def list_objects_paginator(self, prefix, page_size=1000):
+                for i in range(0, len(self.keys), page_size):
+                    self.pages_listed += 1
+                    yield self.keys[i : i + page_size]
+
+            def exists_object(self, key):
+                self.exists_checks += 1
+                return key in self.keys
+
+        crash_ids = ["000" + create_new_ooid()[3:] for _ in range(LIST_COST_RATIO * 2)]
+        # Lots of processed crashes with this prefix from other days and all but the
+        # last crash id for this day at the end of the listing
+        other_keys = [
+            f"v1/processed_crash/000{i:033d}" for i in range(LIST_COST_RATIO * 1000)
+        ]
+        keys = other_keys + [f"v1/processed_crash/{crash_id}" for crash_id in crash_ids]
+        crash_dest = FakeStorage(keys[:-1])
+
+        missing = check_storage(crash_dest, "000", crash_ids)
+        assert missing == {crash_ids[-1]}
+        assert crash_dest.pages_listed == 2
+        assert crash_dest.exists_checks == len(crash_ids)
+
     def test_no_crashes(self, storage_helper, monkeypatch):
         """Verify no crashes in bucket result in no missing crashes."""
         monkeypatch.setattr(Command, "get_threechars", get_threechars_subset)
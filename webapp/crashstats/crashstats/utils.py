@@ -480,6 +480,7 @@ def get_versions_for_product(product, use_cache=True):
             return ret
 
     api = supersearch_models.SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
     now = timezone.now()
 
     # Find versions for specified product in crash reports reported in the last
@@ -489,6 +490,8 @@ def get_versions_for_product(product, use_cache=True):
     params = {
         "product": product.name,
         "_results_number": 0,
+        # We only need the facet, so don't count every matching crash report
+        "_approximate_total": True,
         "_facets": "version",
         "_facets_size": 1000,
         "date": [
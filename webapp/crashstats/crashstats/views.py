@@ -26,7 +26,7 @@ from crashstats.crashstats.decorators import track_view, pass_default_context
 from crashstats.supersearch.models import SuperSearchFields
 from socorro.external.crashstorage_base import CrashIDNotFound
 from socorro.lib.libsocorrodataschema import InvalidDocumentError
-from socorro.signature.generator import SignatureGenerator
+from socorro.signature.generator import get_cached_generator
 from socorro.signature.utils import convert_to_crash_data
 
 
@@ -82,7 +82,7 @@ def build_id_to_date(build_id):
 
 def generate_signature(processed_crash):
     """Generate a crash signature from a processed crash"""
-    generator = SignatureGenerator()
+    generator = get_cached_generator()
     crash_data = convert_to_crash_data(processed_crash)
     return generator.generate(crash_data).signature
 
@@ -52,6 +52,11 @@ JOBS = [
         "last_success": True,
         "backfill": True,
     },
+    {
+        # Precompute topcrashers data for featured versions every hour
+        "cmd": "updatetopcrashers",
+        "frequency": "1h",
+    },
     {
         # Clean elasticsaerch indices every week at 6:00am
         "cmd": "esclean",
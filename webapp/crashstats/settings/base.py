@@ -334,6 +334,15 @@ SIMPLE_SEARCH_FIELDS = ("product", "version", "platform", "process_type")
 # the number of result filter on tcbs
 TCBS_RESULT_COUNTS = (50, 100, 200, 300)
 
+# Maximum age in seconds of a realtime topcrashers snapshot before the topcrashers
+# page queries Elasticsearch instead; snapshots are updated hourly
+TOPCRASHERS_SNAPSHOT_MAX_AGE = _config(
+    "TOPCRASHERS_SNAPSHOT_MAX_AGE",
+    default="5400",
+    parser=int,
+    doc="Seconds a realtime topcrashers snapshot is used for the topcrashers page.",
+)
+
 # channels allowed in middleware calls,
 CHANNELS = ("release", "beta", "nightly", "esr")
 
@@ -405,6 +414,19 @@ CACHE_IMPLEMENTATION_FETCHES = _config(
     "CACHE_IMPLEMENTATION_FETCHES", default="true", parser=parse_bool
 )
 
+# Number of seconds after a cached Super Search result expires that it's still
+# returned while it gets refreshed in the background; this only applies to pages
+# that opt in, not the API
+SUPERSEARCH_QUERY_CACHE_STALE_SECONDS = _config(
+    "SUPERSEARCH_QUERY_CACHE_STALE_SECONDS",
+    default="300",
+    parser=int,
+    doc=(
+        "Seconds a Super Search result can be returned after it expires while it's "
+        "refreshed in the background. This only applies to webapp pages, not the API."
+    ),
+)
+
 # for local development these don't matter
 STATSD_HOST = _config("STATSD_HOST", default="localhost", doc="statsd host.")
 STATSD_PORT = _config("STATSD_PORT", default="8125", parser=int, doc="statsd port.")
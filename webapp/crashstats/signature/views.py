@@ -207,6 +207,7 @@ def signature_reports(request, params):
     )
 
     api = SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
     try:
         search_results = api.get(**params)
     except BadArgumentError as e:
@@ -253,6 +254,7 @@ def signature_aggregation(request, params, aggregation):
     params["_facets"] = [aggregation]
 
     api = SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
     try:
         search_results = api.get(**params)
     except BadArgumentError as e:
@@ -298,6 +300,7 @@ def signature_graphs(request, params, field):
     params["_facets"] = [field]
 
     api = SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
     try:
         search_results = api.get(**params)
     except BadArgumentError as e:
@@ -356,6 +359,7 @@ def signature_comments(request, params):
     )
 
     api = SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
     try:
         search_results = api.get(**params)
     except BadArgumentError as e:
@@ -428,6 +432,7 @@ def signature_summary(request, params):
     params["_aggs.product.version"] = ["_cardinality.install_time"]
 
     api = SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
 
     # Now make the actual request with all expected parameters.
     try:
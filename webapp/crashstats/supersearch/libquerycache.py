@@ -0,0 +1,211 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Cache for Super Search query results.
+
+Query parameters are normalized to build the cache key, so queries that differ
+only in parameter order or in the seconds of their date bounds share a cache
+entry. Concurrent misses for the same query in a process wait for a single
+Elasticsearch request. Stale entries are served while one request refreshes them
+in the background.
+"""
+
+from concurrent.futures import Future
+import datetime
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+
+from django.core.cache import cache
+from pymemcache.exceptions import MemcacheServerError
+
+from socorro.libmarkus import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+
+# Characters that make up the operator at the start of a date parameter value
+DATE_OPERATOR_CHARS = "<>=!"
+
+# Seconds the background refresh of a stale entry holds its lock
+REFRESH_LOCK_SECONDS = 60
+
+
+def bucket_date(value):
+    """Round a date parameter value down to the minute.
+
+    :arg value: a date parameter value like ``">=2024-01-01T10:23:45+00:00"``
+
+    :returns: the value with seconds and microseconds dropped or the value
+        unchanged if it's not a datetime
+
+    """
+    if not isinstance(value, str):
+        return value
+
+    date_str = value.lstrip(DATE_OPERATOR_CHARS)
+    operator = value[: len(value) - len(date_str)]
+    try:
+        date = datetime.datetime.fromisoformat(date_str)
+    except ValueError:
+        return value
+
+    date = date.replace(second=0, microsecond=0)
+    return operator + date.isoformat()
+
+
+def normalize_params(params, date_params=()):
+    """Return normalized query parameters.
+
+    Values of filter parameters are sorted since their order doesn't matter and
+    values of date parameters are rounded down to the minute. Meta parameters
+    (parameters that start with ``_``) are left alone since order matters for
+    some of them.
+
+    :arg params: dict of query parameters
+    :arg date_params: names of parameters that have date values
+
+    :returns: new dict of parameters
+
+    """
+    normalized = {}
+    for key, value in params.items():
+        if key in date_params:
+            if isinstance(value, (list, tuple)):
+                value = [bucket_date(item) for item in value]
+            else:
+                value = bucket_date(value)
+
+        if not key.startswith("_") and isinstance(value, (list, tuple)):
+            value = sorted(value, key=str)
+
+        normalized[key] = value
+    return normalized
+
+
+def build_cache_key(name, params):
+    """Build a cache key for a query.
+
+    :arg name: the name of the thing being queried
+    :arg params: normalized query parameters; ``_fields`` is left out because it's
+        the same for every query
+
+    :returns: cache key as a str
+
+    """
+    key_params = {key: value for key, value in params.items() if key != "_fields"}
+    key_string = name + json.dumps(key_params, sort_keys=True, default=str)
+    return "querycache:" + hashlib.md5(key_string.encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """Caches query results with request coalescing and stale-while-revalidate.
+
+    Entries are fresh for ``fresh_seconds``. After that, they're stale for
+    ``stale_seconds`` during which they're still returned while they get refreshed
+    in the background.
+
+    Emits ``webapp.supersearch.query_cache`` with a ``result`` tag of ``hit``,
+    ``stale``, ``miss``, or ``coalesced``.
+
+    """
+
+    def __init__(self, metrics_key="webapp.supersearch.query_cache"):
+        self.metrics_key = metrics_key
+        self._lock = threading.Lock()
+        # cache key -> Future for requests in progress in this process
+        self._in_flight = {}
+
+    def _incr(self, result):
+        METRICS.incr(self.metrics_key, tags=[f"result:{result}"])
+
+    def _store(self, key, value, fresh_seconds, stale_seconds):
+        entry = {"value": value, "fresh_until": time.time() + fresh_seconds}
+        try:
+            cache.set(key, entry, timeout=fresh_seconds + stale_seconds)
+        except MemcacheServerError:
+            METRICS.incr("webapp.crashstats.models.cache_set_error")
+
+    def get_or_fetch(
+        self, key, fetch_func, fresh_seconds, stale_seconds=0, refresh=False
+    ):
+        """Return the cached result for a query or fetch it.
+
+        :arg key: the cache key for the query
+        :arg fetch_func: function that takes no arguments and returns the result
+        :arg fresh_seconds: seconds a result is fresh for
+        :arg stale_seconds: seconds after that a result can be returned while it's
+            refreshed
+        :arg refresh: if True, ignore the cached result
+
+        :returns: the result
+
+        """
+        entry = None if refresh else cache.get(key)
+        if entry is not None:
+            if time.time() < entry["fresh_until"]:
+                self._incr("hit")
+            else:
+                self._incr("stale")
+                self._refresh_in_background(
+                    key, fetch_func, fresh_seconds, stale_seconds
+                )
+            return entry["value"]
+
+        return self._fetch(key, fetch_func, fresh_seconds, stale_seconds)
+
+    def _fetch(self, key, fetch_func, fresh_seconds, stale_seconds):
+        """Fetch a result; concurrent calls for the same key share one fetch."""
+        with self._lock:
+            flight = self._in_flight.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = Future()
+                self._in_flight[key] = flight
+
+        if not is_leader:
+            self._incr("coalesced")
+            # Each waiter gets its own copy so callers can change results
+            return pickle.loads(flight.result())
+
+        self._incr("miss")
+        try:
+            value = fetch_func()
+            self._store(key, value, fresh_seconds, stale_seconds)
+            flight.set_result(pickle.dumps(value))
+            return value
+        except BaseException as exc:
+            flight.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _refresh_in_background(self, key, fetch_func, fresh_seconds, stale_seconds):
+        """Refresh a stale entry in a background thread.
+
+        The refresh lock is in the cache, so only one process refreshes an entry.
+
+        """
+        lock_key = key + ":refresh"
+        if not cache.add(lock_key, 1, timeout=REFRESH_LOCK_SECONDS):
+            return
+
+        def _refresh():
+            try:
+                self._fetch(key, fetch_func, fresh_seconds, stale_seconds)
+            except Exception:
+                logger.exception("error refreshing stale query cache entry")
+            finally:
+                cache.delete(lock_key)
+
+        threading.Thread(target=_refresh, name="queryCacheRefresh", daemon=True).start()
+
+
+QUERY_CACHE = QueryCache()
@@ -3,9 +3,17 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 import copy
+import functools
+
+from django.conf import settings
 
 from crashstats import libproduct
 from crashstats.crashstats import models
+from crashstats.supersearch.libquerycache import (
+    build_cache_key,
+    normalize_params,
+    QUERY_CACHE,
+)
 from crashstats.supersearch.libsupersearch import (
     SuperSearchStatusModel,
     get_allowed_fields,
@@ -20,6 +28,7 @@ from socorro.libclass import build_instance_from_settings
 SUPERSEARCH_META_PARAMS = (
     ("_aggs.product.version", list),
     ("_aggs.android_cpu_abi.android_manufacturer.android_model", list),
+    "_approximate_total",
     ("_columns", list),
     ("_facets", list),
     ("_facets_size", int),
@@ -27,6 +36,7 @@ SUPERSEARCH_META_PARAMS = (
     ("_results_offset", int),
     ("_results_number", int),
     "_return_query",
+    "_search_after",
     ("_sort", list),
 )
 
@@ -85,7 +95,68 @@ def validate_products(product_value):
         raise BadArgumentError(f"Not valid products: {invalid_products_str}")
 
 
-class SuperSearch(ESSocorroMiddleware):
+class SuperSearchQueryCacheMixin:
+    """Caches Super Search results in the query cache.
+
+    See :py:mod:`crashstats.supersearch.libquerycache`.
+
+    Expired results are only returned while they're refreshed in the background if
+    ``stale_seconds`` is set. Pages that can show slightly old results opt in with
+    ``api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS``.
+
+    """
+
+    # Number of seconds after a cached result expires that it's still returned while
+    # it gets refreshed in the background
+    stale_seconds = 0
+
+    def get_date_params(self):
+        return {
+            name
+            for name, field in self.all_fields.items()
+            if field.get("query_type") == "date"
+        }
+
+    def fetch(
+        self,
+        implementation,
+        method="get",
+        params=None,
+        dont_cache=False,
+        refresh_cache=False,
+        **kwargs,
+    ):
+        params = params or {}
+        if (
+            method != "get"
+            or not settings.CACHE_IMPLEMENTATION_FETCHES
+            or dont_cache
+            or self.cache_seconds <= 0
+            or params.get("_return_query")
+        ):
+            return super().fetch(
+                implementation,
+                method=method,
+                params=params,
+                dont_cache=dont_cache,
+                refresh_cache=refresh_cache,
+                **kwargs,
+            )
+
+        # The query runs with the params it was given; normalized params are only
+        # used for the cache key, so queries that differ by a few seconds share a
+        # result
+        normalized_params = normalize_params(params, date_params=self.get_date_params())
+        return QUERY_CACHE.get_or_fetch(
+            key=build_cache_key(implementation.__class__.__name__, normalized_params),
+            fetch_func=functools.partial(implementation.get, **params),
+            fresh_seconds=self.cache_seconds,
+            stale_seconds=self.stale_seconds,
+            refresh=refresh_cache,
+        )
+
+
+class SuperSearch(SuperSearchQueryCacheMixin, ESSocorroMiddleware):
     IS_PUBLIC = True
 
     HELP_TEXT = """
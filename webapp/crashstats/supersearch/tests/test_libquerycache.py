@@ -0,0 +1,213 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import threading
+import time
+from unittest import mock
+
+from markus.testing import MetricsMock
+import pytest
+
+from crashstats.supersearch.libquerycache import (
+    bucket_date,
+    build_cache_key,
+    normalize_params,
+    QueryCache,
+)
+from crashstats.supersearch.models import SuperSearchQueryCacheMixin
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (">=2024-01-01T10:23:45.123456+00:00", ">=2024-01-01T10:23:00+00:00"),
+        ("<2024-01-01T10:23:45", "<2024-01-01T10:23:00"),
+        ("2024-01-01", "2024-01-01T00:00:00"),
+        ("<not a date", "<not a date"),
+        (5, 5),
+    ],
+)
+def test_bucket_date(value, expected):
+    assert bucket_date(value) == expected
+
+
+def test_normalize_params():
+    params = {
+        "product": ["Firefox", "Fenix"],
+        "date": [">=2024-01-01T10:23:45+00:00", "<2024-01-08T10:23:59+00:00"],
+        "_columns": ["uuid", "date"],
+    }
+    assert normalize_params(params, date_params={"date"}) == {
+        "product": ["Fenix", "Firefox"],
+        "date": ["<2024-01-08T10:23:00+00:00", ">=2024-01-01T10:23:00+00:00"],
+        # Order matters for meta params
+        "_columns": ["uuid", "date"],
+    }
+
+
+def test_build_cache_key():
+    key = build_cache_key("SuperSearch", {"product": ["Firefox"], "_fields": {}})
+    assert key == build_cache_key(
+        "SuperSearch", {"product": ["Firefox"], "_fields": {"a": 1}}
+    )
+    assert key != build_cache_key("SuperSearch", {"product": ["Fenix"]})
+    assert key != build_cache_key("Query", {"product": ["Firefox"]})
+
+
+def get_results(mm):
+    records = mm.filter_records("incr", stat="socorro.webapp.supersearch.query_cache")
+    return [record.tags[0] for record in records]
+
+
+class TestQueryCache:
+    def test_hit_and_miss(self):
+        query_cache = QueryCache()
+        fetch_func = mock.Mock(return_value={"total": 1})
+
+        with MetricsMock() as mm:
+            for _ in range(2):
+                result = query_cache.get_or_fetch(
+                    "key", fetch_func, fresh_seconds=60, stale_seconds=60
+                )
+                assert result == {"total": 1}
+
+            assert get_results(mm) == ["result:miss", "result:hit"]
+        fetch_func.assert_called_once_with()
+
+    def test_refresh(self):
+        query_cache = QueryCache()
+        fetch_func = mock.Mock(side_effect=[{"total": 1}, {"total": 2}])
+
+        query_cache.get_or_fetch("key", fetch_func, fresh_seconds=60)
+        result = query_cache.get_or_fetch(
+            "key", fetch_func, fresh_seconds=60, refresh=True
+        )
+        assert result == {"total": 2}
+
+    def test_coalesced(self):
+        query_cache = QueryCache()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch_func():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"total": 1}
+
+        results = []
+
+        def get():
+            results.append(
+                query_cache.get_or_fetch("key", fetch_func, fresh_seconds=60)
+            )
+
+        with MetricsMock() as mm:
+            leader = threading.Thread(target=get)
+            leader.start()
+            started.wait(5)
+
+            followers = [threading.Thread(target=get) for _ in range(3)]
+            for thread in followers:
+                thread.start()
+            # Give followers a moment to start waiting on the leader's request
+            time.sleep(0.1)
+            release.set()
+            for thread in [leader] + followers:
+                thread.join()
+
+            assert sorted(get_results(mm)) == ["result:coalesced"] * 3 + ["result:miss"]
+
+        # One request to Elasticsearch and everyone gets the result
+        assert len(calls) == 1
+        assert results == [{"total": 1}] * 4
+        # Each caller gets its own copy
+        assert len({id(result) for result in results}) == 4
+
+    def test_coalesced_error(self):
+        query_cache = QueryCache()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch_func():
+            started.set()
+            release.wait(5)
+            raise ValueError("es is down")
+
+        errors = []
+
+        def get():
+            try:
+                query_cache.get_or_fetch("key", fetch_func, fresh_seconds=60)
+            except ValueError as exc:
+                errors.append(exc)
+
+        leader = threading.Thread(target=get)
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=get)
+        follower.start()
+        time.sleep(0.1)
+        release.set()
+        leader.join()
+        follower.join()
+
+        assert len(errors) == 2
+        assert query_cache._in_flight == {}
+
+    def test_stale_while_revalidate(self):
+        query_cache = QueryCache()
+        refreshed = threading.Event()
+        values = iter([{"total": 1}, {"total": 2}])
+
+        def fetch_func():
+            value = next(values)
+            if value["total"] == 2:
+                refreshed.set()
+            return value
+
+        with MetricsMock() as mm:
+            query_cache.get_or_fetch(
+                "key", fetch_func, fresh_seconds=0, stale_seconds=60
+            )
+
+            # The entry is stale, so it's returned while it gets refreshed
+            result = query_cache.get_or_fetch(
+                "key", fetch_func, fresh_seconds=0, stale_seconds=60
+            )
+            assert result == {"total": 1}
+            assert refreshed.wait(5)
+
+            assert get_results(mm)[:3] == [
+                "result:miss",
+                "result:stale",
+                "result:miss",
+            ]
+
+        # Wait for the refresh to store the new result
+        for _ in range(50):
+            result = query_cache.get_or_fetch(
+                "key", fetch_func, fresh_seconds=60, stale_seconds=60
+            )
+            if result == {"total": 2}:
+                break
+            time.sleep(0.1)
+        assert result == {"total": 2}
+
+
+def test_supersearch_stale_is_opt_in():
+    class FakeSuperSearch(SuperSearchQueryCacheMixin):
+        cache_seconds = 60
+        all_fields = {}
+
+    implementation = mock.Mock()
+    with mock.patch("crashstats.supersearch.models.QUERY_CACHE") as mock_query_cache:
+        api = FakeSuperSearch()
+        api.fetch(implementation, params={"product": ["Firefox"]})
+        assert mock_query_cache.get_or_fetch.call_args.kwargs["stale_seconds"] == 0
+
+        api.stale_seconds = 300
+        api.fetch(implementation, params={"product": ["Firefox"]})
+        assert mock_query_cache.get_or_fetch.call_args.kwargs["stale_seconds"] == 300
@@ -199,6 +199,7 @@ def search_results(request):
     )
 
     api = SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
     try:
         search_results = api.get(**params)
     except BadArgumentError as exception:
@@ -0,0 +1,202 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Precompute topcrashers data for featured versions so the topcrashers page doesn't
+have to run aggregations in Elasticsearch for the most common queries.
+
+Realtime snapshots are recomputed every REALTIME_SNAPSHOT_INTERVALS hours for their
+day range. Byday snapshots end at midnight, so they only get recomputed once a day.
+"""
+
+import datetime
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from crashstats import libproduct
+from crashstats.crashstats.utils import get_version_context_for_product
+from crashstats.topcrashers.models import TopCrashersSnapshot
+from crashstats.topcrashers.views import (
+    get_topcrashers_results,
+    REALTIME_SNAPSHOT_INTERVALS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Day ranges the topcrashers page allows
+DAYS = [1, 3, 7, 14, 28]
+
+# Process types to precompute; "parent" is the topcrashers page default
+PROCESS_TYPES = ["any", "parent"]
+
+TCBS_MODES = ["realtime", "byday"]
+
+# Realtime snapshots are recomputed this long before their interval is up so a run
+# that starts a little early doesn't put the update off for another interval
+REALTIME_UPDATE_SLACK = datetime.timedelta(minutes=30)
+
+# Snapshots not updated in this long are for versions that aren't featured anymore
+MAX_SNAPSHOT_AGE = datetime.timedelta(days=2)
+
+
+def get_end_date(run_time, tcbs_mode):
+    """Return the end of the date range for a topcrashers mode."""
+    if tcbs_mode == "byday":
+        return run_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    return run_time.replace(second=0, microsecond=0)
+
+
+def is_up_to_date(snapshot, end_date, facets_size):
+    """Return whether a snapshot doesn't need to be recomputed."""
+    if snapshot is None or snapshot.facets_size < facets_size:
+        return False
+    if snapshot.tcbs_mode == "byday":
+        return snapshot.end_date == end_date
+    interval = datetime.timedelta(hours=REALTIME_SNAPSHOT_INTERVALS[snapshot.days])
+    return end_date - snapshot.end_date < interval - REALTIME_UPDATE_SLACK
+
+
+class Command(BaseCommand):
+    help = "Updates topcrashers snapshots for featured versions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product",
+            action="append",
+            default=[],
+            help="Product to update snapshots for. Defaults to all products.",
+        )
+        parser.add_argument(
+            "--run-time",
+            default="",
+            help=(
+                "The time to compute snapshots for in YYYY-mm-ddTHH:MM format in UTC. "
+                "Defaults to now."
+            ),
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recompute snapshots that are up to date.",
+        )
+
+    def get_featured_versions(self, product):
+        return [
+            item["version"]
+            for item in get_version_context_for_product(product)
+            if item["is_featured"]
+        ]
+
+    def update_snapshot(
+        self, product, version, process_type, days, tcbs_mode, end_date, facets_size
+    ):
+        start_date = end_date - datetime.timedelta(days=days)
+        results = get_topcrashers_results(
+            product=product.name,
+            version=[version],
+            platform=None,
+            process_type=process_type,
+            report_type="crash",
+            date=["<" + end_date.isoformat(), ">=" + start_date.isoformat()],
+            _facets_size=facets_size,
+            _range_type="report",
+        )
+        TopCrashersSnapshot.objects.update_or_create(
+            product=product.name,
+            version=version,
+            process_type=process_type,
+            days=days,
+            tcbs_mode=tcbs_mode,
+            defaults={
+                "end_date": end_date,
+                "facets_size": facets_size,
+                "data": results,
+            },
+        )
+
+    def handle(self, **options):
+        run_time_arg = options.get("run_time")
+        if run_time_arg:
+            run_time = parse_datetime(run_time_arg)
+            if not run_time:
+                raise CommandError(f"Unrecognized run_time format: {run_time_arg}")
+            if timezone.is_naive(run_time):
+                run_time = run_time.replace(tzinfo=datetime.timezone.utc)
+            # Days start at midnight UTC
+            run_time = run_time.astimezone(datetime.timezone.utc)
+        else:
+            run_time = timezone.now()
+
+        if options["product"]:
+            products = [
+                libproduct.get_product_by_name(name) for name in options["product"]
+            ]
+        else:
+            products = libproduct.get_products()
+
+        # Compute the largest result count so the snapshot works for all of them
+        facets_size = max(settings.TCBS_RESULT_COUNTS)
+
+        updated = 0
+        skipped = 0
+        failed = 0
+        for product in products:
+            for version in self.get_featured_versions(product):
+                existing = {
+                    (snapshot.process_type, snapshot.days, snapshot.tcbs_mode): snapshot
+                    for snapshot in TopCrashersSnapshot.objects.filter(
+                        product=product.name, version=version
+                    )
+                }
+                for process_type in PROCESS_TYPES:
+                    for days in DAYS:
+                        for tcbs_mode in TCBS_MODES:
+                            end_date = get_end_date(run_time, tcbs_mode)
+                            snapshot = existing.get((process_type, days, tcbs_mode))
+                            if not options["force"] and is_up_to_date(
+                                snapshot, end_date, facets_size
+                            ):
+                                skipped += 1
+                                continue
+
+                            try:
+                                self.update_snapshot(
+                                    product=product,
+                                    version=version,
+                                    process_type=process_type,
+                                    days=days,
+                                    tcbs_mode=tcbs_mode,
+                                    end_date=end_date,
+                                    facets_size=facets_size,
+                                )
+                            except Exception:
+                                # Keep going so one bad query doesn't hold up the
+                                # other snapshots or the cleanup
+                                logger.exception(
+                                    "error updating snapshot %s %s %s %s %s",
+                                    product.name,
+                                    version,
+                                    process_type,
+                                    days,
+                                    tcbs_mode,
+                                )
+                                failed += 1
+                                continue
+                            updated += 1
+
+        deleted, _ = TopCrashersSnapshot.objects.filter(
+            updated__lt=run_time - MAX_SNAPSHOT_AGE
+        ).delete()
+
+        self.stdout.write(
+            f"Updated {updated} snapshots, skipped {skipped}, failed {failed}, "
+            f"deleted {deleted}."
+        )
+        if failed:
+            raise CommandError(f"Failed to update {failed} snapshots")
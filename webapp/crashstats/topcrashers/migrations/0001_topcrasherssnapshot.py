@@ -0,0 +1,80 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+# Generated by Django 5.2.16 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="TopCrashersSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "product",
+                    models.CharField(help_text="the product name", max_length=50),
+                ),
+                (
+                    "version",
+                    models.CharField(help_text="the product version", max_length=50),
+                ),
+                (
+                    "process_type",
+                    models.CharField(
+                        help_text="the process type or 'any'", max_length=50
+                    ),
+                ),
+                (
+                    "days",
+                    models.IntegerField(help_text="number of days in the date range"),
+                ),
+                (
+                    "tcbs_mode",
+                    models.CharField(
+                        help_text="'realtime' or 'byday' which determines end_date",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "end_date",
+                    models.DateTimeField(help_text="end of the date range (exclusive)"),
+                ),
+                (
+                    "facets_size",
+                    models.IntegerField(help_text="number of signatures queried for"),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        help_text="the search results and previous range search results with total and signature facets"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now=True, help_text="when this snapshot was computed"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {
+                    ("product", "version", "process_type", "days", "tcbs_mode")
+                },
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+# Generated by Django 5.2.16 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("topcrashers", "0001_topcrasherssnapshot"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="topcrasherssnapshot",
+            old_name="created",
+            new_name="updated",
+        ),
+        migrations.AlterField(
+            model_name="topcrasherssnapshot",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, help_text="when this snapshot was last computed"
+            ),
+        ),
+    ]
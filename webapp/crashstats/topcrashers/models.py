@@ -1,3 +1,38 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from django.db import models
+
+
+class TopCrashersSnapshot(models.Model):
+    """Precomputed topcrashers search results for a common topcrashers query.
+
+    These are maintained by the ``updatetopcrashers`` command for featured versions
+    so the topcrashers page doesn't have to run aggregations in Elasticsearch.
+
+    """
+
+    product = models.CharField(max_length=50, help_text="the product name")
+    version = models.CharField(max_length=50, help_text="the product version")
+    process_type = models.CharField(
+        max_length=50, help_text="the process type or 'any'"
+    )
+    days = models.IntegerField(help_text="number of days in the date range")
+    tcbs_mode = models.CharField(
+        max_length=10, help_text="'realtime' or 'byday' which determines end_date"
+    )
+    end_date = models.DateTimeField(help_text="end of the date range (exclusive)")
+    facets_size = models.IntegerField(help_text="number of signatures queried for")
+    data = models.JSONField(
+        help_text=(
+            "the search results and previous range search results with total and "
+            "signature facets"
+        )
+    )
+    updated = models.DateTimeField(
+        auto_now=True, help_text="when this snapshot was last computed"
+    )
+
+    class Meta:
+        unique_together = ("product", "version", "process_type", "days", "tcbs_mode")
@@ -0,0 +1,182 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import datetime
+import io
+from unittest import mock
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from crashstats.topcrashers.management.commands.updatetopcrashers import (
+    DAYS,
+    PROCESS_TYPES,
+    TCBS_MODES,
+)
+from crashstats.topcrashers.views import REALTIME_SNAPSHOT_INTERVALS
+from crashstats.topcrashers.models import TopCrashersSnapshot
+
+
+COMMAND = "crashstats.topcrashers.management.commands.updatetopcrashers"
+
+RESULTS = {"total": 0, "facets": {"signature": []}, "previous": None}
+
+
+@mock.patch(f"{COMMAND}.get_topcrashers_results")
+@mock.patch(f"{COMMAND}.get_version_context_for_product")
+class TestUpdateTopCrashersCommand:
+    def test_update(self, mock_versions, mock_results, db):
+        mock_versions.return_value = [
+            {"product": "Firefox", "version": "2.0", "is_featured": True},
+            {"product": "Firefox", "version": "1.0", "is_featured": False},
+        ]
+        mock_results.return_value = RESULTS
+
+        out = io.StringIO()
+        call_command(
+            "updatetopcrashers",
+            product=["Firefox"],
+            run_time="2024-05-03T14:35:00+00:00",
+            stdout=out,
+        )
+
+        count = len(PROCESS_TYPES) * len(DAYS) * len(TCBS_MODES)
+        assert mock_results.call_count == count
+        assert TopCrashersSnapshot.objects.filter(version="2.0").count() == count
+        assert not TopCrashersSnapshot.objects.filter(version="1.0").exists()
+
+        snapshot = TopCrashersSnapshot.objects.get(
+            version="2.0", process_type="parent", days=7, tcbs_mode="byday"
+        )
+        assert snapshot.end_date == datetime.datetime(
+            2024, 5, 3, tzinfo=datetime.timezone.utc
+        )
+        assert snapshot.data == RESULTS
+
+    def test_incremental(self, mock_versions, mock_results, db):
+        mock_versions.return_value = [
+            {"product": "Firefox", "version": "2.0", "is_featured": True},
+        ]
+        mock_results.return_value = RESULTS
+
+        out = io.StringIO()
+        call_command(
+            "updatetopcrashers",
+            product=["Firefox"],
+            run_time="2024-05-03T14:35:00+00:00",
+            stdout=out,
+        )
+        mock_results.reset_mock()
+
+        # An hour later, only realtime snapshots that are updated hourly get
+        # recomputed because byday snapshots for today are up to date
+        call_command(
+            "updatetopcrashers",
+            product=["Firefox"],
+            run_time="2024-05-03T15:35:00+00:00",
+            stdout=out,
+        )
+        hourly_days = [days for days in DAYS if REALTIME_SNAPSHOT_INTERVALS[days] == 1]
+        assert mock_results.call_count == len(PROCESS_TYPES) * len(hourly_days)
+
+        realtime_end_dates = dict(
+            TopCrashersSnapshot.objects.filter(
+                tcbs_mode="realtime", process_type="parent"
+            ).values_list("days", "end_date")
+        )
+        assert realtime_end_dates == {
+            1: datetime.datetime(2024, 5, 3, 15, 35, tzinfo=datetime.timezone.utc),
+            3: datetime.datetime(2024, 5, 3, 15, 35, tzinfo=datetime.timezone.utc),
+            7: datetime.datetime(2024, 5, 3, 14, 35, tzinfo=datetime.timezone.utc),
+            14: datetime.datetime(2024, 5, 3, 14, 35, tzinfo=datetime.timezone.utc),
+            28: datetime.datetime(2024, 5, 3, 14, 35, tzinfo=datetime.timezone.utc),
+        }
+
+        # Three hours after the first run, the 7 day range is due too
+        mock_results.reset_mock()
+        call_command(
+            "updatetopcrashers",
+            product=["Firefox"],
+            run_time="2024-05-03T17:35:00+00:00",
+            stdout=out,
+        )
+        assert mock_results.call_count == len(PROCESS_TYPES) * (len(hourly_days) + 1)
+
+    def test_errors(self, mock_versions, mock_results, db):
+        mock_versions.return_value = [
+            {"product": "Firefox", "version": "2.0", "is_featured": True},
+        ]
+
+        def results(**kwargs):
+            if kwargs["process_type"] == "any":
+                raise Exception("intentional error")
+            return RESULTS
+
+        mock_results.side_effect = results
+
+        old_snapshot = TopCrashersSnapshot.objects.create(
+            product="Firefox",
+            version="1.0",
+            process_type="parent",
+            days=7,
+            tcbs_mode="byday",
+            end_date=datetime.datetime(2024, 4, 1, tzinfo=datetime.timezone.utc),
+            facets_size=50,
+            data=RESULTS,
+        )
+        TopCrashersSnapshot.objects.filter(pk=old_snapshot.pk).update(
+            updated=datetime.datetime(2024, 4, 1, tzinfo=datetime.timezone.utc)
+        )
+
+        # Errors are logged and the other snapshots and the cleanup still happen
+        out = io.StringIO()
+        with pytest.raises(CommandError):
+            call_command(
+                "updatetopcrashers",
+                product=["Firefox"],
+                run_time="2024-05-03T14:35:00+00:00",
+                stdout=out,
+            )
+        count = len(DAYS) * len(TCBS_MODES)
+        assert (
+            TopCrashersSnapshot.objects.filter(
+                version="2.0", process_type="parent"
+            ).count()
+            == count
+        )
+        assert not TopCrashersSnapshot.objects.filter(process_type="any").exists()
+        assert not TopCrashersSnapshot.objects.filter(version="1.0").exists()
+        assert f"failed {count}," in out.getvalue()
+
+    def test_run_time_naive(self, mock_versions, mock_results, db):
+        mock_versions.return_value = [
+            {"product": "Firefox", "version": "2.0", "is_featured": True},
+        ]
+        mock_results.return_value = RESULTS
+
+        # A run time without a timezone is in UTC
+        call_command(
+            "updatetopcrashers",
+            product=["Firefox"],
+            run_time="2024-05-03T14:35",
+            stdout=io.StringIO(),
+        )
+        snapshot = TopCrashersSnapshot.objects.get(
+            version="2.0", process_type="parent", days=7, tcbs_mode="realtime"
+        )
+        assert snapshot.end_date == datetime.datetime(
+            2024, 5, 3, 14, 35, tzinfo=datetime.timezone.utc
+        )
+
+    def test_run_time_invalid(self, mock_versions, mock_results):
+        with pytest.raises(CommandError):
+            call_command(
+                "updatetopcrashers",
+                product=["Firefox"],
+                run_time="not a time",
+                stdout=io.StringIO(),
+            )
+        mock_results.assert_not_called()
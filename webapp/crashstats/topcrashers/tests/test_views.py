@@ -11,11 +11,72 @@ from django.urls import reverse
 from django.utils.encoding import smart_str
 
 from crashstats.crashstats.models import Signature, BugAssociation
+from crashstats.topcrashers.models import TopCrashersSnapshot
+from crashstats.topcrashers.views import (
+    build_topcrashers_stats,
+    get_topcrashers_snapshot,
+)
 from socorro.external.es.super_search_fields import PROCESS_TYPES
 from socorro.lib.libdatetime import utc_now
 from socorro.lib.libooid import create_new_ooid
 
 
+def test_build_topcrashers_stats_trims_previous(db):
+    def facet(term):
+        return {"term": term, "count": 1, "facets": {"platform": []}}
+
+    # Snapshot data is computed for a larger facets size than the query
+    results = {
+        "total": 3,
+        "facets": {"signature": [facet("a"), facet("b"), facet("c")]},
+        "previous": {
+            "total": 5,
+            "facets": {"signature": [facet(term) for term in "xyzba"]},
+        },
+    }
+
+    # A query for 1 signature ranks against 2 previous signatures, so "a" is new
+    _, stats = build_topcrashers_stats(results, facets_size=1)
+    assert [item.signature_term for item in stats] == ["a"]
+    assert stats[0].previous_signature is None
+
+    _, stats = build_topcrashers_stats(results, facets_size=3)
+    assert stats[0].previous_signature.rank == 4
+    assert stats[1].previous_signature.rank == 3
+
+
+def test_get_topcrashers_snapshot_max_age(db, settings):
+    settings.TOPCRASHERS_SNAPSHOT_MAX_AGE = 5400
+    end_date = datetime.datetime(2024, 5, 3, 18, 35, tzinfo=datetime.timezone.utc)
+    for days in (1, 28):
+        TopCrashersSnapshot.objects.create(
+            product="Firefox",
+            version="1.0",
+            process_type="parent",
+            days=days,
+            tcbs_mode="realtime",
+            end_date=end_date - datetime.timedelta(hours=4),
+            facets_size=300,
+            data={},
+        )
+
+    def get_snapshot(days):
+        return get_topcrashers_snapshot(
+            product="Firefox",
+            version="1.0",
+            process_type="parent",
+            days=days,
+            tcbs_mode="realtime",
+            facets_size=50,
+            end_date=end_date,
+        )
+
+    # The 1 day range is updated hourly, but the 28 day range is updated less often
+    # so an older snapshot is still current
+    assert get_snapshot(1) is None
+    assert get_snapshot(28) is not None
+
+
 class TestTopCrasherViews:
     def test_topcrashers_bug_data(self, client, db, es_helper):
         signature = "FakeSignature1"
@@ -471,3 +532,60 @@ class TestTopCrasherViews:
             {"product": "Firefox", "version": "19.0", "_range_type": "build"},
         )
         assert response.status_code == 200
+
+    def test_topcrashers_snapshot(self, client, db, es_helper):
+        signature = {
+            "term": "SnapshotSignature",
+            "count": 10,
+            "facets": {
+                "platform": [{"term": "Linux", "count": 10}],
+                "is_garbage_collecting": [],
+                "dom_fission_enabled": [],
+                "process_type": [{"term": "parent", "count": 10}],
+                "report_type": [{"term": "crash", "count": 10}],
+                "startup_crash": [],
+                "histogram_uptime": [{"term": 0, "count": 10}],
+                "cardinality_install_time": {"value": 5},
+            },
+        }
+        end_date = utc_now().replace(second=0, microsecond=0) - datetime.timedelta(
+            minutes=10
+        )
+        TopCrashersSnapshot.objects.create(
+            product="Firefox",
+            version="1.0",
+            process_type="parent",
+            days=7,
+            tcbs_mode="realtime",
+            end_date=end_date,
+            facets_size=300,
+            data={
+                "total": 10,
+                "facets": {"signature": [signature]},
+                "previous": {"total": 0, "facets": {"signature": []}},
+            },
+        )
+
+        url = reverse("topcrashers:topcrashers")
+
+        # The snapshot has no data in Elasticsearch, so the signature shows up only
+        # if the snapshot is used
+        response = client.get(url, {"product": "Firefox", "version": "1.0"})
+        assert response.status_code == 200
+        assert "SnapshotSignature" in smart_str(response.content)
+        assert end_date.replace(tzinfo=None).isoformat() in smart_str(response.content)
+
+        # Uncommon queries don't use the snapshot
+        response = client.get(
+            url, {"product": "Firefox", "version": "1.0", "platform": "Linux"}
+        )
+        assert response.status_code == 200
+        assert "SnapshotSignature" not in smart_str(response.content)
+
+        # Snapshots that are too old don't get used
+        TopCrashersSnapshot.objects.update(
+            end_date=end_date - datetime.timedelta(days=1)
+        )
+        response = client.get(url, {"product": "Firefox", "version": "1.0"})
+        assert response.status_code == 200
+        assert "SnapshotSignature" not in smart_str(response.content)
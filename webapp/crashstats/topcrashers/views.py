@@ -22,7 +22,14 @@ from crashstats.crashstats.utils import get_comparison_signatures, SignatureStat
 from crashstats.supersearch.models import SuperSearchUnredacted
 from crashstats.supersearch.utils import get_date_boundaries
 from crashstats.topcrashers.forms import TopCrashersForm
+from crashstats.topcrashers.models import TopCrashersSnapshot
 from socorro.external.es.super_search_fields import PROCESS_TYPES
+from socorro.libmarkus import METRICS
+
+
+# Hours between updates of realtime topcrashers snapshots for each day range; a
+# snapshot for a longer range changes less in an hour, so it's recomputed less often
+REALTIME_SNAPSHOT_INTERVALS = {1: 1, 3: 1, 7: 3, 14: 6, 28: 6}
 
 
 def datetime_to_build_id(date):
@@ -30,8 +37,14 @@ def datetime_to_build_id(date):
     return date.strftime("%Y%m%d%H%M%S")
 
 
-def get_topcrashers_stats(**kwargs):
-    """Return the results of a search."""
+def get_topcrashers_results(**kwargs):
+    """Run the topcrashers searches.
+
+    :returns: dict with ``total`` and signature ``facets`` for the date range and
+        ``previous`` with the same for the previous date range or None if there
+        were no crash reports
+
+    """
     params = kwargs
     range_type = params.pop("_range_type")
     dates = get_date_boundaries(params)
@@ -69,11 +82,15 @@ def get_topcrashers_stats(**kwargs):
         ]
 
     api = SuperSearchUnredacted()
+    api.stale_seconds = settings.SUPERSEARCH_QUERY_CACHE_STALE_SECONDS
     search_results = api.get(**params)
 
-    signatures_stats = []
-    total_results = search_results["total"]
-    if total_results > 0:
+    results = {
+        "total": search_results["total"],
+        "facets": {"signature": search_results["facets"].get("signature", [])},
+        "previous": None,
+    }
+    if results["total"] > 0:
         # Run the same query but for the previous date range, so we can
         # compare the rankings and show rank changes.
         delta = (dates[1] - dates[0]) * 2
@@ -92,22 +109,92 @@ def get_topcrashers_stats(**kwargs):
             ]
 
         previous_range_results = api.get(**params)
-        previous_signatures = get_comparison_signatures(previous_range_results)
+        results["previous"] = {
+            "total": previous_range_results["total"],
+            "facets": {
+                "signature": previous_range_results["facets"].get("signature", [])
+            },
+        }
+    return results
+
+
+def build_topcrashers_stats(results, facets_size=None):
+    """Build SignatureStats from topcrashers search results.
+
+    :arg results: results from ``get_topcrashers_results``
+    :arg facets_size: maximum number of signatures to build stats for
 
-        for index, signature in enumerate(search_results["facets"]["signature"]):
+    :returns: ``(total, list of SignatureStats)`` tuple
+
+    """
+    signatures_stats = []
+    total_results = results["total"]
+    if total_results > 0:
+        previous = results["previous"]
+        if facets_size is not None:
+            # Snapshots are computed for the largest facets size. Rank against the
+            # same number of previous signatures a query for facets_size gets, so
+            # previous ranks don't depend on whether there was a snapshot.
+            previous = {
+                **previous,
+                "facets": {
+                    "signature": previous["facets"]["signature"][: facets_size * 2]
+                },
+            }
+        previous_signatures = get_comparison_signatures(previous)
+        platforms = list(models.Platform.objects.values())
+        for index, signature in enumerate(results["facets"]["signature"][:facets_size]):
             previous_signature = previous_signatures.get(signature["term"])
             signatures_stats.append(
                 SignatureStats(
                     signature=signature,
-                    num_total_crashes=search_results["total"],
+                    num_total_crashes=total_results,
                     rank=index,
-                    platforms=models.Platform.objects.values(),
+                    platforms=platforms,
                     previous_signature=previous_signature,
                 )
             )
     return total_results, signatures_stats
 
 
+def get_topcrashers_stats(**kwargs):
+    """Return the results of a search."""
+    results = get_topcrashers_results(**kwargs)
+    return build_topcrashers_stats(results)
+
+
+def get_topcrashers_snapshot(
+    product, version, process_type, days, tcbs_mode, facets_size, end_date
+):
+    """Return the TopCrashersSnapshot for a topcrashers query.
+
+    :returns: the snapshot or None if there isn't a current one
+
+    """
+    snapshot = TopCrashersSnapshot.objects.filter(
+        product=product,
+        version=version,
+        process_type=process_type,
+        days=days,
+        tcbs_mode=tcbs_mode,
+        facets_size__gte=facets_size,
+    ).first()
+    if snapshot is None:
+        return None
+
+    if tcbs_mode == "byday":
+        is_current = snapshot.end_date == end_date
+    else:
+        # TOPCRASHERS_SNAPSHOT_MAX_AGE covers hourly updates, so extend it for day
+        # ranges that are updated less often
+        max_age = datetime.timedelta(
+            seconds=settings.TOPCRASHERS_SNAPSHOT_MAX_AGE,
+            hours=REALTIME_SNAPSHOT_INTERVALS.get(days, 1) - 1,
+        )
+        is_current = end_date - max_age <= snapshot.end_date <= end_date
+    return snapshot if is_current else None
+
+
 @track_view
 @pass_default_context
 @check_days_parameter([1, 3, 7, 14, 28], default=7)
@@ -210,18 +297,50 @@ def topcrashers(request, days=None, possible_days=None, default_context=None):
         "start_date": end_date - datetime.timedelta(days=days),
     }
 
-    total_number_of_crashes, topcrashers_stats = get_topcrashers_stats(
-        product=product.name,
-        version=versions,
-        platform=os_name,
-        process_type=crash_type,
-        report_type=report_type,
-        date=[
-            "<" + end_date.isoformat(),
-            ">=" + context["query"]["start_date"].isoformat(),
-        ],
-        _facets_size=result_count,
-        _range_type=range_type,
+    # Common queries are precomputed by the updatetopcrashers command; everything
+    # else is queried from Elasticsearch
+    snapshot = None
+    if (
+        len(versions) == 1
+        and os_name is None
+        and range_type == "report"
+        and report_type == "crash"
+    ):
+        snapshot = get_topcrashers_snapshot(
+            product=product.name,
+            version=versions[0],
+            process_type=crash_type,
+            days=days,
+            tcbs_mode=tcbs_mode,
+            facets_size=result_count,
+            end_date=end_date,
+        )
+    METRICS.incr(
+        "webapp.topcrashers.snapshot",
+        tags=[f"result:{'hit' if snapshot is not None else 'miss'}"],
+    )
+
+    if snapshot is not None:
+        end_date = snapshot.end_date
+        context["query"]["end_date"] = end_date
+        context["query"]["start_date"] = end_date - datetime.timedelta(days=days)
+        results = snapshot.data
+    else:
+        results = get_topcrashers_results(
+            product=product.name,
+            version=versions,
+            platform=os_name,
+            process_type=crash_type,
+            report_type=report_type,
+            date=[
+                "<" + end_date.isoformat(),
+                ">=" + context["query"]["start_date"].isoformat(),
+            ],
+            _facets_size=result_count,
+            _range_type=range_type,
+        )
+    total_number_of_crashes, topcrashers_stats = build_topcrashers_stats(
+        results, facets_size=result_count
     )
 
     count_of_included_crashes = 0